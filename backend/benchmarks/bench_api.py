@@ -0,0 +1,315 @@
+"""
+Hot API path benchmark
+
+Seeds realistic volumes (100k users, 1M forum replies, 500k purchases by
+default) and drives the hot routes through the in-process ASGI app at a
+controlled concurrency: login, /auth/me, forum topic lists, purchases and the
+leaderboards. Prints RPS and p50/p95/p99 latency per scenario as JSON,
+tagged with the current git commit so runs can be compared.
+
+    MONGO_URL=mongodb://localhost:27017 python benchmarks/bench_api.py \\
+        --requests 2000 --concurrency 100 --output results/HEAD.json
+
+    # Tohumlanmış veriyi yeniden kullan ve önceki sonuçla karşılaştır
+    python benchmarks/bench_api.py --reuse --baseline results/main.json
+
+    # mongod olmadan, küçük ölçekte
+    python benchmarks/bench_api.py --mongomock --scale 0.01
+
+The benchmark always uses its own database (BENCH_DB_NAME, default
+"rexagon_bench") and drops the collections it seeds unless --reuse is given
+and the seeded volumes match.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+PASSWORD = "bench-sifre"
+CATEGORIES = ["Destek", "Şikayet", "Yardım", "Reklam", "Öneri", "Duyurular", "Genel"]
+SEED_BATCH = 10000
+SEEDED = ("users", "forum_topics", "forum_replies", "market_items", "purchases", "credit_transactions")
+
+
+def configure(args):
+    # server modülü ayarlarını import sırasında okur
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ["DB_NAME"] = os.environ.get("BENCH_DB_NAME", "rexagon_bench")
+    # Tüm istekler tek istemciden gelir, sınırlayıcı ölçümü bozmasın
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def volumes(args):
+    return {
+        "users": max(10, int(100_000 * args.scale)),
+        "forum_topics": max(7, int(20_000 * args.scale)),
+        "forum_replies": max(10, int(1_000_000 * args.scale)),
+        "purchases": max(10, int(500_000 * args.scale)),
+        "credit_transactions": max(10, int(50_000 * args.scale)),
+    }
+
+
+async def insert_batched(collection, count, make):
+    for start in range(0, count, SEED_BATCH):
+        await collection.insert_many([make(i) for i in range(start, min(start + SEED_BATCH, count))], ordered=False)
+
+
+async def seed(server, args, sizes):
+    db = server.db
+    if args.reuse:
+        counts = {name: await db[name].estimated_document_count() for name in sizes}
+        if counts == sizes:
+            return False
+    for name in SEEDED:
+        await db[name].drop()
+    await server.ensure_indexes()
+
+    rng = random.Random(args.seed)
+    start = datetime.now(timezone.utc) - timedelta(days=365)
+
+    def when(i, total):
+        return (start + timedelta(seconds=i * 365 * 86400 / total)).isoformat()
+
+    # Tek bir hash yeterli; tohumlama 100k bcrypt çalıştırmasın
+    password_hash = server.get_password_hash(PASSWORD)
+    await insert_batched(db.users, sizes["users"], lambda i: {
+        "id": f"u{i}",
+        "kullanici_adi": f"oyuncu_{i}",
+        "email": f"oyuncu_{i}@bench.local",
+        "sifre_hash": password_hash,
+        "kredi": 1_000_000.0 if i < args.buyers else float(rng.randint(0, 5000)),
+        "profil_arka_plani": None,
+        "rol": "user",
+        "yetki": "Oyuncu",
+        "yetki_gorseli": None,
+        "dogum_tarihi": "2000-01-01",
+        "kayit_tarihi": when(i, sizes["users"]),
+        "acik_temalar": [],
+        "aktif_tema_id": None,
+        "aktif_tema_gorsel": None,
+        "biyografi": None,
+        "ada_seviyesi": rng.randint(0, 500),
+        "dinar": float(rng.randint(0, 100000))
+    })
+
+    def author(i):
+        return {"yazar_id": f"u{i}", "yazar_adi": f"oyuncu_{i}", "yazar_yetki": "Oyuncu", "yazar_yetki_gorseli": None}
+
+    replies_per_topic = sizes["forum_replies"] // sizes["forum_topics"]
+    await insert_batched(db.forum_topics, sizes["forum_topics"], lambda i: {
+        "id": f"k{i}",
+        "baslik": f"Konu {i}",
+        "icerik": "Sunucuda yeni bir sorun var, yardım eder misiniz?",
+        "kategori": CATEGORIES[i % len(CATEGORIES)],
+        **author(rng.randrange(sizes["users"])),
+        "tarih": when(i, sizes["forum_topics"]),
+        "cevap_sayisi": replies_per_topic,
+        "son_cevap_tarihi": when(i, sizes["forum_topics"])
+    })
+    await insert_batched(db.forum_replies, sizes["forum_replies"], lambda i: {
+        "id": f"c{i}",
+        "konu_id": f"k{i % sizes['forum_topics']}",
+        "icerik": f"Cevap {i}: bende de aynı sorun oluyor.",
+        **author(rng.randrange(sizes["users"])),
+        "tarih": when(i, sizes["forum_replies"])
+    })
+
+    items = [{
+        "id": f"urun{i}",
+        "isim": f"Paket {i}",
+        "aciklama": "benchmark",
+        "fiyat": 10.0,
+        "kategori": "Paketler",
+        "stok": 10_000_000,
+        "gorsel": "",
+        "indirim": 0,
+        "olusturulma_tarihi": start.isoformat()
+    } for i in range(20)]
+    await db.market_items.insert_many(items)
+    await insert_batched(db.purchases, sizes["purchases"], lambda i: {
+        "id": f"s{i}",
+        "kullanici_id": f"u{i % sizes['users']}",
+        "kullanici_adi": f"oyuncu_{i % sizes['users']}",
+        "urun_id": f"urun{i % len(items)}",
+        "urun_adi": f"Paket {i % len(items)}",
+        "toplam_fiyat": 10.0,
+        "tarih": when(i, sizes["purchases"])
+    })
+    await insert_batched(db.credit_transactions, sizes["credit_transactions"], lambda i: {
+        "id": f"t{i}",
+        "siparis_no": f"t{i}",
+        "kullanici_id": f"u{i % sizes['users']}",
+        "kullanici_adi": f"oyuncu_{i % sizes['users']}",
+        "tutar": 25.0,
+        "tip": "yukleme",
+        "durum": "tamamlandi",
+        "tarih": when(i, sizes["credit_transactions"])
+    })
+    return True
+
+
+def scenarios(args, sizes, tokens):
+    rng = random.Random(args.seed)
+    user_count = sizes["users"]
+
+    def auth(i):
+        return {"Authorization": f"Bearer {tokens[i % len(tokens)]}"}
+
+    return {
+        "auth/giris": lambda i: ("POST", "/api/auth/giris", {
+            "json": {"kullanici_adi": f"oyuncu_{rng.randrange(user_count)}", "sifre": PASSWORD}
+        }),
+        "auth/me": lambda i: ("GET", "/api/auth/me", {"headers": auth(i)}),
+        "forum/konular": lambda i: ("GET", f"/api/forum/{rng.choice(CATEGORIES)}/konular", {}),
+        "market/satin-al": lambda i: ("POST", f"/api/market/satin-al/urun{rng.randrange(20)}", {"headers": auth(i)}),
+        "leaderboard/kredi": lambda i: ("GET", "/api/leaderboard/kredi", {}),
+        "leaderboard/son-kayitlar": lambda i: ("GET", "/api/leaderboard/son-kayitlar", {}),
+        "leaderboard/son-alisverisler": lambda i: ("GET", "/api/leaderboard/son-alisverisler", {}),
+        "leaderboard/son-kredi-yuklemeler": lambda i: ("GET", "/api/leaderboard/son-kredi-yuklemeler", {}),
+        "leaderboard/ada-seviyesi": lambda i: ("GET", "/api/leaderboard/ada-seviyesi", {}),
+        "leaderboard/dinar": lambda i: ("GET", "/api/leaderboard/dinar", {}),
+    }
+
+
+async def drive(http, request, count, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    statuses = {}
+
+    async def one(i):
+        method, path, kwargs = request(i)
+        async with semaphore:
+            start = time.perf_counter()
+            response = await http.request(method, path, **kwargs)
+            latencies.append((time.perf_counter() - start) * 1000)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(count)))
+    elapsed = time.perf_counter() - started
+    return {
+        "istek": count,
+        "sure_sn": round(elapsed, 3),
+        "rps": round(count / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "durum_kodlari": statuses,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(result, baseline):
+    changes = {}
+    for name, current in result["senaryolar"].items():
+        previous = baseline.get("senaryolar", {}).get(name)
+        if not previous:
+            continue
+        changes[name] = {
+            metric: round((current[metric] - previous[metric]) / previous[metric] * 100, 1)
+            for metric in ("rps", "p50_ms", "p95_ms", "p99_ms") if previous[metric]
+        }
+    return changes
+
+
+async def run(args):
+    import server
+
+    if args.mongomock:
+        from mongomock_motor import AsyncMongoMockClient
+        server.client = AsyncMongoMockClient()
+        server.db = server.client[os.environ["DB_NAME"]]
+
+    sizes = volumes(args)
+    seed_started = time.perf_counter()
+    seeded = await seed(server, args, sizes)
+    seed_elapsed = time.perf_counter() - seed_started
+    await server.detect_transactions()
+    await server.registered_users.resync()
+
+    buyers = min(args.buyers, sizes["users"])
+    tokens = [server.create_access_token(data={"sub": f"u{i}"}) for i in range(buyers)]
+    selected = scenarios(args, sizes, tokens)
+    if args.only:
+        selected = {name: request for name, request in selected.items() if name in args.only}
+
+    results = {}
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as http:
+        for name, request in selected.items():
+            # Isınma: önbellekler ve bağlantı havuzu dolsun
+            await drive(http, request, min(args.warmup, args.requests), args.concurrency)
+            count = args.login_requests if name == "auth/giris" else args.requests
+            results[name] = await drive(http, request, count, args.concurrency)
+
+    result = {
+        "commit": git_commit(),
+        "tarih": datetime.now(timezone.utc).isoformat(),
+        "depolama": "mongomock" if args.mongomock else "mongod",
+        "es_zamanlilik": args.concurrency,
+        "tohum": {**sizes, "yeni_tohumlandi": seeded, "sure_sn": round(seed_elapsed, 1)},
+        "senaryolar": results,
+    }
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        result["karsilastirma"] = {"baz_commit": baseline.get("commit"), "degisim_yuzde": compare(result, baseline)}
+    server.hash_executor.shutdown()
+    server.client.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier for the seeded volumes")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per scenario")
+    parser.add_argument("--login-requests", type=int, default=200, help="requests for auth/giris (bcrypt bound)")
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--buyers", type=int, default=1000, help="users with tokens and enough credit to buy")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--only", nargs="*", help="run only these scenarios")
+    parser.add_argument("--reuse", action="store_true", help="keep seeded data when the volumes match")
+    parser.add_argument("--mongomock", action="store_true", help="use mongomock-motor instead of mongod")
+    parser.add_argument("--output", help="also write the JSON result to this file")
+    parser.add_argument("--baseline", help="earlier JSON result to compare against")
+    args = parser.parse_args()
+
+    configure(args)
+    result = asyncio.run(run(args))
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Minecraft delivery throughput benchmark
+
+Seeds the minecraft_commands outbox in a local mongod, starts the fake RCON
+server and runs the delivery workers until every command is delivered or
+dead-lettered. Reports commands/second and checks each command reached the
+game server.
+
+    MONGO_URL=mongodb://localhost:27017 python benchmarks/bench_delivery.py \
+        --commands 20000 --workers 4 --batch 50 --fail-rate 0.01
+
+The benchmark always uses its own database (BENCH_DB_NAME, default
+"rexagon_bench") and drops the outbox collection.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+sys.path.insert(0, str(BACKEND_DIR / "tests"))
+
+
+def configure(args):
+    # server modülü ayarlarını import sırasında okur
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ["DB_NAME"] = os.environ.get("BENCH_DB_NAME", "rexagon_bench")
+    os.environ["RCON_PASSWORD"] = "bench"
+    os.environ["RCON_POOL_SIZE"] = str(args.workers)
+    os.environ["DELIVERY_BATCH_SIZE"] = str(args.batch)
+    os.environ["DELIVERY_BACKOFF_SECONDS"] = "0.05"
+    os.environ["DELIVERY_POLL_SECONDS"] = "0.01"
+
+
+async def run(args):
+    import server
+    from fake_rcon import FakeRconServer
+
+    fake = FakeRconServer("bench", latency=args.latency, fail_rate=args.fail_rate)
+    port = await fake.start()
+    server.rcon_pool = server.RconPool("127.0.0.1", port, "bench", args.workers, 5)
+
+    db = server.db
+    await db.minecraft_commands.drop()
+    await server.ensure_indexes()
+    now = datetime.now(timezone.utc)
+    await db.minecraft_commands.insert_many([{
+        "id": str(uuid.uuid4()),
+        "satin_alma_id": str(uuid.uuid4()),
+        "kullanici_id": "bench",
+        "komut": f"give bench_{i} minecraft:diamond 1",
+        "durum": "beklemede",
+        "deneme": 0,
+        "sonraki_deneme": now,
+        "son_hata": None,
+        "tarih": now.isoformat()
+    } for i in range(args.commands)])
+
+    started = time.perf_counter()
+    workers = [asyncio.create_task(server.delivery_worker()) for _ in range(args.workers)]
+    while await db.minecraft_commands.count_documents({"durum": {"$in": ["beklemede", "isleniyor"]}}):
+        await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - started
+    for worker in workers:
+        worker.cancel()
+
+    delivered = await db.minecraft_commands.count_documents({"durum": "teslim_edildi"})
+    dead = await db.minecraft_commands.count_documents({"durum": "basarisiz"})
+    received = set(fake.commands)
+    result = {
+        "komut": args.commands,
+        "sure_sn": round(elapsed, 3),
+        "komut_per_sn": round(args.commands / elapsed, 1),
+        "teslim_edildi": delivered,
+        "basarisiz": dead,
+        "tekrar_denenen": server.delivery_stats["tekrar_denenecek"],
+        "rcon_baglanti": fake.connections,
+        "eksik": args.commands - dead - len(received),
+    }
+    server.rcon_pool.close()
+    await fake.stop()
+    server.client.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--commands", type=int, default=20000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--batch", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.0, help="fake server delay per command (s)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="probability a command drops the connection")
+    args = parser.parse_args()
+
+    configure(args)
+    result = asyncio.run(run(args))
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    sys.exit(1 if result["eksik"] else 0)
+
+
+if __name__ == "__main__":
+    main()
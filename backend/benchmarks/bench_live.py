@@ -0,0 +1,159 @@
+"""
+Live event fan-out benchmark
+
+Starts the API under uvicorn on a local port, opens thousands of idle SSE
+connections to /api/canli and publishes events into the broker. Reports the
+connect time, memory per connection and how long each event takes to reach
+every subscriber.
+
+    python benchmarks/bench_live.py --connections 5000 --events 50
+
+With --change-streams the events go through the live_events collection and
+a change stream, which needs a replica set (MONGO_URL) and uses its own
+database (BENCH_DB_NAME, default "rexagon_bench").
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def configure(args):
+    # server modülü ayarlarını import sırasında okur
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ["DB_NAME"] = os.environ.get("BENCH_DB_NAME", "rexagon_bench")
+    os.environ["LIVE_MAX_SUBSCRIBERS"] = str(args.connections + 1)
+    os.environ["LIVE_CHANGE_STREAMS"] = "1" if args.change_streams else ""
+    # Her istemci iki dosya tanımlayıcısı kullanır (istemci + sunucu ucu)
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = args.connections * 2 + 256
+    if soft < wanted:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(wanted, hard), hard))
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Client:
+    def __init__(self, received):
+        self.received = received
+        self.reader = None
+        self.writer = None
+
+    async def connect(self, port):
+        self.reader, self.writer = await asyncio.open_connection("127.0.0.1", port)
+        self.writer.write(
+            b"GET /api/canli?kanal=haberler HTTP/1.1\r\n"
+            b"Host: localhost\r\nAccept: text/event-stream\r\n\r\n"
+        )
+        await self.writer.drain()
+        status = await self.reader.readline()
+        if b" 200 " not in status:
+            raise RuntimeError(status.decode().strip())
+        while await self.reader.readline() not in (b"\r\n", b""):
+            pass
+
+    async def listen(self):
+        try:
+            while line := await self.reader.readline():
+                # chunked gövdede satırlar olduğu gibi gelir
+                if line.startswith(b"data: "):
+                    seq = json.loads(line[6:])["seq"]
+                    self.received[seq].append(time.perf_counter())
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+
+
+async def run(args):
+    import uvicorn
+    import server
+
+    config = uvicorn.Config(server.app, host="127.0.0.1", port=args.port, lifespan="off",
+                            log_level="warning", backlog=args.connections)
+    api = uvicorn.Server(config)
+    serve_task = asyncio.create_task(api.serve())
+    while not api.started:
+        await asyncio.sleep(0.05)
+    watcher = asyncio.create_task(server.live_event_watcher()) if args.change_streams else None
+
+    received = {seq: [] for seq in range(args.events)}
+    clients = [Client(received) for _ in range(args.connections)]
+    rss_before = rss_mb()
+    started = time.perf_counter()
+    for offset in range(0, len(clients), 500):
+        await asyncio.gather(*(c.connect(args.port) for c in clients[offset:offset + 500]))
+    connect_time = time.perf_counter() - started
+    rss_after = rss_mb()
+    listeners = [asyncio.create_task(c.listen()) for c in clients]
+    await asyncio.sleep(args.idle)
+
+    fanout = []
+    for seq in range(args.events):
+        published = time.perf_counter()
+        await server.publish_live_event("haberler", {"seq": seq, "baslik": f"bench {seq}"})
+        deadline = published + args.timeout
+        while len(received[seq]) < args.connections and time.perf_counter() < deadline:
+            await asyncio.sleep(0.001)
+        if received[seq]:
+            fanout.append((max(received[seq]) - published) * 1000)
+        await asyncio.sleep(args.interval)
+
+    delivered = sum(len(times) for times in received.values())
+    result = {
+        "baglanti": args.connections,
+        "olay": args.events,
+        "baglanma_sn": round(connect_time, 3),
+        "bellek_kb_baglanti_basi": round((rss_after - rss_before) * 1024 / args.connections, 2),
+        "yayilma_ms_p50": round(percentile(fanout, 50), 2),
+        "yayilma_ms_p99": round(percentile(fanout, 99), 2),
+        "yayilma_ms_max": round(max(fanout, default=0.0), 2),
+        "teslim_edilen": delivered,
+        "eksik": args.connections * args.events - delivered,
+        "dusurulen_abone": server.live_broker.dropped,
+    }
+
+    for listener in listeners:
+        listener.cancel()
+    for client in clients:
+        client.writer.close()
+    if watcher:
+        watcher.cancel()
+    api.should_exit = True
+    await serve_task
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connections", type=int, default=5000)
+    parser.add_argument("--events", type=int, default=50)
+    parser.add_argument("--interval", type=float, default=0.05, help="pause between events (s)")
+    parser.add_argument("--idle", type=float, default=1.0, help="idle time before publishing (s)")
+    parser.add_argument("--timeout", type=float, default=10.0, help="max wait for one event's fan-out (s)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--change-streams", action="store_true")
+    args = parser.parse_args()
+
+    configure(args)
+    result = asyncio.run(run(args))
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    sys.exit(1 if result["eksik"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Payment webhook ingest and settlement benchmark
+
+Seeds pending credit loads in a local mongod, replays signed PayTR callbacks
+from the fake payment provider (each one several times, shuffled) against
+the webhook receiver and runs the settlement workers until every event is
+processed. Reports acknowledgement latency, settlement throughput and checks
+each load was credited exactly once.
+
+    MONGO_URL=mongodb://localhost:27017 python benchmarks/bench_payments.py \\
+        --loads 5000 --duplicates 3 --workers 2 --concurrency 200
+
+The benchmark always uses its own database (BENCH_DB_NAME, default
+"rexagon_bench") and drops the collections it seeds.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+sys.path.insert(0, str(BACKEND_DIR / "tests"))
+
+
+def configure(args):
+    # server modülü ayarlarını import sırasında okur
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ["DB_NAME"] = os.environ.get("BENCH_DB_NAME", "rexagon_bench")
+    os.environ["PAYTR_MERCHANT_KEY"] = "bench-key"
+    os.environ["PAYTR_MERCHANT_SALT"] = "bench-salt"
+    os.environ["SETTLEMENT_BATCH_SIZE"] = str(args.batch)
+    os.environ["SETTLEMENT_POLL_SECONDS"] = "0.01"
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+async def seed(args, server):
+    db = server.db
+    for name in ("users", "credit_transactions", "credit_ledger", "payment_events"):
+        await db[name].drop()
+    await server.ensure_indexes()
+    await server.detect_transactions()
+    users = [
+        {"id": str(uuid.uuid4()), "kullanici_adi": f"odeme_{i}", "email": f"odeme_{i}@bench.local", "kredi": 0.0}
+        for i in range(args.users)
+    ]
+    await db.users.insert_many(users)
+    now = datetime.now(timezone.utc).isoformat()
+    loads = []
+    for i in range(args.loads):
+        transaction_id = str(uuid.uuid4())
+        loads.append({
+            "id": transaction_id,
+            "siparis_no": transaction_id.replace("-", ""),
+            "kullanici_id": users[i % len(users)]["id"],
+            "tutar": args.amount,
+            "tip": "yukleme",
+            "durum": "beklemede",
+            "tarih": now
+        })
+    await db.credit_transactions.insert_many(loads)
+    return loads
+
+
+async def run(args):
+    import server
+    from fake_payment_provider import FakePaymentProvider
+
+    loads = await seed(args, server)
+    workers = [asyncio.create_task(server.settlement_worker()) for _ in range(args.workers)]
+
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        provider = FakePaymentProvider(http, "bench-key", "bench-salt")
+        started = time.perf_counter()
+        sent = await provider.replay(
+            [provider.paytr_callback(load["siparis_no"], round(args.amount * 100)) for load in loads],
+            duplicates=args.duplicates, concurrency=args.concurrency
+        )
+        ingest_elapsed = time.perf_counter() - started
+        while await server.db.payment_events.count_documents({"durum": {"$in": ["beklemede", "isleniyor"]}}):
+            await asyncio.sleep(0.05)
+        elapsed = time.perf_counter() - started
+    for worker in workers:
+        worker.cancel()
+
+    db = server.db
+    completed = await db.credit_transactions.count_documents({"durum": "tamamlandi"})
+    credited = await db.users.aggregate([{"$group": {"_id": None, "toplam": {"$sum": "$kredi"}}}]).to_list(1)
+    credited = credited[0]["toplam"] if credited else 0.0
+    ledger_rows = await db.credit_ledger.count_documents({"tip": "yukleme"})
+    result = {
+        "bildirim": sent,
+        "yukleme": args.loads,
+        "kabul_rps": round(sent / ingest_elapsed, 1),
+        "kabul_p50_ms": round(percentile(provider.latencies, 50), 2),
+        "kabul_p99_ms": round(percentile(provider.latencies, 99), 2),
+        "mutabakat_sn": round(elapsed, 3),
+        "mutabakat_per_sn": round(args.loads / elapsed, 1),
+        "yanitlar": provider.responses,
+        "tamamlandi": completed,
+        "ihlaller": [
+            message for failed, message in [
+                (completed != args.loads, "tamamlanan yükleme sayısı eksik"),
+                (round(credited, 2) != round(args.loads * args.amount, 2), "eklenen kredi yüklemelerle uyuşmuyor"),
+                (ledger_rows != 2 * args.loads, "defter kayıtları yüklemelerle uyuşmuyor"),
+            ] if failed
+        ]
+    }
+    server.client.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--loads", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--amount", type=float, default=25.0)
+    parser.add_argument("--duplicates", type=int, default=3, help="times each callback is delivered")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--batch", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=200)
+    args = parser.parse_args()
+
+    configure(args)
+    result = asyncio.run(run(args))
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    sys.exit(1 if result["ihlaller"] else 0)
+
+
+if __name__ == "__main__":
+    main()
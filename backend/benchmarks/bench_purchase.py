@@ -0,0 +1,151 @@
+"""
+Purchase concurrency benchmark
+
+Fires thousands of parallel POST /api/market/satin-al requests at a single
+limited-stock item through the in-process ASGI app and a local mongod, then
+checks that no stock was oversold and no credit was double-spent.
+
+    MONGO_URL=mongodb://localhost:27017 python benchmarks/bench_purchase.py \
+        --purchases 5000 --users 300 --stock 1000 --concurrency 500
+
+The benchmark always uses its own database (BENCH_DB_NAME, default
+"rexagon_bench") and drops the collections it touches.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ["DB_NAME"] = os.environ.get("BENCH_DB_NAME", "rexagon_bench")
+
+import httpx  # noqa: E402
+import server  # noqa: E402
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def seed(args):
+    db = server.db
+    for collection in ("users", "market_items", "purchases", "idempotency_keys"):
+        await db[collection].drop()
+    await server.ensure_indexes()
+
+    now = datetime.now(timezone.utc).isoformat()
+    users = [{
+        "id": str(uuid.uuid4()),
+        "kullanici_adi": f"bench_{i}",
+        "email": f"bench_{i}@example.com",
+        "sifre_hash": "",
+        "kredi": args.credit,
+        "rol": "user",
+        "yetki": "Oyuncu",
+        "kayit_tarihi": now
+    } for i in range(args.users)]
+    await db.users.insert_many(users)
+
+    item = {
+        "id": str(uuid.uuid4()),
+        "isim": "Bench Paketi",
+        "aciklama": "benchmark",
+        "fiyat": args.price,
+        "kategori": "Paketler",
+        "stok": args.stock,
+        "gorsel": "",
+        "indirim": 0,
+        "olusturulma_tarihi": now
+    }
+    await db.market_items.insert_one(item)
+    return users, item
+
+
+async def verify(args, users, item):
+    db = server.db
+    final_item = await db.market_items.find_one({"id": item["id"]})
+    purchase_count = await db.purchases.count_documents({"urun_id": item["id"]})
+    balances = await db.users.find({}, {"_id": 0, "kredi": 1}).to_list(None)
+    spent = sum(args.credit - u["kredi"] for u in balances)
+    return {
+        "kalan_stok": final_item["stok"],
+        "satin_alma": purchase_count,
+        "harcanan_kredi": spent,
+        "negatif_bakiye": sum(1 for u in balances if u["kredi"] < 0),
+        "ihlaller": [
+            message for failed, message in [
+                (final_item["stok"] < 0, "stok negatif"),
+                (args.stock - final_item["stok"] != purchase_count, "stok ile satış sayısı uyuşmuyor"),
+                (spent != purchase_count * args.price, "harcanan kredi satışlarla uyuşmuyor"),
+                (any(u["kredi"] < 0 for u in balances), "negatif bakiye"),
+            ] if failed
+        ]
+    }
+
+
+async def run(args):
+    users, item = await seed(args)
+    tokens = [server.create_access_token(data={"sub": u["id"]}) for u in users]
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+    statuses = {}
+
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        async def purchase(i):
+            headers = {"Authorization": f"Bearer {tokens[i % len(tokens)]}"}
+            if args.idempotent:
+                # Her anahtar iki kez gönderilir; ikinci istek ilk yanıtı almalı
+                headers["Idempotency-Key"] = f"bench-{i // 2}"
+            async with semaphore:
+                start = time.perf_counter()
+                response = await http.post(f"/api/market/satin-al/{item['id']}", headers=headers)
+                latencies.append((time.perf_counter() - start) * 1000)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(purchase(i) for i in range(args.purchases)))
+        elapsed = time.perf_counter() - started
+
+    result = {
+        "istek": args.purchases,
+        "sure_sn": round(elapsed, 3),
+        "rps": round(args.purchases / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "durum_kodlari": statuses,
+        **await verify(args, users, item)
+    }
+    server.client.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--purchases", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=300)
+    parser.add_argument("--stock", type=int, default=1000)
+    parser.add_argument("--price", type=float, default=10.0)
+    parser.add_argument("--credit", type=float, default=50.0)
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--idempotent", action="store_true", help="send every Idempotency-Key twice")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    sys.exit(1 if result["ihlaller"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,367 @@
-from fastapi import FastAPI, APIRouter, Depends, HTTPException, status
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, Header, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.routing import compile_path
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import IndexModel, UpdateOne, UpdateMany, ReplaceOne, ASCENDING, DESCENDING, TEXT, ReturnDocument
+from pymongo import monitoring
+from pymongo.collation import Collation
+from pymongo.errors import OperationFailure, DuplicateKeyError, BulkWriteError, PyMongoError
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict, EmailStr
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import datetime, timezone, timedelta
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 import uuid
+import time
+import json
+import base64
+import binascii
+import csv
+import io
+import html
+import hmac
+import hashlib
+import secrets
+import asyncio
+import contextvars
+import threading
+import re
+import struct
+from collections import OrderedDict, deque
+from urllib.parse import parse_qsl
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
-
 # JWT Configuration
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "minecraft-server-secret-key-change-in-production")
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 10080  # 7 days
+# Erişim token'ları kısa ömürlüdür; istemci oturumu refresh token ile yeniler.
+# Refresh token her kullanımda döndürülür, son kullanımdan bu kadar gün sonra düşer.
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "15"))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+SESSION_REUSE_HISTORY = int(os.getenv("SESSION_REUSE_HISTORY", "20"))
+# Bir önceki refresh token bu kadar saniye daha kabul edilir ve güncel çifti
+# döndürür; aynı anda yenileyen sekmeler birbirinin oturumunu kapatmaz.
+SESSION_REFRESH_GRACE_SECONDS = float(os.getenv("SESSION_REFRESH_GRACE_SECONDS", "30"))
+# Token iptalleri (şifre değişikliği, rol değişikliği, silme) diğer işçilerden
+# bu aralıkla çekilir
+TOKEN_REVOCATION_SYNC_SECONDS = float(os.getenv("TOKEN_REVOCATION_SYNC_SECONDS", "5"))
+
+# Kimliği doğrulanmış kullanıcı önbelleği
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+USER_CACHE_MAX_SIZE = int(os.getenv("USER_CACHE_MAX_SIZE", "10000"))
+
+# bcrypt havuzu: "thread" (bcrypt GIL'i bırakır) veya "process"
+HASH_EXECUTOR_KIND = os.getenv("HASH_EXECUTOR_KIND", "thread")
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", "4"))
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", "64"))
+
+# Herkese açık okuma route'ları için yanıt önbelleği. REDIS_URL verilirse
+# (ve redis paketi kuruluysa) işçiler arasında paylaşılan Redis kullanılır.
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "60"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+REDIS_URL = os.getenv("REDIS_URL")
+
+# İstek sınırlama (token bucket). REDIS_URL verilirse kovalar işçiler arasında
+# Redis'te paylaşılır. RATE_LIMIT_PROXY_HOPS, uygulamanın önündeki güvenilen
+# proxy sayısıdır (ör. ingress arkasında 1); istemci IP'si X-Forwarded-For'da
+# sağdan bu kadar adres geride okunur, daha soldaki (istemcinin kendi
+# yazabildiği) değerler yok sayılır. 0 iken bağlantının karşı adresi kullanılır;
+# proxy arkasında 0 bırakılırsa tüm istemciler proxy'nin tek kovasını paylaşır.
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+RATE_LIMIT_PROXY_HOPS = int(os.getenv("RATE_LIMIT_PROXY_HOPS", "0"))
+RATE_LIMIT_GENERAL_PER_MINUTE = int(os.getenv("RATE_LIMIT_GENERAL_PER_MINUTE", "600"))
+RATE_LIMIT_LOGIN_PER_MINUTE = int(os.getenv("RATE_LIMIT_LOGIN_PER_MINUTE", "30"))
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+
+# Katalog ve haber yanıtları için ETag / Cache-Control
+ETAG_VERSION_TTL_SECONDS = float(os.getenv("ETAG_VERSION_TTL_SECONDS", "2"))
+CATALOG_CACHE_CONTROL = os.getenv("CATALOG_CACHE_CONTROL", "public, max-age=30, stale-while-revalidate=300")
+
+# Sıralama tabloları: bellekte tutulan aday sayısı ve tam yenileme aralığı
+LEADERBOARD_SIZE = 10
+LEADERBOARD_BUFFER = int(os.getenv("LEADERBOARD_BUFFER", "100"))
+LEADERBOARD_REFRESH_SECONDS = int(os.getenv("LEADERBOARD_REFRESH_SECONDS", "300"))
+
+# Minecraft RCON teslimatı. RCON_HOST boşsa komutlar kuyrukta bekler.
+RCON_HOST = os.getenv("RCON_HOST")
+RCON_PORT = int(os.getenv("RCON_PORT", "25575"))
+RCON_PASSWORD = os.getenv("RCON_PASSWORD", "")
+RCON_POOL_SIZE = int(os.getenv("RCON_POOL_SIZE", "2"))
+RCON_TIMEOUT_SECONDS = float(os.getenv("RCON_TIMEOUT_SECONDS", "5"))
+DELIVERY_BATCH_SIZE = int(os.getenv("DELIVERY_BATCH_SIZE", "20"))
+DELIVERY_MAX_ATTEMPTS = int(os.getenv("DELIVERY_MAX_ATTEMPTS", "8"))
+DELIVERY_BACKOFF_SECONDS = float(os.getenv("DELIVERY_BACKOFF_SECONDS", "2"))
+DELIVERY_MAX_BACKOFF_SECONDS = float(os.getenv("DELIVERY_MAX_BACKOFF_SECONDS", "600"))
+DELIVERY_POLL_SECONDS = float(os.getenv("DELIVERY_POLL_SECONDS", "1"))
+DELIVERY_LEASE_SECONDS = float(os.getenv("DELIVERY_LEASE_SECONDS", "60"))
+
+# Ödeme sağlayıcı bildirimleri (PayTR / Shopier). Anahtarı verilmeyen
+# sağlayıcının bildirim adresi kapalıdır.
+PAYTR_MERCHANT_KEY = os.getenv("PAYTR_MERCHANT_KEY", "")
+PAYTR_MERCHANT_SALT = os.getenv("PAYTR_MERCHANT_SALT", "")
+SHOPIER_API_SECRET = os.getenv("SHOPIER_API_SECRET", "")
+SETTLEMENT_WORKERS = int(os.getenv("SETTLEMENT_WORKERS", "2"))
+SETTLEMENT_BATCH_SIZE = int(os.getenv("SETTLEMENT_BATCH_SIZE", "50"))
+SETTLEMENT_MAX_ATTEMPTS = int(os.getenv("SETTLEMENT_MAX_ATTEMPTS", "8"))
+SETTLEMENT_BACKOFF_SECONDS = float(os.getenv("SETTLEMENT_BACKOFF_SECONDS", "1"))
+SETTLEMENT_POLL_SECONDS = float(os.getenv("SETTLEMENT_POLL_SECONDS", "1"))
+SETTLEMENT_LEASE_SECONDS = float(os.getenv("SETTLEMENT_LEASE_SECONDS", "60"))
+
+# Minecraft sunucu durumu (Server List Ping) örnekleyicisi
+MC_STATUS_HOST = os.getenv("MC_STATUS_HOST")
+MC_STATUS_PORT = int(os.getenv("MC_STATUS_PORT", "25565"))
+STATUS_POLL_SECONDS = float(os.getenv("STATUS_POLL_SECONDS", "15"))
+STATUS_TIMEOUT_SECONDS = float(os.getenv("STATUS_TIMEOUT_SECONDS", "3"))
+STATUS_HISTORY_SIZE = int(os.getenv("STATUS_HISTORY_SIZE", "240"))
+STATUS_BREAKER_THRESHOLD = int(os.getenv("STATUS_BREAKER_THRESHOLD", "3"))
+STATUS_BREAKER_COOLDOWN_SECONDS = float(os.getenv("STATUS_BREAKER_COOLDOWN_SECONDS", "60"))
+USER_COUNT_RESYNC_SECONDS = float(os.getenv("USER_COUNT_RESYNC_SECONDS", "300"))
+
+# Canlı olay yayını (SSE). LIVE_CHANGE_STREAMS açıksa olaylar live_events
+# koleksiyonuna yazılır ve her işçi change stream ile dinler (replica set gerekir).
+LIVE_QUEUE_SIZE = int(os.getenv("LIVE_QUEUE_SIZE", "100"))
+LIVE_REPLAY_SIZE = int(os.getenv("LIVE_REPLAY_SIZE", "500"))
+LIVE_HEARTBEAT_SECONDS = float(os.getenv("LIVE_HEARTBEAT_SECONDS", "15"))
+LIVE_MAX_SUBSCRIBERS = int(os.getenv("LIVE_MAX_SUBSCRIBERS", "10000"))
+LIVE_CHANGE_STREAMS = os.getenv("LIVE_CHANGE_STREAMS", "").lower() in ("1", "true", "yes")
+LIVE_EVENT_TTL_SECONDS = int(os.getenv("LIVE_EVENT_TTL_SECONDS", "3600"))
+
+# Kredi defteri: bakiye anlık görüntüleri aralığı ve yazılmakta olan kayıtlar
+# için bırakılan pay
+LEDGER_SNAPSHOT_SECONDS = float(os.getenv("LEDGER_SNAPSHOT_SECONDS", "3600"))
+LEDGER_SNAPSHOT_LAG_SECONDS = float(os.getenv("LEDGER_SNAPSHOT_LAG_SECONDS", "60"))
+
+# Toplu yönetici işlemlerinde tek seferde işlenen belge sayısı
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "1000"))
+BULK_MAX_IDS = int(os.getenv("BULK_MAX_IDS", "100000"))
+# Transaction olmayan kurulumda eşzamanlı değişen bakiyeler için toplu kredi
+# atamasının kaç kez yeniden deneneceği
+BULK_CREDIT_RETRIES = int(os.getenv("BULK_CREDIT_RETRIES", "5"))
+
+# Dışa aktarımda Mongo'dan çekilen ve tek parça olarak yazılan satır sayısı
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+# Idempotency-Key ile tekrarlanan satın alma isteklerinin saklanma süresi
+IDEMPOTENCY_KEY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_KEY_TTL_SECONDS", "86400"))
+
+# /metrics (Prometheus). METRICS_TOKEN verilirse Bearer token olarak istenir.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+METRICS_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRICS_QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# ============ METRICS ============
+
+# MetricsMiddleware her istek için route şablonu, metod ve durum koduna göre
+# gecikme histogramı tutar. Motor komutları executor thread'lerinde çalışsa da
+# contextvar kopyalandığı için QueryMetricsListener her Mongo komutunu onu
+# başlatan route'a yazar; istek dışındaki komutlar "arka_plan" sayılır.
+# Sorgu/istek histogramı N+1 desenlerini bulmak içindir.
+
+BACKGROUND_ROUTE = "arka_plan"
+
+class RequestContext:
+    __slots__ = ("scope", "queries")
+
+    def __init__(self, scope: dict):
+        self.scope = scope
+        self.queries = 0
+
+    @property
+    def route(self) -> str:
+        route = self.scope.get("route")
+        return route.path if route is not None else "eslesmeyen"
+
+current_request: contextvars.ContextVar = contextvars.ContextVar("current_request", default=None)
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "total", "count")
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.total += value
+        self.count += 1
+
+def _label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _labels(**labels) -> str:
+    return ",".join(f'{name}="{_label_value(value)}"' for name, value in labels.items())
+
+class MetricsRegistry:
+    def __init__(self):
+        self.latency: Dict[tuple, Histogram] = {}
+        self.queries_per_request: Dict[str, Histogram] = {}
+        self.statuses: Dict[tuple, int] = {}
+        self.in_flight = 0
+        # (route, komut, koleksiyon) -> [adet, süre, dönen belge, hata]
+        self.mongo: Dict[tuple, list] = {}
+        self._mongo_lock = threading.Lock()
+
+    def observe_request(self, ctx: RequestContext, method: str, status_code: int, seconds: float):
+        route = ctx.route
+        key = (route, method)
+        if key not in self.latency:
+            self.latency[key] = Histogram(METRICS_LATENCY_BUCKETS)
+        self.latency[key].observe(seconds)
+        status_key = (route, method, status_code)
+        self.statuses[status_key] = self.statuses.get(status_key, 0) + 1
+        if route not in self.queries_per_request:
+            self.queries_per_request[route] = Histogram(METRICS_QUERY_BUCKETS)
+        self.queries_per_request[route].observe(ctx.queries)
+
+    def observe_command(self, route: str, command: str, collection: str, seconds: float, documents: int, failed: bool):
+        # Listener executor thread'lerinden çağrılır
+        key = (route, command, collection)
+        with self._mongo_lock:
+            totals = self.mongo.get(key)
+            if totals is None:
+                totals = self.mongo[key] = [0, 0.0, 0, 0]
+            totals[0] += 1
+            totals[1] += seconds
+            totals[2] += documents
+            totals[3] += failed
+
+    def render(self) -> str:
+        lines = [
+            "# HELP rexagon_http_request_duration_seconds Request latency by route template",
+            "# TYPE rexagon_http_request_duration_seconds histogram",
+        ]
+        for (route, method), hist in sorted(self.latency.items()):
+            lines.extend(self._histogram_lines("rexagon_http_request_duration_seconds", hist, route=route, method=method))
+        lines += [
+            "# HELP rexagon_http_requests_total Responses by route template and status code",
+            "# TYPE rexagon_http_requests_total counter",
+        ]
+        for (route, method, status_code), count in sorted(self.statuses.items()):
+            lines.append(f"rexagon_http_requests_total{{{_labels(route=route, method=method, status=status_code)}}} {count}")
+        lines += [
+            "# HELP rexagon_http_requests_in_flight Requests currently being served",
+            "# TYPE rexagon_http_requests_in_flight gauge",
+            f"rexagon_http_requests_in_flight {self.in_flight}",
+            "# HELP rexagon_mongo_queries_per_request Mongo commands issued per request",
+            "# TYPE rexagon_mongo_queries_per_request histogram",
+        ]
+        for route, hist in sorted(self.queries_per_request.items()):
+            lines.extend(self._histogram_lines("rexagon_mongo_queries_per_request", hist, route=route))
+        with self._mongo_lock:
+            mongo = sorted((key, list(totals)) for key, totals in self.mongo.items())
+        for index, (name, kind, help_text) in enumerate([
+            ("rexagon_mongo_commands_total", "counter", "Mongo commands by originating route"),
+            ("rexagon_mongo_command_seconds_total", "counter", "Time spent in Mongo commands"),
+            ("rexagon_mongo_documents_returned_total", "counter", "Documents returned by Mongo commands"),
+            ("rexagon_mongo_command_errors_total", "counter", "Failed Mongo commands"),
+        ]):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            for (route, command, collection), totals in mongo:
+                value = round(totals[index], 6) if index == 1 else totals[index]
+                lines.append(f"{name}{{{_labels(route=route, command=command, collection=collection)}}} {value}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _histogram_lines(name: str, hist: Histogram, **labels) -> List[str]:
+        label_text = _labels(**labels)
+        lines = []
+        cumulative = 0
+        for bound, count in zip(hist.buckets, hist.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{label_text},le="+Inf"}} {hist.count}')
+        lines.append(f"{name}_sum{{{label_text}}} {round(hist.total, 6)}")
+        lines.append(f"{name}_count{{{label_text}}} {hist.count}")
+        return lines
+
+metrics = MetricsRegistry()
+
+def _returned_documents(reply: dict) -> int:
+    cursor = reply.get("cursor")
+    if cursor is not None:
+        return len(cursor.get("firstBatch") or cursor.get("nextBatch") or [])
+    if "value" in reply:
+        return 1 if reply["value"] is not None else 0
+    return 0
+
+class QueryMetricsListener(monitoring.CommandListener):
+    def __init__(self):
+        self._pending = {}
+
+    def started(self, event):
+        ctx = current_request.get()
+        if ctx is not None:
+            ctx.queries += 1
+        collection = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            collection = event.command.get("collection")
+        self._pending[(event.connection_id, event.request_id)] = (
+            ctx.route if ctx is not None else BACKGROUND_ROUTE,
+            collection if isinstance(collection, str) else ""
+        )
+
+    def succeeded(self, event):
+        self._finish(event, _returned_documents(event.reply), False)
+
+    def failed(self, event):
+        self._finish(event, 0, True)
+
+    def _finish(self, event, documents: int, failed: bool):
+        pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if pending is None:
+            return
+        route, collection = pending
+        metrics.observe_command(route, event.command_name, collection, event.duration_micros / 1e6, documents, failed)
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        ctx = RequestContext(scope)
+        token = current_request.set(ctx)
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        metrics.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            metrics.in_flight -= 1
+            metrics.observe_request(ctx, scope["method"], status_code, time.perf_counter() - started)
+            current_request.reset(token)
+
+# MongoDB connection
+mongo_url = os.environ['MONGO_URL']
+client = AsyncIOMotorClient(mongo_url, event_listeners=[QueryMetricsListener()])
+db = client[os.environ['DB_NAME']]
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/giris")
@@ -49,6 +386,11 @@ class UserLogin(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+    expires_in: Optional[int] = None
+
+class TokenYenile(BaseModel):
+    refresh_token: str
 
 class UserResponse(BaseModel):
     id: str
@@ -83,75 +425,2524 @@ class MarketUrun(BaseModel):
     stok: int
     gorsel: Optional[str] = None
     indirim: Optional[float] = 0
+    komut: Optional[str] = None  # Örn. "give {oyuncu} minecraft:diamond 1"
 
 class Haber(BaseModel):
     baslik: str
     icerik: str
 
-class KrediYukle(BaseModel):
-    tutar: float
+class KrediYukle(BaseModel):
+    tutar: float
+
+class ReportCreate(BaseModel):
+    baslik: str
+    aciklama: str
+    konu: str
+
+class ThemeCreate(BaseModel):
+    isim: str
+    gorsel_url: str
+    fiyat: float = 0
+
+class SifreDegistir(BaseModel):
+    eski_sifre: str
+    yeni_sifre: str
+
+class BiyografiGuncelle(BaseModel):
+    biyografi: str
+
+class KullaniciFiltre(BaseModel):
+    rol: Optional[str] = None
+    yetki: Optional[str] = None
+    kredi_min: Optional[float] = None
+    kredi_max: Optional[float] = None
+    kayit_sonrasi: Optional[str] = None
+    kayit_oncesi: Optional[str] = None
+
+class TopluKullaniciGuncelle(BaseModel):
+    idler: Optional[List[str]] = None
+    filtre: Optional[KullaniciFiltre] = None
+    kredi: Optional[float] = None
+    kredi_ekle: Optional[float] = None
+    rol: Optional[str] = None
+    yetki: Optional[str] = None
+    yetki_gorseli: Optional[str] = None
+
+class TopluKullaniciSil(BaseModel):
+    idler: Optional[List[str]] = None
+    filtre: Optional[KullaniciFiltre] = None
+
+class IceAktarilanKullanici(BaseModel):
+    kullanici_adi: str = Field(..., min_length=3, max_length=20)
+    email: EmailStr
+    sifre_hash: str
+    dogum_tarihi: Optional[str] = None
+    kayit_tarihi: Optional[str] = None
+
+class TopluKullaniciIceAktar(BaseModel):
+    kullanicilar: List[IceAktarilanKullanici]
+
+class UrunFiltre(BaseModel):
+    kategori: Optional[str] = None
+    fiyat_min: Optional[float] = None
+    fiyat_max: Optional[float] = None
+
+class TopluUrunGuncelle(BaseModel):
+    idler: Optional[List[str]] = None
+    filtre: Optional[UrunFiltre] = None
+    fiyatlar: Optional[Dict[str, float]] = None
+    fiyat: Optional[float] = None
+    fiyat_carpani: Optional[float] = None
+    indirim: Optional[int] = None
+    stok: Optional[int] = None
+    kategori: Optional[str] = None
+
+class TopluUrunSil(BaseModel):
+    idler: Optional[List[str]] = None
+    filtre: Optional[UrunFiltre] = None
+
+class TopluCevapSil(BaseModel):
+    idler: List[str]
+
+class RaporFiltre(BaseModel):
+    konu: Optional[str] = None
+    oncesi: Optional[str] = None
+
+class TopluRaporSil(BaseModel):
+    idler: Optional[List[str]] = None
+    filtre: Optional[RaporFiltre] = None
+
+# ============ INDEXES ============
+
+# Startup'ta oluşturulan indeks listesi. Her koleksiyon için sorgulanan alanlar
+# burada tanımlanır; create_indexes var olan indeksleri tekrar oluşturmaz.
+CASE_INSENSITIVE = Collation(locale="en", strength=2)
+
+INDEX_MANIFEST = {
+    "users": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        # Birebir indeksler giriş sorgularına hizmet eder; büyük/küçük harf
+        # duyarsız tekillik indeksleri USER_UNIQUE_INDEXES'te
+        IndexModel([("kullanici_adi", ASCENDING)], unique=True),
+        IndexModel([("email", ASCENDING)], unique=True),
+        IndexModel([("kredi", DESCENDING)]),
+        IndexModel([("dinar", DESCENDING)]),
+        IndexModel([("ada_seviyesi", DESCENDING)]),
+        IndexModel([("kayit_tarihi", DESCENDING)]),
+        IndexModel([("yazar_senkron_bekliyor", ASCENDING)], sparse=True),
+    ],
+    "forum_categories": [
+        IndexModel([("isim", ASCENDING)]),
+    ],
+    "forum_topics": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("kategori", ASCENDING), ("tarih", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("yazar_id", ASCENDING)]),
+    ],
+    "forum_replies": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("konu_id", ASCENDING), ("tarih", ASCENDING), ("id", ASCENDING)]),
+        IndexModel([("yazar_id", ASCENDING)]),
+    ],
+    "news": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("tarih", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("yazar_id", ASCENDING)]),
+    ],
+    "market_categories": [
+        IndexModel([("isim", ASCENDING)]),
+    ],
+    "market_items": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("kategori", ASCENDING)]),
+    ],
+    "purchases": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("tarih", DESCENDING)]),
+        IndexModel([("urun_id", ASCENDING)]),
+        IndexModel([("kullanici_id", ASCENDING), ("tarih", DESCENDING)]),
+    ],
+    "credit_transactions": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("kullanici_id", ASCENDING), ("tarih", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("tip", ASCENDING), ("tarih", DESCENDING)]),
+        IndexModel([("tarih", ASCENDING)]),
+        IndexModel([("siparis_no", ASCENDING)], unique=True, sparse=True),
+    ],
+    "payment_events": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("saglayici", ASCENDING), ("saglayici_islem_id", ASCENDING)], unique=True),
+        IndexModel([("durum", ASCENDING), ("sonraki_deneme", ASCENDING)]),
+        IndexModel([("kilit", ASCENDING)]),
+    ],
+    "sessions": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("kullanici_id", ASCENDING)]),
+        IndexModel([("son_kullanma", ASCENDING)], expireAfterSeconds=0),
+    ],
+    "token_revocations": [
+        IndexModel([("tarih", ASCENDING)]),
+        IndexModel([("son_kullanma", ASCENDING)], expireAfterSeconds=0),
+    ],
+    "reports": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("tarih", DESCENDING)]),
+    ],
+    "themes": [
+        IndexModel([("id", ASCENDING)], unique=True),
+    ],
+    "product_sales": [
+        IndexModel([("urun_id", ASCENDING), ("donem", ASCENDING)], unique=True),
+        IndexModel([("donem", ASCENDING), ("satis_sayisi", DESCENDING)]),
+    ],
+    "minecraft_commands": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("durum", ASCENDING), ("sonraki_deneme", ASCENDING)]),
+        IndexModel([("kilit", ASCENDING)]),
+    ],
+    "idempotency_keys": [
+        IndexModel([("kullanici_id", ASCENDING), ("anahtar", ASCENDING)], unique=True),
+        IndexModel([("son_kullanma", ASCENDING)], expireAfterSeconds=0),
+    ],
+    "credit_ledger": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("kullanici_id", ASCENDING), ("tarih", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("islem_id", ASCENDING)]),
+        IndexModel([("tarih", ASCENDING)]),
+    ],
+    "credit_snapshots": [
+        IndexModel([("kullanici_id", ASCENDING), ("tarih", DESCENDING)], unique=True),
+    ],
+    "search_documents": [
+        IndexModel(
+            [("arama_baslik", TEXT), ("arama_metin", TEXT)],
+            weights={"arama_baslik": 3, "arama_metin": 1},
+            default_language="none",
+            name="arama_metni"
+        ),
+        IndexModel([("konu_id", ASCENDING)], sparse=True),
+    ],
+    "live_events": [
+        IndexModel([("tarih", ASCENDING)], expireAfterSeconds=LIVE_EVENT_TTL_SECONDS),
+    ],
+}
+
+# Route başına temsili sorgu: (koleksiyon, filtre, sıralama).
+# Aggregation kullanan route'larda ilk $match/$sort aşaması alınır,
+# $lookup'lar ise yabancı koleksiyondaki eşitlik sorgusu olarak eklenir.
+ROUTE_QUERIES = {
+    "get_current_user": ("users", {"id": ""}, None),
+    "giris_yap": ("users", {"kullanici_adi": ""}, None),
+    "kayit_ol (email)": ("users", {"email": ""}, None),
+    "get_top_credits": ("users", {}, [("kredi", DESCENDING)]),
+    "get_latest_users": ("users", {}, [("kayit_tarihi", DESCENDING)]),
+    "get_top_island_level": ("users", {}, [("ada_seviyesi", DESCENDING)]),
+    "get_top_dinar": ("users", {}, [("dinar", DESCENDING)]),
+    "get_latest_purchases": ("purchases", {}, [("tarih", DESCENDING)]),
+    "get_latest_credit_loads": ("credit_transactions", {"tip": "yukleme"}, [("tarih", DESCENDING)]),
+    "get_forum_topics": ("forum_topics", {"kategori": ""}, [("tarih", DESCENDING), ("id", DESCENDING)]),
+    "get_forum_topic": ("forum_topics", {"id": ""}, None),
+    "get_forum_topic (cevaplar)": ("forum_replies", {"konu_id": ""}, [("tarih", ASCENDING), ("id", ASCENDING)]),
+    "get_wallet_history": ("credit_transactions", {"kullanici_id": ""}, [("tarih", DESCENDING), ("id", DESCENDING)]),
+    "get_best_sellers": ("product_sales", {"donem": "toplam"}, [("satis_sayisi", DESCENDING)]),
+    "get_best_sellers ($lookup urun)": ("market_items", {"id": ""}, None),
+    "get_market_items": ("market_items", {"kategori": ""}, None),
+    "get_market_item": ("market_items", {"id": ""}, None),
+    "get_news": ("news", {}, [("tarih", DESCENDING), ("id", DESCENDING)]),
+    "get_news_detail": ("news", {"id": ""}, None),
+    "get_all_reports": ("reports", {}, [("tarih", DESCENDING)]),
+    "purchase_theme": ("themes", {"id": ""}, None),
+    "search": ("search_documents", {"$text": {"$search": "x"}}, None),
+}
+
+# Kayıt ve içe aktarma kullanıcı adı/email tekilliği için bu indekslere
+# güvenir. Mevcut veride yalnızca harf farkıyla tekrar eden kayıt varsa
+# oluşturulamazlar; her biri ayrı komutla kurulur ki diğer users indekslerini
+# ve birbirini düşürmesin. Eksik olan alan için kayıt eski ön kontrole döner.
+USER_UNIQUE_INDEXES = [
+    IndexModel([("kullanici_adi", ASCENDING)], name="kullanici_adi_ci", unique=True, collation=CASE_INSENSITIVE),
+    IndexModel([("email", ASCENDING)], name="email_ci", unique=True, collation=CASE_INSENSITIVE),
+]
+registration_state = {"indeksli_alanlar": set()}
+
+async def ensure_indexes():
+    for collection, indexes in INDEX_MANIFEST.items():
+        try:
+            await db[collection].create_indexes(indexes)
+        except OperationFailure as e:
+            # Örn. mevcut veride tekrar eden kullanıcı adı varsa unique indeks oluşturulamaz
+            logger.error(f"{collection} indeksleri oluşturulamadı: {e}")
+    await ensure_user_unique_indexes()
+
+async def ensure_user_unique_indexes():
+    for index in USER_UNIQUE_INDEXES:
+        try:
+            await db.users.create_indexes([index])
+        except OperationFailure as e:
+            logger.error(f"users {index.document['name']} indeksi oluşturulamadı: {e}")
+    existing = await db.users.index_information()
+    registration_state["indeksli_alanlar"] = {
+        next(iter(index.document["key"])) for index in USER_UNIQUE_INDEXES if index.document["name"] in existing
+    }
+    missing = set(USER_DUPLICATE_MESSAGES) - registration_state["indeksli_alanlar"]
+    if missing:
+        logger.error(f"Tekillik indeksi eksik ({', '.join(sorted(missing))}); kayıt ön kontrolle yapılıyor, içe aktarma kapalı")
+
+def _plan_indexes(plan: dict) -> List[str]:
+    # winningPlan ağacında kullanılan indeks isimlerini topla
+    if "queryPlan" in plan:
+        plan = plan["queryPlan"]
+    found = []
+    if plan.get("stage") == "IXSCAN":
+        found.append(plan.get("indexName"))
+    elif plan.get("stage") == "COLLSCAN":
+        found.append("COLLSCAN")
+    children = plan.get("inputStages", [])
+    if "inputStage" in plan:
+        children = children + [plan["inputStage"]]
+    for child in children:
+        found.extend(_plan_indexes(child))
+    return found
+
+async def explain_route_queries():
+    report = {}
+    for route, (collection, query, sort) in ROUTE_QUERIES.items():
+        cursor = db[collection].find(query).limit(10)
+        if sort:
+            cursor = cursor.sort(sort)
+        explanation = await cursor.explain()
+        winning_plan = explanation.get("queryPlanner", {}).get("winningPlan", {})
+        report[route] = {
+            "koleksiyon": collection,
+            "indeksler": _plan_indexes(winning_plan) or ["EOF"]
+        }
+    return report
+
+# ============ USER CACHE ============
+
+class UserCache:
+    """TTL + LRU cache of user documents keyed by user id.
+
+    Entries are dropped explicitly by the write paths that change a user; the
+    TTL bounds staleness for writes made by other worker processes.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: str) -> Optional[dict]:
+        entry = self._entries.get(user_id)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[user_id]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return dict(entry[1])
+
+    def set(self, user_id: str, user: dict):
+        self._entries[user_id] = (time.monotonic() + self.ttl, dict(user))
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str):
+        self._entries.pop(user_id, None)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "boyut": len(self._entries),
+            "hit": self.hits,
+            "miss": self.misses,
+            "hit_orani": self.hits / total if total else 0.0
+        }
+
+user_cache = UserCache(USER_CACHE_MAX_SIZE, USER_CACHE_TTL_SECONDS)
+
+# ============ RESPONSE CACHE ============
+
+class MemoryCacheBackend:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    async def set(self, key: str, value: str, ttl: float):
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def delete_prefix(self, prefix: str):
+        for key in [k for k in self._entries if k.startswith(prefix)]:
+            del self._entries[key]
+
+class RedisCacheBackend:
+    KEY_PREFIX = "rexagon:yanit:"
+
+    def __init__(self, url: str):
+        self._redis = aioredis.from_url(url, decode_responses=True)
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._redis.get(self.KEY_PREFIX + key)
+
+    async def set(self, key: str, value: str, ttl: float):
+        await self._redis.set(self.KEY_PREFIX + key, value, px=max(int(ttl * 1000), 1))
+
+    async def delete_prefix(self, prefix: str):
+        keys = [k async for k in self._redis.scan_iter(match=f"{self.KEY_PREFIX}{prefix}*")]
+        if keys:
+            await self._redis.delete(*keys)
+
+class ResponseCache:
+    """Caches JSON-serializable route results under ``group:route:params``.
+
+    Write routes invalidate whole groups. Concurrent misses on the same key
+    wait for a single computation instead of all hitting Mongo.
+    """
+
+    def __init__(self, backend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self._locks = {}
+        self._route_stats = {}
+
+    def _count(self, route: str, outcome: str):
+        stats = self._route_stats.setdefault(route, {"hit": 0, "miss": 0})
+        stats[outcome] += 1
+
+    async def get_or_compute(self, group: str, route: str, params: str, compute, ttl: Optional[float] = None):
+        key = f"{group}:{route}:{params}"
+        cached = await self.backend.get(key)
+        if cached is not None:
+            self._count(route, "hit")
+            return json.loads(cached)
+        
+        # [kilit, bekleyen sayısı]; son çıkan girdiyi siler
+        entry = self._locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                cached = await self.backend.get(key)
+                if cached is not None:
+                    self._count(route, "hit")
+                    return json.loads(cached)
+                self._count(route, "miss")
+                value = await compute()
+                await self.backend.set(key, json.dumps(value), ttl or self.ttl)
+                return value
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and self._locks.get(key) is entry:
+                del self._locks[key]
+
+    async def invalidate(self, *groups: str):
+        for group in groups:
+            await self.backend.delete_prefix(f"{group}:")
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self.backend).__name__,
+            "routes": {
+                route: {**counts, "hit_orani": counts["hit"] / (counts["hit"] + counts["miss"])}
+                for route, counts in self._route_stats.items()
+            }
+        }
+
+def _create_cache_backend():
+    if REDIS_URL:
+        if aioredis is not None:
+            return RedisCacheBackend(REDIS_URL)
+        logging.getLogger(__name__).warning("REDIS_URL ayarlı ama redis paketi kurulu değil, bellek içi önbellek kullanılıyor")
+    return MemoryCacheBackend(RESPONSE_CACHE_MAX_ENTRIES)
+
+response_cache = ResponseCache(_create_cache_backend(), RESPONSE_CACHE_TTL_SECONDS)
+
+# ============ RATE LIMITING ============
+
+# Her politika (ad, kapsam, kapasite, süre_sn) bir token bucket'tır: kova
+# kapasite kadar anlık isteğe izin verir ve süre boyunca kapasite kadar dolar.
+# Kapsam "ip" istemci adresine, "kullanici" token'daki kullanıcıya göre ayırır
+# (token imzası doğrulanır, veritabanına bakılmaz). Kontrol routing'den önce
+# yapılır, reddedilen istek hiçbir Mongo ya da bcrypt işi başlatmaz.
+
+RATE_LIMIT_POLICIES = {
+    ("POST", "/api/auth/giris"): [("giris", "ip", RATE_LIMIT_LOGIN_PER_MINUTE, 60)],
+    ("POST", "/api/auth/kayit"): [("kayit", "ip", 5, 600)],
+    ("POST", "/api/auth/yenile"): [("yenile", "ip", 30, 60)],
+    ("POST", "/api/forum/konu"): [("forum-konu", "kullanici", 5, 300)],
+    ("POST", "/api/forum/konu/{konu_id}/cevap"): [("forum-cevap", "kullanici", 10, 60), ("forum-cevap-ip", "ip", 30, 60)],
+    ("POST", "/api/reports"): [("rapor", "kullanici", 5, 600)],
+    ("POST", "/api/cuzdan/yukle"): [("cuzdan-yukle", "kullanici", 5, 300)],
+}
+RATE_LIMIT_DEFAULT = [("genel", "ip", RATE_LIMIT_GENERAL_PER_MINUTE, 60)]
+# Ödeme sağlayıcıları ve metrik toplayıcı yüksek hızda çağırır
+RATE_LIMIT_EXEMPT = ["/api/odeme/bildirim/{saglayici}", "/metrics"]
+
+class MemoryRateLimitBackend:
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+
+    async def take(self, key: str, capacity: int, rate: float) -> float:
+        """Take one token; returns 0 when allowed, else seconds until one is available."""
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated) * rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / rate
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+class RedisRateLimitBackend:
+    KEY_PREFIX = "rexagon:sinir:"
+    # Kova tek anahtarda tutulur, Redis Cluster'da anahtara göre parçalanır
+    SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local clock = redis.call('TIME')
+    local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(bucket[1]) or capacity
+    local updated = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + (now - updated) * rate)
+    local wait = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+    else
+        wait = (1 - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+    redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+    return tostring(wait)
+    """
+
+    def __init__(self, url: str):
+        self._redis = aioredis.from_url(url, decode_responses=True)
+        self._script = self._redis.register_script(self.SCRIPT)
+
+    async def take(self, key: str, capacity: int, rate: float) -> float:
+        return float(await self._script(keys=[self.KEY_PREFIX + key], args=[capacity, rate]))
+
+class RateLimiter:
+    def __init__(self, backend, policies: dict, default: list, exempt: List[str]):
+        self.backend = backend
+        self._routes = [
+            (method, compile_path(path)[0], rules) for (method, path), rules in policies.items()
+        ]
+        self._exempt = [compile_path(path)[0] for path in exempt]
+        self.default = default
+        self._stats = {}
+
+    def policies_for(self, method: str, path: str) -> list:
+        if method == "OPTIONS" or any(pattern.match(path) for pattern in self._exempt):
+            return []
+        for route_method, pattern, rules in self._routes:
+            if route_method == method and pattern.match(path):
+                return rules + self.default
+        return self.default
+
+    async def check(self, scope: dict) -> float:
+        """Seconds the request has to wait, 0 when it may proceed."""
+        for name, kapsam, capacity, period in self.policies_for(scope["method"], scope["path"]):
+            identity = _token_subject(scope) if kapsam == "kullanici" else None
+            key = f"{name}:{identity or 'ip:' + _client_ip(scope)}"
+            try:
+                wait = await self.backend.take(key, capacity, capacity / period)
+            except Exception:
+                # Sınırlayıcı arızası trafiği durdurmasın
+                logger.exception("İstek sınırlayıcı çalışmadı")
+                return 0.0
+            stats = self._stats.setdefault(name, {"izin": 0, "reddedilen": 0})
+            if wait > 0:
+                stats["reddedilen"] += 1
+                return wait
+            stats["izin"] += 1
+        return 0.0
+
+    def stats(self) -> dict:
+        return {"backend": type(self.backend).__name__, "politikalar": self._stats}
+
+    def render_metrics(self) -> str:
+        lines = [
+            "# HELP rexagon_rate_limit_requests_total Requests checked by rate limit policy",
+            "# TYPE rexagon_rate_limit_requests_total counter",
+        ]
+        for name, counts in sorted(self._stats.items()):
+            for outcome, count in counts.items():
+                lines.append(f"rexagon_rate_limit_requests_total{{{_labels(policy=name, outcome=outcome)}}} {count}")
+        return "\n".join(lines) + "\n"
+
+def _client_ip(scope: dict) -> str:
+    if RATE_LIMIT_PROXY_HOPS > 0:
+        # Her proxy gördüğü adresi sona ekler; en sağdaki hops adres güvenilirdir
+        forwarded = [
+            address.strip()
+            for name, value in scope["headers"] if name == b"x-forwarded-for"
+            for address in value.decode("latin-1").split(",") if address.strip()
+        ]
+        if len(forwarded) >= RATE_LIMIT_PROXY_HOPS:
+            return forwarded[-RATE_LIMIT_PROXY_HOPS]
+    client = scope.get("client")
+    return client[0] if client else "bilinmiyor"
+
+def _token_subject(scope: dict) -> Optional[str]:
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() != "bearer":
+                return None
+            try:
+                return "kullanici:" + jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])["sub"]
+            except (JWTError, KeyError):
+                return None
+    return None
+
+def _create_rate_limit_backend():
+    if REDIS_URL and aioredis is not None:
+        return RedisRateLimitBackend(REDIS_URL)
+    return MemoryRateLimitBackend(RATE_LIMIT_MAX_KEYS)
+
+rate_limiter = RateLimiter(_create_rate_limit_backend(), RATE_LIMIT_POLICIES, RATE_LIMIT_DEFAULT, RATE_LIMIT_EXEMPT)
+
+class RateLimitMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not RATE_LIMIT_ENABLED:
+            return await self.app(scope, receive, send)
+        wait = await rate_limiter.check(scope)
+        if wait > 0:
+            response = Response(
+                content=json.dumps({"detail": "Çok fazla istek, lütfen biraz sonra tekrar deneyin"}),
+                status_code=429,
+                media_type="application/json",
+                headers={"Retry-After": str(max(1, int(wait + 0.999)))}
+            )
+            return await response(scope, receive, send)
+        await self.app(scope, receive, send)
+
+# ============ ETAGS ============
+
+class CollectionVersions:
+    """Per-collection version counters stored in Mongo.
+
+    Every write that changes a cached representation bumps the counter, so
+    ETags built from it are identical across workers. Reads are memoized for
+    ETAG_VERSION_TTL_SECONDS to keep the check off the database.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._cache = {}
+
+    async def get(self, name: str) -> int:
+        cached = self._cache.get(name)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+        doc = await db.collection_versions.find_one({"_id": name})
+        version = doc["surum"] if doc else 0
+        self._cache[name] = (time.monotonic() + self.ttl, version)
+        return version
+
+    async def bump(self, name: str):
+        await db.collection_versions.update_one({"_id": name}, {"$inc": {"surum": 1}}, upsert=True)
+        self._cache.pop(name, None)
+
+collection_versions = CollectionVersions(ETAG_VERSION_TTL_SECONDS)
+
+async def conditional_get(request: Request, response: Response, *collections: str, variant: Optional[str] = None) -> Optional[Response]:
+    """Set ETag/Cache-Control on ``response``; return a 304 if the client copy is current.
+
+    ``variant`` is added to the ETag for responses that also depend on something
+    other than the collections, e.g. the date window of a report.
+    """
+    versions = [f"{name}.{await collection_versions.get(name)}" for name in collections]
+    if variant:
+        versions.append(variant)
+    etag = '"' + "-".join(versions) + '"'
+    headers = {"ETag": etag, "Cache-Control": CATALOG_CACHE_CONTROL}
+    
+    if_none_match = request.headers.get("if-none-match", "")
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    if etag in candidates or "*" in candidates:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+# ============ AUTH HELPERS ============
+
+def verify_password(plain_password, hashed_password):
+    return pwd_context.verify(plain_password, hashed_password)
+
+def get_password_hash(password):
+    return pwd_context.hash(password)
+
+class HashingExecutor:
+    """Bounded pool that runs bcrypt off the event loop.
+
+    At most ``max_pending`` hash/verify calls may be running or queued; beyond
+    that new calls are rejected with 503 instead of piling up behind the pool.
+    """
+
+    def __init__(self, kind: str, workers: int, max_pending: int):
+        executor_cls = ProcessPoolExecutor if kind == "process" else ThreadPoolExecutor
+        self._executor = executor_cls(max_workers=workers)
+        self.kind = kind
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    async def run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Sunucu şu anda yoğun, lütfen tekrar deneyin",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+    def stats(self) -> dict:
+        return {
+            "tur": self.kind,
+            "isci": self.workers,
+            "calisan": min(self.pending, self.workers),
+            "kuyruk": max(self.pending - self.workers, 0),
+            "tamamlanan": self.completed,
+            "reddedilen": self.rejected
+        }
+
+hash_executor = HashingExecutor(HASH_EXECUTOR_KIND, HASH_WORKERS, HASH_MAX_PENDING)
+
+async def verify_password_async(plain_password, hashed_password):
+    return await hash_executor.run(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password):
+    return await hash_executor.run(get_password_hash, password)
+
+# Token'lar kullanıcının rolünü ve token sürümünü (users.token_surumu) taşır.
+# Şifre/rol değişikliği veya silme sürümü artırır ve token_revocations'a
+# kullanıcı için geçerli en küçük sürümü yazar; her işçi bu kayıtları bellekte
+# tutar, böylece eski token'lar veritabanına bakmadan reddedilir. Kayıtlar token
+# ömrü dolunca silinir, o ana kadar eski sürümlü tüm token'lar zaten geçersizdir.
+
+DELETED_TOKEN_VERSION = 2 ** 31
+
+class TokenRevocations:
+    def __init__(self):
+        self._min_versions = {}
+        self._synced_until = None
+
+    def is_revoked(self, user_id: str, surum: int) -> bool:
+        entry = self._min_versions.get(user_id)
+        return entry is not None and surum < entry[0]
+
+    def apply(self, entry: dict):
+        current = self._min_versions.get(entry["kullanici_id"])
+        if current is None or entry["surum"] > current[0]:
+            self._min_versions[entry["kullanici_id"]] = (entry["surum"], entry["son_kullanma"])
+
+    async def revoke(self, versions: Dict[str, int]):
+        now = datetime.now(timezone.utc)
+        entries = [{
+            "kullanici_id": user_id,
+            "surum": surum,
+            "tarih": now,
+            "son_kullanma": now + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+        } for user_id, surum in versions.items()]
+        if entries:
+            await db.token_revocations.insert_many(entries)
+        for entry in entries:
+            self.apply(entry)
+
+    async def sync(self):
+        now = datetime.now(timezone.utc)
+        query = {"son_kullanma": {"$gt": now}}
+        if self._synced_until is not None:
+            # Geç commit edilen kayıtlar için pencere bir aralık geriden başlar
+            query["tarih"] = {"$gte": self._synced_until - timedelta(seconds=2 * TOKEN_REVOCATION_SYNC_SECONDS)}
+        async for entry in db.token_revocations.find(query, {"_id": 0}):
+            entry["son_kullanma"] = entry["son_kullanma"].replace(tzinfo=timezone.utc)
+            self.apply(entry)
+        self._synced_until = now
+        self._min_versions = {
+            user_id: entry for user_id, entry in self._min_versions.items() if entry[1] > now
+        }
+
+    def stats(self) -> dict:
+        return {
+            "kullanici": len(self._min_versions),
+            "son_senkron": self._synced_until.isoformat() if self._synced_until else None
+        }
+
+token_revocations = TokenRevocations()
+
+async def revoke_user_tokens(user_ids: List[str], deleted: bool = False) -> Dict[str, int]:
+    """Invalidate every token issued so far to ``user_ids``."""
+    if deleted:
+        versions = {user_id: DELETED_TOKEN_VERSION for user_id in user_ids}
+    else:
+        await db.users.update_many({"id": {"$in": user_ids}}, {"$inc": {"token_surumu": 1}})
+        versions = {
+            user["id"]: user["token_surumu"]
+            async for user in db.users.find({"id": {"$in": user_ids}}, {"_id": 0, "id": 1, "token_surumu": 1})
+        }
+    await token_revocations.revoke(versions)
+    await db.sessions.delete_many({"kullanici_id": {"$in": user_ids}})
+    for user_id in user_ids:
+        user_cache.invalidate(user_id)
+    return versions
+
+async def token_revocation_syncer():
+    while True:
+        await asyncio.sleep(TOKEN_REVOCATION_SYNC_SECONDS)
+        try:
+            await token_revocations.sync()
+        except Exception:
+            logger.exception("Token iptal listesi senkronize edilemedi")
+
+def create_access_token(data: dict):
+    to_encode = data.copy()
+    expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    to_encode.update({"exp": expire})
+    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return encoded_jwt
+
+def create_user_token(user: dict) -> str:
+    return create_access_token(data={
+        "sub": user["id"],
+        "rol": user.get("rol", "user"),
+        "surum": user.get("token_surumu", 0)
+    })
+
+# Her girişte bir oturum (sessions) açılır. Refresh token "<oturum id>.<sır>"
+# biçimindedir ve yalnızca sırrın SHA-256'sı saklanır. Yenilemede sır koşullu
+# güncellemeyle döndürülür; daha önce döndürülmüş bir sır tekrar gelirse token
+# çalınmış sayılır ve oturum tamamen kapatılır. Yenileme bcrypt çalıştırmaz.
+# Yeni sır, önceki sırrın hash'inden SECRET_KEY ile türetilir: hemen önceki
+# token SESSION_REFRESH_GRACE_SECONDS içinde tekrar gelirse (ör. aynı anda 401
+# alan iki sekme) güncel sır saklanmadan yeniden üretilip döndürülür.
+
+session_stats = {"acilan": 0, "yenilenen": 0, "tolere_edilen": 0, "yeniden_kullanim": 0}
+
+def _refresh_hash(secret: str) -> str:
+    return hashlib.sha256(secret.encode("utf-8")).hexdigest()
+
+def _next_refresh_secret(session_id: str, presented_hash: str) -> str:
+    return hmac.new(SECRET_KEY.encode("utf-8"), f"{session_id}:{presented_hash}".encode("utf-8"), hashlib.sha256).hexdigest()
+
+def _session_token_error(detail: str) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=detail, headers={"WWW-Authenticate": "Bearer"})
+
+def token_pair(user: dict, session_id: str, secret: str) -> dict:
+    return {
+        "access_token": create_user_token(user),
+        "refresh_token": f"{session_id}.{secret}",
+        "token_type": "bearer",
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    }
+
+async def create_session(user: dict) -> dict:
+    now = datetime.now(timezone.utc)
+    session_id = uuid.uuid4().hex
+    secret = secrets.token_urlsafe(32)
+    await db.sessions.insert_one({
+        "id": session_id,
+        "kullanici_id": user["id"],
+        "token_hash": _refresh_hash(secret),
+        "eski_hashler": [],
+        "olusturma_tarihi": now.isoformat(),
+        "son_kullanim": now.isoformat(),
+        "son_kullanma": now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    })
+    session_stats["acilan"] += 1
+    return token_pair(user, session_id, secret)
+
+async def rotate_session(refresh_token: str) -> dict:
+    session_id, _, secret = refresh_token.partition(".")
+    if not session_id or not secret:
+        raise _session_token_error("Geçersiz yenileme token'ı")
+    now = datetime.now(timezone.utc)
+    presented = _refresh_hash(secret)
+    new_secret = _next_refresh_secret(session_id, presented)
+    session = await db.sessions.find_one_and_update(
+        {"id": session_id, "token_hash": presented, "son_kullanma": {"$gt": now}},
+        {
+            "$set": {
+                "token_hash": _refresh_hash(new_secret),
+                "onceki_hash": presented,
+                "onceki_gecerlilik": now + timedelta(seconds=SESSION_REFRESH_GRACE_SECONDS),
+                "son_kullanim": now.isoformat(),
+                "son_kullanma": now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+            },
+            "$push": {"eski_hashler": {"$each": [presented], "$slice": -SESSION_REUSE_HISTORY}}
+        },
+        projection={"_id": 0, "kullanici_id": 1}
+    )
+    if session is None:
+        # Hemen önceki token süre içinde geldiyse yarış sayılır, güncel çift verilir
+        session = await db.sessions.find_one(
+            {
+                "id": session_id,
+                "onceki_hash": presented,
+                "onceki_gecerlilik": {"$gt": now},
+                "token_hash": _refresh_hash(new_secret),
+                "son_kullanma": {"$gt": now}
+            },
+            {"_id": 0, "kullanici_id": 1}
+        )
+        if session is not None:
+            session_stats["tolere_edilen"] += 1
+    if session is None:
+        reused = await db.sessions.find_one_and_delete({"id": session_id, "eski_hashler": presented})
+        if reused is not None:
+            session_stats["yeniden_kullanim"] += 1
+            logger.warning(f"Refresh token tekrar kullanıldı, oturum kapatıldı: {reused['kullanici_id']}")
+            raise _session_token_error("Oturum güvenlik nedeniyle kapatıldı")
+        raise _session_token_error("Oturum geçersiz veya süresi dolmuş")
+    
+    user = await db.users.find_one(
+        {"id": session["kullanici_id"]},
+        {"_id": 0, "id": 1, "rol": 1, "token_surumu": 1}
+    )
+    if user is None:
+        await db.sessions.delete_one({"id": session_id})
+        raise _session_token_error("Oturum geçersiz veya süresi dolmuş")
+    session_stats["yenilenen"] += 1
+    return token_pair(user, session_id, new_secret)
+
+def decode_token(token: str) -> dict:
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Kimlik doğrulanamadı",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise credentials_exception
+    user_id = payload.get("sub")
+    surum = payload.get("surum", 0)
+    if user_id is None or token_revocations.is_revoked(user_id, surum):
+        raise credentials_exception
+    # rol taşımayan eski token'larda rol None olur ve kullanıcı belgesinden okunur
+    return {"id": user_id, "rol": payload.get("rol"), "surum": surum}
+
+async def load_token_user(claims: dict) -> dict:
+    user = user_cache.get(claims["id"])
+    if user is None:
+        user = await db.users.find_one({"id": claims["id"]}, {"_id": 0})
+        if user is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Kimlik doğrulanamadı",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        user.setdefault("acik_temalar", [])
+        user.setdefault("aktif_tema_id", None)
+        user.setdefault("aktif_tema_gorsel", None)
+        user.setdefault("biyografi", None)
+        user.setdefault("ada_seviyesi", 0)
+        user.setdefault("dinar", 0)
+        user_cache.set(claims["id"], user)
+    # İptal başka bir işçide yapıldıysa senkrondan önce de yakalanır
+    if claims["surum"] < user.get("token_surumu", 0):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Kimlik doğrulanamadı",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user
+
+async def get_token_claims(token: str = Depends(oauth2_scheme)) -> dict:
+    """Authenticate from the token alone, without reading the user document."""
+    return decode_token(token)
+
+async def get_current_user(claims: dict = Depends(get_token_claims)):
+    return await load_token_user(claims)
+
+async def get_admin_claims(claims: dict = Depends(get_token_claims)) -> dict:
+    rol = claims["rol"]
+    if rol is None:
+        rol = (await load_token_user(claims)).get("rol")
+    if rol != "admin":
+        raise HTTPException(status_code=403, detail="Yönetici yetkisi gerekli")
+    return claims
+
+async def get_admin_user(claims: dict = Depends(get_admin_claims)):
+    current_user = await load_token_user(claims)
+    if current_user.get("rol") != "admin":
+        raise HTTPException(status_code=403, detail="Yönetici yetkisi gerekli")
+    return current_user
+
+# ============ LEADERBOARDS ============
+
+LEADERBOARD_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "kullanici_adi": 1,
+    "yetki_gorseli": 1,
+    "kayit_tarihi": 1,
+    "kredi": 1,
+    "dinar": 1,
+    "ada_seviyesi": 1
+}
+
+class Leaderboard:
+    """In-memory top-K of users for one metric.
+
+    Keeps the best ``capacity`` users sorted by ``metric``. ``floor`` is an
+    upper bound for every user outside the buffer (None when the buffer holds
+    all users), so a changed user only enters the buffer if it beats the
+    floor. If the buffer shrinks below what is served it is reloaded from
+    Mongo; a periodic full reload also picks up writes made by other workers
+    or directly by the game server.
+    """
+
+    def __init__(self, metric: str, default, capacity: int):
+        self.metric = metric
+        self.default = default
+        self.capacity = capacity
+        self.entries = []
+        self.floor = None
+        self.loaded = False
+        self._generation = 0
+
+    def _slim(self, user: dict) -> dict:
+        return {
+            "id": user["id"],
+            "kullanici_adi": user.get("kullanici_adi"),
+            "yetki_gorseli": user.get("yetki_gorseli"),
+            "kayit_tarihi": user.get("kayit_tarihi"),
+            self.metric: user.get(self.metric, self.default)
+        }
+
+    async def reload(self):
+        generation = self._generation
+        rows = await db.users.find({}, LEADERBOARD_PROJECTION).sort(self.metric, -1).limit(self.capacity).to_list(self.capacity)
+        self.entries = [self._slim(row) for row in rows]
+        self.floor = self.entries[-1][self.metric] if len(self.entries) == self.capacity else None
+        # Yükleme sırasında gelen güncellemeler kaybolmuş olabilir, sonraki okuma tekrar yükler
+        self.loaded = generation == self._generation
+
+    def update(self, user: dict):
+        self._generation += 1
+        self.entries = [e for e in self.entries if e["id"] != user["id"]]
+        entry = self._slim(user)
+        if self.floor is not None and entry[self.metric] <= self.floor:
+            return
+        self.entries.append(entry)
+        self.entries.sort(key=lambda e: e[self.metric], reverse=True)
+        if len(self.entries) > self.capacity:
+            self.floor = self.entries.pop()[self.metric]
+
+    def remove(self, user_id: str):
+        self._generation += 1
+        self.entries = [e for e in self.entries if e["id"] != user_id]
+
+    async def top(self, n: int) -> List[dict]:
+        if not self.loaded or (self.floor is not None and len(self.entries) < n):
+            await self.reload()
+        return self.entries[:n]
+
+leaderboards = {
+    "kredi": Leaderboard("kredi", 0, LEADERBOARD_BUFFER),
+    "dinar": Leaderboard("dinar", 0, LEADERBOARD_BUFFER),
+    "ada_seviyesi": Leaderboard("ada_seviyesi", 0, LEADERBOARD_BUFFER),
+    "kayit_tarihi": Leaderboard("kayit_tarihi", "", LEADERBOARD_BUFFER),
+}
+
+def update_leaderboards(user: dict):
+    for board in leaderboards.values():
+        board.update(user)
+
+def remove_from_leaderboards(user_id: str):
+    for board in leaderboards.values():
+        board.remove(user_id)
+
+async def refresh_user_in_leaderboards(user_id: str):
+    user = await db.users.find_one({"id": user_id}, LEADERBOARD_PROJECTION)
+    if user is None:
+        remove_from_leaderboards(user_id)
+    else:
+        update_leaderboards(user)
+
+async def leaderboard_refresher():
+    while True:
+        await asyncio.sleep(LEADERBOARD_REFRESH_SECONDS)
+        for board in leaderboards.values():
+            try:
+                await board.reload()
+            except Exception:
+                logger.exception(f"{board.metric} sıralaması yenilenemedi")
+
+# ============ CREDIT LEDGER ============
+
+# Her kredi değişikliği credit_ledger'a çift kayıt olarak yazılır: kullanıcı
+# hesabı ve karşı sistem hesabı (sistem:market, sistem:tema, sistem:yonetici,
+# sistem:odeme, sistem:acilis); bir işlemin kayıtlarının toplamı sıfırdır.
+# Replica set varsa bakiye güncellemesi ve defter kayıtları aynı
+# transaction'da yazılır. credit_snapshots kullanıcı başına belirli anlardaki
+# bakiyeyi tutar; bir andaki bakiye son anlık görüntü ile sonrasındaki
+# kayıtların toplamıdır.
+
+ledger_state = {"transactions": False}
+
+async def detect_transactions():
+    try:
+        hello = await client.admin.command("hello")
+    except Exception:
+        hello = {}
+    ledger_state["transactions"] = "setName" in hello or hello.get("msg") == "isdbgrid"
+    return ledger_state["transactions"]
+
+async def run_ledger_transaction(operation):
+    """Await ``operation(session)`` in a transaction when the deployment supports it."""
+    if not ledger_state["transactions"]:
+        return await operation(None)
+    async with await client.start_session() as session:
+        return await session.with_transaction(operation)
+
+def ledger_entries(user_id: str, tutar: float, karsi_hesap: str, tip: str,
+                   referans: Optional[str] = None, bakiye_sonrasi: Optional[float] = None,
+                   tarih: Optional[str] = None) -> List[dict]:
+    islem_id = str(uuid.uuid4())
+    tarih = tarih or datetime.now(timezone.utc).isoformat()
+    common = {"islem_id": islem_id, "tip": tip, "referans": referans, "tarih": tarih}
+    return [
+        {"id": str(uuid.uuid4()), "hesap": f"kullanici:{user_id}", "kullanici_id": user_id,
+         "tutar": tutar, "bakiye_sonrasi": bakiye_sonrasi, **common},
+        {"id": str(uuid.uuid4()), "hesap": karsi_hesap, "kullanici_id": None,
+         "tutar": -tutar, "bakiye_sonrasi": None, **common},
+    ]
+
+async def ledger_balance(user_id: str, tarih: Optional[str] = None) -> dict:
+    """Balance of a user at ``tarih`` (default: now) from the last snapshot onwards."""
+    tarih = tarih or datetime.now(timezone.utc).isoformat()
+    snapshot = await db.credit_snapshots.find_one(
+        {"kullanici_id": user_id, "tarih": {"$lte": tarih}},
+        {"_id": 0, "tarih": 1, "bakiye": 1},
+        sort=[("tarih", DESCENDING)]
+    )
+    window = {"$lte": tarih}
+    if snapshot:
+        window["$gt"] = snapshot["tarih"]
+    totals = await db.credit_ledger.aggregate([
+        {"$match": {"kullanici_id": user_id, "tarih": window}},
+        {"$group": {"_id": None, "toplam": {"$sum": "$tutar"}, "kayit": {"$sum": 1}}}
+    ]).to_list(1)
+    start = snapshot["bakiye"] if snapshot else 0.0
+    change = totals[0]["toplam"] if totals else 0.0
+    return {
+        "kullanici_id": user_id,
+        "tarih": tarih,
+        "bakiye": round(start + change, 2),
+        "anlik_goruntu": snapshot,
+        "kayit_sayisi": totals[0]["kayit"] if totals else 0
+    }
+
+async def open_ledger_balances() -> int:
+    """Snapshot current balances once so history before the ledger is not lost."""
+    if await db.credit_snapshots.find_one({}):
+        return 0
+    tarih = datetime.now(timezone.utc).isoformat()
+    opened = 0
+    cursor = db.users.find({"kredi": {"$ne": 0}}, {"_id": 0, "id": 1, "kredi": 1})
+    while batch := await cursor.to_list(1000):
+        await db.credit_snapshots.insert_many([
+            {"kullanici_id": user["id"], "tarih": tarih, "bakiye": user.get("kredi") or 0.0, "acilis": True}
+            for user in batch
+        ])
+        opened += len(batch)
+    return opened
+
+async def take_ledger_snapshots(since: str, cutoff: str) -> int:
+    user_ids = await db.credit_ledger.distinct(
+        "kullanici_id",
+        {"kullanici_id": {"$ne": None}, "tarih": {"$gt": since, "$lte": cutoff}}
+    )
+    for start in range(0, len(user_ids), 500):
+        balances = [await ledger_balance(user_id, cutoff) for user_id in user_ids[start:start + 500]]
+        await db.credit_snapshots.bulk_write([
+            UpdateOne(
+                {"kullanici_id": balance["kullanici_id"], "tarih": cutoff},
+                {"$set": {"bakiye": balance["bakiye"]}},
+                upsert=True
+            )
+            for balance in balances
+        ], ordered=False)
+    return len(user_ids)
+
+async def ledger_snapshotter():
+    since = (datetime.now(timezone.utc) - timedelta(seconds=2 * LEDGER_SNAPSHOT_SECONDS)).isoformat()
+    while True:
+        await asyncio.sleep(LEDGER_SNAPSHOT_SECONDS)
+        # Gecikmeli commit edilen kayıtlar için kesim anı biraz geride tutulur
+        cutoff = (datetime.now(timezone.utc) - timedelta(seconds=LEDGER_SNAPSHOT_LAG_SECONDS)).isoformat()
+        try:
+            taken = await take_ledger_snapshots(since, cutoff)
+            if taken:
+                logger.info(f"{taken} kullanıcı için bakiye anlık görüntüsü alındı")
+            since = cutoff
+        except Exception:
+            logger.exception("Bakiye anlık görüntüleri alınamadı")
+
+# ============ PURCHASE ENGINE ============
+
+async def run_idempotent(user_id: str, key: Optional[str], operation):
+    """Run ``operation(remember)`` at most once per (user, Idempotency-Key).
+
+    A retried request with the same key gets the stored response of the first
+    one; a retry that arrives while the first is still running gets 409.
+    ``operation`` calls ``remember(response, session)`` inside its transaction
+    so the response is stored atomically with the charge it describes.
+    """
+    if not key:
+        async def forget(result, session=None):
+            pass
+        return await operation(forget)
+    
+    key_filter = {"kullanici_id": user_id, "anahtar": key}
+    try:
+        await db.idempotency_keys.insert_one({
+            **key_filter,
+            "yanit": None,
+            "son_kullanma": datetime.now(timezone.utc) + timedelta(seconds=IDEMPOTENCY_KEY_TTL_SECONDS)
+        })
+    except DuplicateKeyError:
+        existing = await db.idempotency_keys.find_one(key_filter, {"_id": 0})
+        if existing and existing.get("yanit") is not None:
+            return existing["yanit"]
+        raise HTTPException(status_code=409, detail="Bu işlem zaten işleniyor")
+    
+    async def remember(result, session=None):
+        await db.idempotency_keys.update_one(key_filter, {"$set": {"yanit": result}}, session=session)
+    
+    try:
+        result = await operation(remember)
+    except Exception:
+        # Commit edilmemiş işlem anahtarı tüketmesin, istemci tekrar deneyebilsin;
+        # yanıtı kaydedilmiş işlem ise tekrar çalıştırılmamalı
+        await db.idempotency_keys.delete_one({**key_filter, "yanit": None})
+        raise
+    await remember(result)
+    return result
+
+async def after_commit(description: str, awaitable):
+    """Await a side effect of a committed write; failures are logged, never raised."""
+    try:
+        await awaitable
+    except Exception:
+        logger.exception(f"{description} başarısız")
+
+async def execute_item_purchase(user: dict, urun_id: str, remember) -> dict:
+    # Stok ve kredi koşullu güncellemelerle düşülür; iki istek aynı stoğu
+    # ya da aynı krediyi harcayamaz.
+    async def operation(session):
+        item = await db.market_items.find_one_and_update(
+            {"id": urun_id, "stok": {"$gt": 0}},
+            {"$inc": {"stok": -1}},
+            projection={"_id": 0},
+            session=session
+        )
+        if item is None:
+            if not await db.market_items.find_one({"id": urun_id}, {"_id": 1}, session=session):
+                raise HTTPException(status_code=404, detail="Ürün bulunamadı")
+            raise HTTPException(status_code=400, detail="Stok tükendi")
+        
+        updated_user = await db.users.find_one_and_update(
+            {"id": user["id"], "kredi": {"$gte": item["fiyat"]}},
+            {"$inc": {"kredi": -item["fiyat"]}},
+            projection=LEADERBOARD_PROJECTION,
+            return_document=ReturnDocument.AFTER,
+            session=session
+        )
+        if updated_user is None:
+            if session is None:
+                # Transaction yoksa ayrılan stok elle geri verilir
+                await db.market_items.update_one({"id": urun_id}, {"$inc": {"stok": 1}})
+            raise HTTPException(status_code=400, detail="Yetersiz kredi")
+        
+        # Satın alma kaydı
+        purchase_doc = {
+            "id": str(uuid.uuid4()),
+            "kullanici_id": user["id"],
+            **author_fields("purchases", user),
+            "urun_id": urun_id,
+            "urun_adi": item["isim"],
+            "toplam_fiyat": item["fiyat"],
+            "tarih": datetime.now(timezone.utc).isoformat()
+        }
+        await db.purchases.insert_one(purchase_doc, session=session)
+        await db.credit_ledger.insert_many(ledger_entries(
+            user["id"], -item["fiyat"], "sistem:market", "satin_alma",
+            purchase_doc["id"], updated_user["kredi"], purchase_doc["tarih"]
+        ), session=session)
+        # Teslimat aynı transaction'da kuyruğa alınır; ödenen ürün teslimatsız
+        # kalamaz, istek oyun sunucusunu beklemez
+        delivery = await enqueue_minecraft_command(purchase_doc["id"], user, item.get("komut"), session=session)
+        response = {
+            "message": "Satın alma başarılı",
+            "yeni_kredi": updated_user["kredi"],
+            "minecraft_command": delivery["komut"] if delivery else None,
+            "teslimat_id": delivery["id"] if delivery else None
+        }
+        await remember(response, session)
+        return item, updated_user, purchase_doc, response
+    
+    item, updated_user, purchase_doc, response = await run_ledger_transaction(operation)
+    user_cache.invalidate(user["id"])
+    update_leaderboards(updated_user)
+    # Kredi düşüldü; bundan sonrası yalnızca türetilmiş veriler ve bildirimler
+    await after_commit("Ürün satışı kaydı", record_product_sale(urun_id, item["fiyat"], purchase_doc["tarih"]))
+    # Stok ve en çok satanlar değişti
+    await after_commit("Yanıt önbelleği temizliği", response_cache.invalidate("leaderboard", "market_urunler"))
+    await after_commit("Koleksiyon sürümü", collection_versions.bump("market_items"))
+    await after_commit("Canlı olay", publish_live_event("alisverisler", {
+        "kullanici_adi": user["kullanici_adi"],
+        "urun_adi": item["isim"],
+        "toplam_fiyat": item["fiyat"],
+        "tarih": purchase_doc["tarih"]
+    }))
+    return response
+
+async def execute_theme_purchase(user: dict, theme_id: str, remember) -> dict:
+    theme = await db.themes.find_one({"id": theme_id}, {"_id": 0})
+    if not theme:
+        raise HTTPException(status_code=404, detail="Tema bulunamadı")
+    
+    query = {"id": user["id"], "acik_temalar": {"$ne": theme_id}}
+    update = {"$push": {"acik_temalar": theme_id}}
+    if theme["fiyat"] > 0:
+        query["kredi"] = {"$gte": theme["fiyat"]}
+        update["$inc"] = {"kredi": -theme["fiyat"]}
+    
+    async def operation(session):
+        updated_user = await db.users.find_one_and_update(
+            query,
+            update,
+            projection=LEADERBOARD_PROJECTION,
+            return_document=ReturnDocument.AFTER,
+            session=session
+        )
+        if updated_user is not None:
+            if theme["fiyat"] > 0:
+                await db.credit_ledger.insert_many(ledger_entries(
+                    user["id"], -theme["fiyat"], "sistem:tema", "tema", theme_id, updated_user["kredi"]
+                ), session=session)
+            await remember({"message": "Tema açıldı", "yeni_kredi": updated_user["kredi"]}, session)
+        return updated_user
+    
+    updated_user = await run_ledger_transaction(operation)
+    if updated_user is None:
+        current = await db.users.find_one({"id": user["id"]}, {"_id": 0, "acik_temalar": 1})
+        if current and theme_id in current.get("acik_temalar", []):
+            raise HTTPException(status_code=400, detail="Bu tema zaten açık")
+        raise HTTPException(status_code=400, detail="Yetersiz kredi")
+    user_cache.invalidate(user["id"])
+    update_leaderboards(updated_user)
+    return {"message": "Tema açıldı", "yeni_kredi": updated_user["kredi"]}
+
+# ============ PRODUCT SALES ============
+
+# product_sales her ürün için bir "toplam" belgesi ve günlük (YYYY-MM-DD)
+# belgeler tutar; en çok satanlar purchases üzerinde $group çalıştırmaz.
+
+async def record_product_sale(urun_id: str, fiyat: float, tarih: str):
+    sale = {"$inc": {"satis_sayisi": 1, "ciro": fiyat}}
+    await db.product_sales.bulk_write([
+        UpdateOne({"urun_id": urun_id, "donem": "toplam"}, sale, upsert=True),
+        UpdateOne({"urun_id": urun_id, "donem": tarih[:10]}, sale, upsert=True),
+    ], ordered=False)
+
+async def rebuild_product_sales() -> int:
+    """Rebuild the rollup from the purchases history (one-shot backfill)."""
+    daily = await db.purchases.aggregate([
+        {"$group": {
+            "_id": {"urun_id": "$urun_id", "donem": {"$substrCP": ["$tarih", 0, 10]}},
+            "satis_sayisi": {"$sum": 1},
+            "ciro": {"$sum": "$toplam_fiyat"}
+        }}
+    ]).to_list(None)
+    totals = {}
+    for row in daily:
+        total = totals.setdefault(row["_id"]["urun_id"], {"satis_sayisi": 0, "ciro": 0})
+        total["satis_sayisi"] += row["satis_sayisi"]
+        total["ciro"] += row["ciro"]
+    
+    operations = [
+        UpdateOne(row["_id"], {"$set": {"satis_sayisi": row["satis_sayisi"], "ciro": row["ciro"]}}, upsert=True)
+        for row in daily
+    ] + [
+        UpdateOne({"urun_id": urun_id, "donem": "toplam"}, {"$set": total}, upsert=True)
+        for urun_id, total in totals.items()
+    ]
+    if operations:
+        await db.product_sales.bulk_write(operations, ordered=False)
+    return len(totals)
+
+# ============ MINECRAFT DELIVERY ============
+
+# Satın alma komutları minecraft_commands koleksiyonuna (outbox) yazılır.
+# Arka plandaki işçiler kuyruğu toplu halde alır, kalıcı RCON bağlantıları
+# üzerinden gönderir; başarısız komutlar üstel bekleme ile tekrar denenir,
+# DELIVERY_MAX_ATTEMPTS sonrası "basarisiz" durumuna düşer. Teslimat en az
+# bir kez garantilidir: yanıtı zaman aşımına uğrayan bir komut tekrar gönderilebilir.
+
+MINECRAFT_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_]{3,16}$")
+
+RCON_LOGIN = 3
+RCON_COMMAND = 2
+
+class RconError(Exception):
+    pass
+
+class RconConnection:
+    def __init__(self, host: str, port: int, password: str, timeout: float):
+        self.host = host
+        self.port = port
+        self.password = password
+        self.timeout = timeout
+        self._reader = None
+        self._writer = None
+        self._request_id = 0
+
+    async def connect(self):
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), self.timeout
+        )
+        request_id, _ = await self._request(RCON_LOGIN, self.password)
+        if request_id == -1:
+            self.close()
+            raise RconError("RCON şifresi reddedildi")
+
+    async def command(self, command: str) -> str:
+        _, body = await self._request(RCON_COMMAND, command)
+        return body
+
+    async def _request(self, packet_type: int, body: str):
+        self._request_id += 1
+        payload = struct.pack("<ii", self._request_id, packet_type) + body.encode("utf-8") + b"\x00\x00"
+        self._writer.write(struct.pack("<i", len(payload)) + payload)
+        await self._writer.drain()
+        return await asyncio.wait_for(self._read_packet(), self.timeout)
+
+    async def _read_packet(self):
+        (length,) = struct.unpack("<i", await self._reader.readexactly(4))
+        data = await self._reader.readexactly(length)
+        request_id, _ = struct.unpack("<ii", data[:8])
+        return request_id, data[8:-2].decode("utf-8", errors="replace")
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+class RconPool:
+    """Keeps up to ``size`` authenticated RCON connections open and reuses them."""
+
+    def __init__(self, host: str, port: int, password: str, size: int, timeout: float):
+        self.host = host
+        self.port = port
+        self.password = password
+        self.timeout = timeout
+        self._idle = []
+        self._slots = asyncio.Semaphore(size)
+        self.connects = 0
+
+    async def execute(self, commands: List[str]) -> list:
+        """Send ``commands`` over one connection; failed ones come back as exceptions."""
+        results = []
+        async with self._slots:
+            conn = self._idle.pop() if self._idle else None
+            try:
+                if conn is None:
+                    conn = RconConnection(self.host, self.port, self.password, self.timeout)
+                    await conn.connect()
+                    self.connects += 1
+                for command in commands:
+                    results.append(await conn.command(command))
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, RconError) as e:
+                # Bozuk bağlantı havuza geri konmaz
+                if conn is not None:
+                    conn.close()
+                    conn = None
+                results.extend([e] * (len(commands) - len(results)))
+            finally:
+                if conn is not None:
+                    self._idle.append(conn)
+        return results
+
+    def close(self):
+        while self._idle:
+            self._idle.pop().close()
+
+rcon_pool = RconPool(RCON_HOST, RCON_PORT, RCON_PASSWORD, RCON_POOL_SIZE, RCON_TIMEOUT_SECONDS)
+delivery_stats = {"teslim_edildi": 0, "tekrar_denenecek": 0, "basarisiz": 0}
+
+async def enqueue_minecraft_command(purchase_id: str, user: dict, template: Optional[str], session=None) -> Optional[dict]:
+    if not template:
+        return None
+    now = datetime.now(timezone.utc)
+    job = {
+        "id": str(uuid.uuid4()),
+        "satin_alma_id": purchase_id,
+        "kullanici_id": user["id"],
+        "komut": template.replace("{oyuncu}", user["kullanici_adi"]),
+        "durum": "beklemede",
+        "deneme": 0,
+        "sonraki_deneme": now,
+        "son_hata": None,
+        "tarih": now.isoformat()
+    }
+    # Kullanıcı adı komuta yazıldığı için geçerli bir Minecraft adı olmalı
+    if not MINECRAFT_NAME_PATTERN.match(user["kullanici_adi"]):
+        job["durum"] = "basarisiz"
+        job["son_hata"] = "Geçersiz Minecraft kullanıcı adı"
+    await db.minecraft_commands.insert_one(job, session=session)
+    job.pop("_id", None)
+    return job
+
+async def claim_batch(collection, size: int, lease_seconds: float) -> List[dict]:
+    """Lock up to ``size`` due jobs of an outbox collection for this worker."""
+    now = datetime.now(timezone.utc)
+    claimable = {"$or": [
+        {"durum": "beklemede", "sonraki_deneme": {"$lte": now}},
+        # Çöken bir işçinin üzerinde kalan işler kira süresi dolunca geri alınır
+        {"durum": "isleniyor", "kilit_zamani": {"$lt": now - timedelta(seconds=lease_seconds)}}
+    ]}
+    candidates = await collection.find(claimable, {"_id": 0, "id": 1}).sort("sonraki_deneme", 1).limit(size).to_list(size)
+    if not candidates:
+        return []
+    token = str(uuid.uuid4())
+    await collection.update_many(
+        {"id": {"$in": [c["id"] for c in candidates]}, **claimable},
+        {"$set": {"durum": "isleniyor", "kilit": token, "kilit_zamani": now}}
+    )
+    return await collection.find({"kilit": token}, {"_id": 0}).to_list(size)
+
+async def claim_delivery_batch(size: int) -> List[dict]:
+    return await claim_batch(db.minecraft_commands, size, DELIVERY_LEASE_SECONDS)
+
+async def deliver_batch() -> int:
+    jobs = await claim_delivery_batch(DELIVERY_BATCH_SIZE)
+    if not jobs:
+        return 0
+    results = await rcon_pool.execute([job["komut"] for job in jobs])
+    
+    now = datetime.now(timezone.utc)
+    operations = []
+    for job, result in zip(jobs, results):
+        if not isinstance(result, Exception):
+            update = {"durum": "teslim_edildi", "yanit": result, "teslim_tarihi": now.isoformat()}
+            delivery_stats["teslim_edildi"] += 1
+        elif job["deneme"] + 1 >= DELIVERY_MAX_ATTEMPTS:
+            update = {"durum": "basarisiz", "deneme": job["deneme"] + 1, "son_hata": str(result) or type(result).__name__}
+            delivery_stats["basarisiz"] += 1
+        else:
+            backoff = min(DELIVERY_BACKOFF_SECONDS * 2 ** job["deneme"], DELIVERY_MAX_BACKOFF_SECONDS)
+            update = {
+                "durum": "beklemede",
+                "deneme": job["deneme"] + 1,
+                "sonraki_deneme": now + timedelta(seconds=backoff),
+                "son_hata": str(result) or type(result).__name__
+            }
+            delivery_stats["tekrar_denenecek"] += 1
+        operations.append(UpdateOne({"id": job["id"], "kilit": job["kilit"]}, {"$set": update, "$unset": {"kilit": ""}}))
+    await db.minecraft_commands.bulk_write(operations, ordered=False)
+    return len(jobs)
+
+async def delivery_worker():
+    while True:
+        try:
+            delivered = await deliver_batch()
+        except Exception:
+            logger.exception("Minecraft teslimat işçisi hata verdi")
+            delivered = 0
+        if delivered < DELIVERY_BATCH_SIZE:
+            await asyncio.sleep(DELIVERY_POLL_SECONDS)
+
+# ============ PAYMENT SETTLEMENT ============
+
+# Sağlayıcı bildirimleri imzası doğrulandıktan sonra payment_events
+# koleksiyonuna yazılır ve hemen "OK" ile yanıtlanır. (saglayici,
+# saglayici_islem_id) üzerindeki unique indeks tekrar gönderilen bildirimleri
+# eler. Mutabakat işçileri olayları teslimat kuyruğu gibi kilitleyerek alır;
+# kredi işlemi "beklemede" ise "tamamlandi"ya çevrilir, kullanıcıya kredi
+# eklenir ve deftere yazılır. Durum koşullu güncellendiği için aynı ödeme iki
+# kez kredi yüklemez.
+
+class PaymentRejected(Exception):
+    pass
+
+settlement_stats = {
+    "alinan": 0, "tekrar": 0, "gecersiz_imza": 0,
+    "tamamlandi": 0, "reddedildi": 0, "zaten_islenmis": 0, "tekrar_denenecek": 0, "basarisiz": 0
+}
+settlement_wakeup = asyncio.Event()
+
+def _hmac_base64(secret: str, message: str) -> str:
+    digest = hmac.new(secret.encode("utf-8"), message.encode("utf-8"), hashlib.sha256).digest()
+    return base64.b64encode(digest).decode("ascii")
+
+def paytr_signature(fields: dict, merchant_key: str, merchant_salt: str) -> str:
+    return _hmac_base64(merchant_key, "".join([
+        fields.get("merchant_oid", ""), merchant_salt, fields.get("status", ""), fields.get("total_amount", "")
+    ]))
+
+def shopier_signature(fields: dict, api_secret: str) -> str:
+    return _hmac_base64(api_secret, fields.get("random_nr", "") + fields.get("platform_order_id", ""))
+
+def parse_payment_callback(saglayici: str, fields: dict) -> dict:
+    """Verify a provider callback and map it to a payment event."""
+    if saglayici == "paytr" and PAYTR_MERCHANT_KEY:
+        expected = paytr_signature(fields, PAYTR_MERCHANT_KEY, PAYTR_MERCHANT_SALT)
+        signature = fields.get("hash", "")
+        event = {
+            "siparis_no": fields.get("merchant_oid", ""),
+            "saglayici_islem_id": fields.get("merchant_oid", ""),
+            "basarili": fields.get("status") == "success",
+        }
+        amount = fields.get("total_amount", "")
+    elif saglayici == "shopier" and SHOPIER_API_SECRET:
+        expected = shopier_signature(fields, SHOPIER_API_SECRET)
+        signature = fields.get("signature", "")
+        event = {
+            "siparis_no": fields.get("platform_order_id", ""),
+            "saglayici_islem_id": fields.get("payment_id", ""),
+            "basarili": fields.get("status", "").lower() == "success",
+        }
+        amount = ""
+    else:
+        raise HTTPException(status_code=404, detail="Ödeme sağlayıcısı bulunamadı")
+    
+    if not hmac.compare_digest(expected, signature):
+        settlement_stats["gecersiz_imza"] += 1
+        raise HTTPException(status_code=400, detail="Geçersiz imza")
+    if not event["siparis_no"] or not event["saglayici_islem_id"]:
+        raise HTTPException(status_code=400, detail="Eksik ödeme bilgisi")
+    # PayTR tutarı kuruş cinsinden gönderir
+    try:
+        event["tutar"] = int(amount) / 100 if amount else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Geçersiz ödeme tutarı")
+    return event
+
+async def settle_payment_event(event: dict) -> str:
+    transaction = await db.credit_transactions.find_one(
+        {"siparis_no": event["siparis_no"]},
+        {"_id": 0, "id": 1, "kullanici_id": 1, "tutar": 1}
+    )
+    if transaction is None:
+        raise PaymentRejected("Kredi yükleme işlemi bulunamadı")
+    if event.get("tutar") is not None and round(transaction["tutar"] * 100) != round(event["tutar"] * 100):
+        raise PaymentRejected("Ödeme tutarı işlemle uyuşmuyor")
+    
+    pending = {"id": transaction["id"], "durum": "beklemede"}
+    settled = {
+        "saglayici": event["saglayici"],
+        "saglayici_islem_id": event["saglayici_islem_id"],
+        "sonuclanma_tarihi": datetime.now(timezone.utc).isoformat()
+    }
+    
+    async def operation(session):
+        if not event["basarili"]:
+            result = await db.credit_transactions.update_one(
+                pending, {"$set": {"durum": "basarisiz", **settled}}, session=session
+            )
+            return "reddedildi" if result.modified_count else "zaten_islenmis", None
+        
+        result = await db.credit_transactions.update_one(
+            pending, {"$set": {"durum": "tamamlandi", **settled}}, session=session
+        )
+        if not result.modified_count:
+            return "zaten_islenmis", None
+        user = await db.users.find_one_and_update(
+            {"id": transaction["kullanici_id"]},
+            {"$inc": {"kredi": transaction["tutar"]}},
+            projection=LEADERBOARD_PROJECTION,
+            return_document=ReturnDocument.AFTER,
+            session=session
+        )
+        if user is None:
+            if session is None:
+                # Transaction yoksa işlem elle beklemeye geri alınır
+                await db.credit_transactions.update_one(
+                    {"id": transaction["id"]}, {"$set": {"durum": "beklemede"}}
+                )
+            raise PaymentRejected("Kullanıcı bulunamadı")
+        await db.credit_ledger.insert_many(ledger_entries(
+            user["id"], transaction["tutar"], "sistem:odeme", "yukleme",
+            transaction["id"], user["kredi"], settled["sonuclanma_tarihi"]
+        ), session=session)
+        return "tamamlandi", user
+    
+    sonuc, user = await run_ledger_transaction(operation)
+    if user is not None:
+        user_cache.invalidate(user["id"])
+        update_leaderboards(user)
+        await response_cache.invalidate("leaderboard")
+    return sonuc
+
+async def settle_batch() -> int:
+    events = await claim_batch(db.payment_events, SETTLEMENT_BATCH_SIZE, SETTLEMENT_LEASE_SECONDS)
+    if not events:
+        return 0
+    results = await asyncio.gather(*(settle_payment_event(event) for event in events), return_exceptions=True)
+    
+    now = datetime.now(timezone.utc)
+    operations = []
+    for event, result in zip(events, results):
+        if isinstance(result, str):
+            update = {"durum": "islendi", "sonuc": result, "islenme_tarihi": now.isoformat()}
+            settlement_stats[result] += 1
+        elif isinstance(result, PaymentRejected) or event["deneme"] + 1 >= SETTLEMENT_MAX_ATTEMPTS:
+            update = {"durum": "basarisiz", "deneme": event["deneme"] + 1, "son_hata": str(result) or type(result).__name__}
+            settlement_stats["basarisiz"] += 1
+        else:
+            backoff = min(SETTLEMENT_BACKOFF_SECONDS * 2 ** event["deneme"], DELIVERY_MAX_BACKOFF_SECONDS)
+            update = {
+                "durum": "beklemede",
+                "deneme": event["deneme"] + 1,
+                "sonraki_deneme": now + timedelta(seconds=backoff),
+                "son_hata": str(result) or type(result).__name__
+            }
+            settlement_stats["tekrar_denenecek"] += 1
+        operations.append(UpdateOne({"id": event["id"], "kilit": event["kilit"]}, {"$set": update, "$unset": {"kilit": ""}}))
+    await db.payment_events.bulk_write(operations, ordered=False)
+    return len(events)
+
+async def settlement_worker():
+    while True:
+        # Bildirim route'u yeni olay yazınca işçiyi beklemeden uyandırır
+        settlement_wakeup.clear()
+        try:
+            settled = await settle_batch()
+        except Exception:
+            logger.exception("Ödeme mutabakat işçisi hata verdi")
+            settled = 0
+        if settled < SETTLEMENT_BATCH_SIZE:
+            try:
+                await asyncio.wait_for(settlement_wakeup.wait(), SETTLEMENT_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+# ============ SERVER STATUS ============
+
+# /stats bellekten okunur: aktif oyuncu sayısı arka planda Minecraft Server
+# List Ping ile örneklenir, kayıtlı kullanıcı sayısı yazma yollarında
+# artırılıp azaltılır ve belirli aralıklarla veritabanından düzeltilir.
+
+def _pack_varint(value: int) -> bytes:
+    value &= 0xFFFFFFFF
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+async def _read_varint(reader) -> int:
+    value = 0
+    for shift in range(0, 35, 7):
+        byte = (await reader.readexactly(1))[0]
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value
+    raise ValueError("VarInt çok uzun")
+
+def _pack_packet(packet_id: int, payload: bytes = b"") -> bytes:
+    data = _pack_varint(packet_id) + payload
+    return _pack_varint(len(data)) + data
+
+async def query_server_status(host: str, port: int, timeout: float) -> dict:
+    """Minecraft Server List Ping; returns the status JSON of the server."""
+    async def ping():
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            address = host.encode("utf-8")
+            handshake = _pack_varint(-1) + _pack_varint(len(address)) + address + struct.pack(">H", port) + _pack_varint(1)
+            writer.write(_pack_packet(0x00, handshake) + _pack_packet(0x00))
+            await writer.drain()
+            await _read_varint(reader)  # paket uzunluğu
+            if await _read_varint(reader) != 0x00:
+                raise ValueError("Beklenmeyen durum paketi")
+            length = await _read_varint(reader)
+            return json.loads(await reader.readexactly(length))
+        finally:
+            writer.close()
+    return await asyncio.wait_for(ping(), timeout)
+
+class CircuitBreaker:
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+
+    def allow(self) -> bool:
+        return self.opened_at is None or time.monotonic() - self.opened_at >= self.cooldown
+
+    def success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def failure(self):
+        self.failures += 1
+        if self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "kapali"
+        return "yarim_acik" if self.allow() else "acik"
+
+class ServerStatusSampler:
+    def __init__(self, host: Optional[str], port: int, timeout: float, history_size: int, breaker: CircuitBreaker):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.breaker = breaker
+        self.online = None
+        self.players = 0
+        self.max_players = 0
+        self.history = deque(maxlen=history_size)
+
+    async def sample(self):
+        if self.breaker.allow():
+            try:
+                status = await query_server_status(self.host, self.port, self.timeout)
+                players = status.get("players", {})
+                self.players = int(players.get("online", 0))
+                self.max_players = int(players.get("max", 0))
+                self.online = True
+                self.breaker.success()
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError, AttributeError, TypeError):
+                self.online = False
+                self.players = 0
+                self.breaker.failure()
+        self.history.append({
+            "tarih": datetime.now(timezone.utc).isoformat(),
+            "aktif_oyuncu": self.players,
+            "cevrimici": self.online
+        })
+
+class RegisteredUserCounter:
+    def __init__(self):
+        self.value = 0
+
+    def add(self, delta: int):
+        self.value = max(self.value + delta, 0)
+
+    async def resync(self):
+        # Filtresiz sayım koleksiyon metadatasından gelir, tarama yapmaz
+        self.value = await db.users.estimated_document_count()
+
+status_sampler = ServerStatusSampler(
+    MC_STATUS_HOST,
+    MC_STATUS_PORT,
+    STATUS_TIMEOUT_SECONDS,
+    STATUS_HISTORY_SIZE,
+    CircuitBreaker(STATUS_BREAKER_THRESHOLD, STATUS_BREAKER_COOLDOWN_SECONDS)
+)
+registered_users = RegisteredUserCounter()
+
+async def status_poller():
+    last_resync = time.monotonic()
+    while True:
+        if MC_STATUS_HOST:
+            await status_sampler.sample()
+        # Diğer işçilerin kayıt/silme işlemleri burada yakalanır
+        if time.monotonic() - last_resync >= USER_COUNT_RESYNC_SECONDS:
+            try:
+                await registered_users.resync()
+            except Exception:
+                logger.exception("Kayıtlı kullanıcı sayısı güncellenemedi")
+            last_resync = time.monotonic()
+        await asyncio.sleep(STATUS_POLL_SECONDS)
+
+# ============ LIVE EVENTS ============
+
+# Yeni forum cevapları, haberler, satın almalar ve kredi yüklemeleri SSE ile
+# bağlı istemcilere delta olarak gönderilir. Kanallar: "haberler",
+# "alisverisler", "kredi-yuklemeler" ve "forum:<konu_id>". Olay kimliklerini
+# dağıtan broker verir ve dağıtım sırasıyla artar: change stream açıkken oplog
+# sırasındaki cluster time'dan (tüm işçilerde aynı), değilse time_ns'ten
+# türetilir. Yeniden bağlanan istemci Last-Event-ID ile kaçırdığı olayları son
+# LIVE_REPLAY_SIZE olaydan alır.
+
+LIVE_CHANNELS = {"haberler", "alisverisler", "kredi-yuklemeler"}
+LIVE_MAX_CHANNELS = 10
+
+class LiveSubscription:
+    def __init__(self, channels: set, queue_size: int):
+        self.channels = channels
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.closed = False
+
+class EventBroker:
+    def __init__(self, queue_size: int, replay_size: int):
+        self.queue_size = queue_size
+        self.subscribers = {}
+        self.replay = deque(maxlen=replay_size)
+        self.count = 0
+        self.published = 0
+        self.dropped = 0
+        self.last_id = 0
+
+    def subscribe(self, channels: set) -> LiveSubscription:
+        subscription = LiveSubscription(channels, self.queue_size)
+        for channel in channels:
+            self.subscribers.setdefault(channel, set()).add(subscription)
+        self.count += 1
+        return subscription
+
+    def unsubscribe(self, subscription: LiveSubscription):
+        if subscription.closed:
+            return
+        subscription.closed = True
+        self.count -= 1
+        for channel in subscription.channels:
+            subscribers = self.subscribers.get(channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.subscribers[channel]
+
+    def dispatch(self, channel: str, event_id: int, data: dict):
+        # Yayıncı saatleri ya da oplog sırası geri gitse de kimlik geri gitmez;
+        # akış son kimlikten küçük olayları atladığı için bu gerekli
+        event_id = max(event_id, self.last_id + 1)
+        self.last_id = event_id
+        event = (event_id, channel, json.dumps(data, ensure_ascii=False))
+        self.replay.append(event)
+        self.published += 1
+        for subscription in list(self.subscribers.get(channel, ())):
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Yetişemeyen istemci düşürülür; Last-Event-ID ile geri gelir
+                self.unsubscribe(subscription)
+                self.dropped += 1
+
+    def missed(self, channels: set, last_event_id: int) -> list:
+        return [event for event in self.replay if event[0] > last_event_id and event[1] in channels]
+
+    def stats(self) -> dict:
+        return {
+            "abone": self.count,
+            "kanal": len(self.subscribers),
+            "yayinlanan": self.published,
+            "dusurulen": self.dropped,
+            "change_stream": LIVE_CHANGE_STREAMS
+        }
+
+live_broker = EventBroker(LIVE_QUEUE_SIZE, LIVE_REPLAY_SIZE)
+
+def cluster_time_event_id(cluster_time) -> int:
+    # BSON Timestamp (saniye, sayaç) tek bir artan tamsayıya çevrilir
+    return (cluster_time.time << 32) | cluster_time.inc
+
+async def publish_live_event(channel: str, data: dict):
+    if LIVE_CHANGE_STREAMS:
+        # Yerel dağıtım da change stream üzerinden gelir
+        await db.live_events.insert_one({
+            "kanal": channel,
+            "veri": data,
+            "tarih": datetime.now(timezone.utc)
+        })
+    else:
+        live_broker.dispatch(channel, time.time_ns(), data)
+
+async def live_event_watcher():
+    resume_token = None
+    while True:
+        try:
+            async with db.live_events.watch(
+                [{"$match": {"operationType": "insert"}}],
+                resume_after=resume_token
+            ) as stream:
+                async for change in stream:
+                    doc = change["fullDocument"]
+                    live_broker.dispatch(doc["kanal"], cluster_time_event_id(change["clusterTime"]), doc["veri"])
+                    resume_token = stream.resume_token
+        except PyMongoError:
+            logger.exception("Canlı olay change stream'i koptu, yeniden bağlanılıyor")
+            await asyncio.sleep(5)
+
+def format_sse(event: tuple) -> str:
+    event_id, channel, data = event
+    return f"id: {event_id}\nevent: {channel}\ndata: {data}\n\n"
+
+async def live_event_stream(request: Request, channels: set, last_event_id: int):
+    subscription = live_broker.subscribe(channels)
+    try:
+        for event in live_broker.missed(subscription.channels, last_event_id):
+            last_event_id = event[0]
+            yield format_sse(event)
+        while not subscription.closed:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), LIVE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield ": ping\n\n"
+                continue
+            # Tekrar oynatılan olaylar kuyrukta da olabilir
+            if event[0] > last_event_id:
+                last_event_id = event[0]
+                yield format_sse(event)
+    finally:
+        live_broker.unsubscribe(subscription)
+
+# ============ FORUM COUNTERS ============
+
+# forum_topics belgelerinde cevap_sayisi ve son_cevap_tarihi tutulur; konu
+# listesi cevapları $lookup ile saymak zorunda kalmaz.
+
+async def refresh_topic_counters(konu_id: str):
+    cevap_sayisi = await db.forum_replies.count_documents({"konu_id": konu_id})
+    last_reply = await db.forum_replies.find_one(
+        {"konu_id": konu_id},
+        {"_id": 0, "tarih": 1},
+        sort=[("tarih", DESCENDING)]
+    )
+    await db.forum_topics.update_one(
+        {"id": konu_id},
+        {"$set": {
+            "cevap_sayisi": cevap_sayisi,
+            "son_cevap_tarihi": last_reply["tarih"] if last_reply else None
+        }}
+    )
+
+async def reconcile_forum_counters(only_missing: bool = False) -> int:
+    """Recompute the denormalized reply counters from forum_replies.
+
+    With ``only_missing`` only topics that never had counters are touched,
+    which is what the startup backfill uses.
+    """
+    query = {"cevap_sayisi": {"$exists": False}} if only_missing else {}
+    updated = 0
+    batch = []
+    async for topic in db.forum_topics.find(query, {"_id": 0, "id": 1}):
+        batch.append(topic["id"])
+        if len(batch) >= 500:
+            updated += await _reconcile_topic_batch(batch)
+            batch = []
+    if batch:
+        updated += await _reconcile_topic_batch(batch)
+    return updated
+
+async def _reconcile_topic_batch(konu_ids: List[str]) -> int:
+    counts = {
+        row["_id"]: row
+        async for row in db.forum_replies.aggregate([
+            {"$match": {"konu_id": {"$in": konu_ids}}},
+            {"$group": {
+                "_id": "$konu_id",
+                "cevap_sayisi": {"$sum": 1},
+                "son_cevap_tarihi": {"$max": "$tarih"}
+            }}
+        ])
+    }
+    operations = [
+        UpdateOne({"id": konu_id}, {"$set": {
+            "cevap_sayisi": counts.get(konu_id, {}).get("cevap_sayisi", 0),
+            "son_cevap_tarihi": counts.get(konu_id, {}).get("son_cevap_tarihi")
+        }})
+        for konu_id in konu_ids
+    ]
+    result = await db.forum_topics.bulk_write(operations, ordered=False)
+    return result.matched_count
+
+# ============ AUTHOR FIELDS ============
+
+# Yazar görünen bilgileri (ad, yetki rozeti) yazılırken belgeye kopyalanır;
+# okuma route'ları users'a $lookup yapmaz ve silinen kullanıcıların içerikleri
+# listelerden düşmez. Ad veya yetki değiştiğinde kullanıcı
+# yazar_senkron_bekliyor ile işaretlenir ve arka planda tüm kopyalar
+# güncellenir; yarım kalan eşitlemeler startup'ta sürdürülür.
+
+AUTHOR_FIELDS = {
+    "forum_topics": ("yazar_id", {"yazar_adi": "kullanici_adi", "yazar_yetki": "yetki", "yazar_yetki_gorseli": "yetki_gorseli"}),
+    "forum_replies": ("yazar_id", {"yazar_adi": "kullanici_adi", "yazar_yetki": "yetki", "yazar_yetki_gorseli": "yetki_gorseli"}),
+    "news": ("yazar_id", {"yazar_adi": "kullanici_adi", "yazar_yetki": "yetki", "yazar_yetki_gorseli": "yetki_gorseli"}),
+    "purchases": ("kullanici_id", {"kullanici_adi": "kullanici_adi"}),
+    "credit_transactions": ("kullanici_id", {"kullanici_adi": "kullanici_adi"}),
+}
+DELETED_AUTHOR_NAME = "Silinmiş kullanıcı"
+
+author_sync_tasks = set()
+
+def author_fields(collection: str, user: dict) -> dict:
+    _, fields = AUTHOR_FIELDS[collection]
+    return {field: user.get(source) for field, source in fields.items()}
+
+async def sync_author_fields(user_id: str) -> int:
+    user = await db.users.find_one({"id": user_id}, {"_id": 0, "kullanici_adi": 1, "yetki": 1, "yetki_gorseli": 1})
+    if user is None:
+        return 0
+    updated = 0
+    for collection, (key, _) in AUTHOR_FIELDS.items():
+        values = author_fields(collection, user)
+        result = await db[collection].update_many(
+            {key: user_id, "$or": [{field: {"$ne": value}} for field, value in values.items()]},
+            {"$set": values}
+        )
+        updated += result.modified_count
+    if updated:
+        await response_cache.invalidate("haberler", "leaderboard")
+        await collection_versions.bump("news")
+    # Bu sırada tekrar değişen kullanıcının işareti bir sonraki eşitlemeye kalır
+    await db.users.update_one({"id": user_id, **user}, {"$unset": {"yazar_senkron_bekliyor": ""}})
+    return updated
+
+def schedule_author_sync(user_id: str):
+    async def run():
+        try:
+            updated = await sync_author_fields(user_id)
+            logger.info(f"{user_id} için {updated} belgede yazar bilgisi güncellendi")
+        except Exception:
+            logger.exception(f"{user_id} için yazar bilgisi eşitlenemedi")
+    task = asyncio.create_task(run())
+    author_sync_tasks.add(task)
+    task.add_done_callback(author_sync_tasks.discard)
+
+async def resume_author_syncs() -> int:
+    pending = await db.users.distinct("id", {"yazar_senkron_bekliyor": True})
+    for user_id in pending:
+        schedule_author_sync(user_id)
+    return len(pending)
+
+async def backfill_author_fields() -> int:
+    """Copy author fields onto documents written before they were stored."""
+    filled = 0
+    for collection, (key, fields) in AUTHOR_FIELDS.items():
+        first_field = next(iter(fields))
+        user_ids = await db[collection].distinct(key, {first_field: {"$exists": False}})
+        for start in range(0, len(user_ids), 500):
+            batch = user_ids[start:start + 500]
+            users = await db.users.find(
+                {"id": {"$in": batch}},
+                {"_id": 0, "id": 1, "kullanici_adi": 1, "yetki": 1, "yetki_gorseli": 1}
+            ).to_list(len(batch))
+            by_id = {user["id"]: user for user in users}
+            result = await db[collection].bulk_write([
+                UpdateMany(
+                    {key: user_id, first_field: {"$exists": False}},
+                    {"$set": author_fields(collection, by_id.get(user_id, {"kullanici_adi": DELETED_AUTHOR_NAME}))}
+                )
+                for user_id in batch
+            ], ordered=False)
+            filled += result.modified_count
+    return filled
+
+# ============ SEARCH ============
+
+# Forum konuları, cevaplar, haberler ve market ürünleri tek bir
+# search_documents koleksiyonunda, metin indeksiyle aranır. Metin Türkçe
+# kurallarıyla küçültülür (İ→i, I→ı) ve aksanlardan arındırılır; böylece
+# "sikayet", "ŞİKAYET" ve "şikâyet" aynı terime düşer. Belgeler yazma
+# route'larında güncellenir. Yeniden oluşturma mevcut belgelerin üzerine
+# yazar ve ancak sonunda, başlangıcından önce damgalanmış (kaynağı silinmiş)
+# belgeleri temizler; arama bu sırada boş dönmez.
+
+SEARCH_FIELDS = {
+    "konu": ("forum_topics", "baslik", "icerik"),
+    "cevap": ("forum_replies", None, "icerik"),
+    "haber": ("news", "baslik", "icerik"),
+    "urun": ("market_items", "isim", "aciklama"),
+}
+SEARCH_TOKEN = re.compile(r"\w{2,}")
+SEARCH_MAX_TERMS = 10
+SEARCH_TEXT_LIMIT = 5000
+SEARCH_SNIPPET_CHARS = 160
+
+_TURKISH_UPPER = str.maketrans({"İ": "i", "I": "ı"})
+_TURKISH_ACCENTS = str.maketrans("ıışçğöüâîû", "iiscgouaiu")
+
+def fold_text(text: str) -> str:
+    return text.translate(_TURKISH_UPPER).lower().translate(_TURKISH_ACCENTS)
+
+def search_terms(text: str) -> List[str]:
+    return SEARCH_TOKEN.findall(fold_text(text or ""))
+
+def highlight_snippet(text: str, terms: set, width: int = SEARCH_SNIPPET_CHARS) -> str:
+    """Escape ``text`` and wrap query terms in <mark>, around the first match."""
+    folded = fold_text(text)
+    if len(folded) != len(text):
+        # Küçültme uzunluğu değiştirdiyse konumlar metne denk gelmez
+        folded = text.lower()
+    spans = [m.span() for m in SEARCH_TOKEN.finditer(folded) if m.group() in terms]
+    start = max(0, spans[0][0] - width // 3) if spans else 0
+    if start:
+        space = text.find(" ", start)
+        start = space + 1 if 0 <= space < spans[0][0] else start
+    end = min(len(text), start + width)
+    parts = ["…"] if start else []
+    pos = start
+    for span_start, span_end in spans:
+        if span_start < pos or span_end > end:
+            continue
+        parts.append(html.escape(text[pos:span_start]))
+        parts.append(f"<mark>{html.escape(text[span_start:span_end])}</mark>")
+        pos = span_end
+    parts.append(html.escape(text[pos:end]))
+    if end < len(text):
+        parts.append("…")
+    return "".join(parts)
+
+def build_search_document(tur: str, doc: dict, baslik: Optional[str] = None) -> dict:
+    # Cevaplarda başlık yalnızca gösterim içindir, aranmaz
+    _, title_field, body_field = SEARCH_FIELDS[tur]
+    title = (doc.get(title_field) or "") if title_field else ""
+    metin = doc.get(body_field) or ""
+    document = {
+        "_id": f"{tur}:{doc['id']}",
+        "tur": tur,
+        "id": doc["id"],
+        "baslik": title or baslik or "",
+        "metin": metin[:SEARCH_TEXT_LIMIT],
+        "arama_baslik": " ".join(search_terms(title)),
+        "arama_metin": " ".join(search_terms(metin)),
+        "tarih": doc.get("tarih") or doc.get("olusturulma_tarihi"),
+        "kategori": doc.get("kategori"),
+        "indekslenme": datetime.now(timezone.utc)
+    }
+    if doc.get("konu_id"):
+        document["konu_id"] = doc["konu_id"]
+    return document
+
+async def index_search_document(tur: str, doc: dict, baslik: Optional[str] = None):
+    document = build_search_document(tur, doc, baslik)
+    await db.search_documents.replace_one({"_id": document["_id"]}, document, upsert=True)
+
+async def remove_search_document(tur: str, doc_id: str):
+    await db.search_documents.delete_one({"_id": f"{tur}:{doc_id}"})
+
+async def rebuild_search_index() -> int:
+    started = datetime.now(timezone.utc)
+    indexed = 0
+    for tur, (collection, _, _) in SEARCH_FIELDS.items():
+        cursor = db[collection].find({}, {"_id": 0})
+        while batch := await cursor.to_list(500):
+            titles = {}
+            if tur == "cevap":
+                topics = await db.forum_topics.find(
+                    {"id": {"$in": list({doc["konu_id"] for doc in batch})}},
+                    {"_id": 0, "id": 1, "baslik": 1}
+                ).to_list(None)
+                titles = {topic["id"]: topic["baslik"] for topic in topics}
+            requests = []
+            for doc in batch:
+                document = build_search_document(tur, doc, titles.get(doc.get("konu_id")))
+                requests.append(ReplaceOne({"_id": document["_id"]}, document, upsert=True))
+            await db.search_documents.bulk_write(requests, ordered=False)
+            indexed += len(requests)
+    # Bu sırada route'ların yazdıkları daha yeni damgalıdır, silinmez
+    await db.search_documents.delete_many({"indekslenme": {"$not": {"$gte": started}}})
+    return indexed
+
+def encode_search_cursor(row: dict) -> str:
+    raw = json.dumps([row["skor"], row["_id"]]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_search_cursor(cursor: str) -> tuple:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        skor, key = json.loads(base64.urlsafe_b64decode(padded))
+        if not isinstance(skor, (int, float)) or not isinstance(key, str):
+            raise ValueError
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Geçersiz sayfa imleci")
+    return skor, key
+
+# ============ BULK OPERATIONS ============
+
+# Toplu yönetici işlemleri hedefleri BULK_BATCH_SIZE'lık gruplar halinde
+# işler; her grup tek bir update_many/delete_many/bulk_write (ordered=False)
+# ile yazılır. Filtre verildiğinde hedefler id sırasıyla keyset üzerinden
+# okunur, böylece güncellenen belgeler filtreden çıksa da ikinci kez
+# işlenmez. İlerleme her gruptan sonra NDJSON satırı olarak akıtılabilir;
+# iş, istemci bağlantıyı kapatsa da arka planda tamamlanır.
+
+USER_FILTER_FIELDS = {
+    "rol": ("rol", "$eq"),
+    "yetki": ("yetki", "$eq"),
+    "kredi_min": ("kredi", "$gte"),
+    "kredi_max": ("kredi", "$lte"),
+    "kayit_sonrasi": ("kayit_tarihi", "$gte"),
+    "kayit_oncesi": ("kayit_tarihi", "$lt"),
+}
+ITEM_FILTER_FIELDS = {
+    "kategori": ("kategori", "$eq"),
+    "fiyat_min": ("fiyat", "$gte"),
+    "fiyat_max": ("fiyat", "$lte"),
+}
+REPORT_FILTER_FIELDS = {
+    "konu": ("konu", "$eq"),
+    "oncesi": ("tarih", "$lt"),
+}
+
+bulk_jobs = set()
+
+def bulk_targets(body, filter_fields: dict) -> tuple:
+    if body.idler is not None:
+        if len(body.idler) > BULK_MAX_IDS:
+            raise HTTPException(status_code=400, detail=f"En fazla {BULK_MAX_IDS} id gönderilebilir")
+        return list(dict.fromkeys(body.idler)), None
+    if getattr(body, "filtre", None) is None:
+        raise HTTPException(status_code=400, detail="idler veya filtre gerekli")
+    query = {}
+    for attr, (field, op) in filter_fields.items():
+        value = getattr(body.filtre, attr)
+        if value is not None:
+            query.setdefault(field, {})[op] = value
+    return None, query
+
+async def run_bulk_job(collection: str, ids: Optional[List[str]], query: Optional[dict], apply, finish=None):
+    """Run ``apply(batch_ids) -> (changed, {id: error})`` over the targets and yield progress."""
+    total = len(ids) if ids is not None else await db[collection].count_documents(query)
+    processed = changed = failed = 0
+    last_id = None
+    while True:
+        if ids is not None:
+            batch = ids[processed:processed + BULK_BATCH_SIZE]
+            if not batch:
+                break
+            existing = set(await db[collection].distinct("id", {"id": {"$in": batch}}))
+        else:
+            page = {"$and": [query, {"id": {"$gt": last_id}}]} if last_id else query
+            rows = await db[collection].find(page, {"_id": 0, "id": 1}).sort("id", 1).limit(BULK_BATCH_SIZE).to_list(BULK_BATCH_SIZE)
+            if not rows:
+                break
+            batch = [row["id"] for row in rows]
+            existing = set(batch)
+            last_id = batch[-1]
+        
+        errors = [{"id": doc_id, "durum": "bulunamadi"} for doc_id in batch if doc_id not in existing]
+        targets = [doc_id for doc_id in batch if doc_id in existing]
+        if targets:
+            try:
+                batch_changed, batch_errors = await apply(targets)
+                changed += batch_changed
+                errors.extend({"id": doc_id, "durum": "hata", "hata": error} for doc_id, error in batch_errors.items())
+            except PyMongoError as exc:
+                errors.extend({"id": doc_id, "durum": "hata", "hata": str(exc)} for doc_id in targets)
+        processed += len(batch)
+        failed += len(errors)
+        yield {"islenen": processed, "toplam": total, "degisen": changed, "hatalar": errors}
+    
+    if finish is not None:
+        await finish()
+    yield {"islenen": processed, "toplam": total, "degisen": changed, "hata_sayisi": failed, "hatalar": [], "tamamlandi": True}
+
+async def import_users(rows: List[IceAktarilanKullanici]):
+    """Insert new users in batches with ordered=False and yield progress like run_bulk_job."""
+    total = len(rows)
+    processed = changed = failed = 0
+    for start in range(0, total, BULK_BATCH_SIZE):
+        batch = rows[start:start + BULK_BATCH_SIZE]
+        errors = []
+        docs = []
+        for row in batch:
+            if pwd_context.identify(row.sifre_hash, required=False) is None:
+                errors.append({"kullanici_adi": row.kullanici_adi, "durum": "hata", "hata": "Şifre hash'i bcrypt değil"})
+            else:
+                docs.append(new_user_doc(row.kullanici_adi, row.email, row.sifre_hash, row.dogum_tarihi, row.kayit_tarihi))
+        
+        rejected = {}
+        if docs:
+            try:
+                await db.users.insert_many(docs, ordered=False)
+            except BulkWriteError as exc:
+                for error in exc.details.get("writeErrors", []):
+                    rejected[error["index"]] = duplicate_user_message(error) or error.get("errmsg", "")
+            except PyMongoError as exc:
+                rejected = {index: str(exc) for index in range(len(docs))}
+        for index, doc in enumerate(docs):
+            if index in rejected:
+                errors.append({"kullanici_adi": doc["kullanici_adi"], "durum": "hata", "hata": rejected[index]})
+            else:
+                update_leaderboards(doc)
+        inserted = len(docs) - len(rejected)
+        registered_users.add(inserted)
+        
+        processed += len(batch)
+        changed += inserted
+        failed += len(errors)
+        yield {"islenen": processed, "toplam": total, "degisen": changed, "hatalar": errors}
+    
+    yield {"islenen": processed, "toplam": total, "degisen": changed, "hata_sayisi": failed, "hatalar": [], "tamamlandi": True}
+
+async def bulk_response(job, akis: bool):
+    queue = asyncio.Queue()
+    
+    async def run():
+        try:
+            async for progress in job:
+                await queue.put(progress)
+        except Exception:
+            logger.exception("Toplu işlem yarıda kaldı")
+            await queue.put({"hata": "Toplu işlem yarıda kaldı", "hatalar": [], "tamamlandi": False})
+        finally:
+            await queue.put(None)
+    
+    task = asyncio.create_task(run())
+    bulk_jobs.add(task)
+    task.add_done_callback(bulk_jobs.discard)
+    
+    if akis:
+        async def stream():
+            while (progress := await queue.get()) is not None:
+                yield json.dumps(progress, ensure_ascii=False) + "\n"
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+    
+    result = {"hatalar": []}
+    while (progress := await queue.get()) is not None:
+        errors = progress.pop("hatalar")
+        result.update(progress)
+        result["hatalar"].extend(errors)
+    return result
+
+async def bulk_write_per_item(collection: str, operations: Dict[str, object]) -> tuple:
+    """bulk_write one operation per id with ordered=False; returns (modified, {id: error})."""
+    ids = list(operations)
+    try:
+        result = await db[collection].bulk_write([operations[doc_id] for doc_id in ids], ordered=False)
+        return result.modified_count, {}
+    except BulkWriteError as exc:
+        errors = {ids[error["index"]]: error.get("errmsg", "") for error in exc.details.get("writeErrors", [])}
+        return exc.details.get("nModified", 0), errors
 
-class ReportCreate(BaseModel):
-    baslik: str
-    aciklama: str
-    konu: str
+# ============ EXPORT ============
 
-class ThemeCreate(BaseModel):
-    isim: str
-    gorsel_url: str
-    fiyat: float = 0
+# Yönetici dışa aktarımları Motor imlecinden doğrudan akıtılır; bellekte en
+# fazla EXPORT_BATCH_SIZE satır tutulur. Şifre hash'i gibi alanlar izin
+# listesinde olmadığı için hiçbir zaman dışarı çıkmaz.
 
-class SifreDegistir(BaseModel):
-    eski_sifre: str
-    yeni_sifre: str
+EXPORT_SOURCES = {
+    "kullanicilar": ("users", "kayit_tarihi", [
+        "id", "kullanici_adi", "email", "kredi", "dinar", "ada_seviyesi",
+        "rol", "yetki", "dogum_tarihi", "kayit_tarihi"
+    ]),
+    "satin-almalar": ("purchases", "tarih", [
+        "id", "kullanici_id", "kullanici_adi", "urun_id", "urun_adi", "toplam_fiyat", "tarih"
+    ]),
+    "kredi-hareketleri": ("credit_transactions", "tarih", [
+        "id", "kullanici_id", "kullanici_adi", "tutar", "tip", "durum", "tarih"
+    ]),
+    "kredi-defteri": ("credit_ledger", "tarih", [
+        "id", "islem_id", "hesap", "kullanici_id", "tutar", "bakiye_sonrasi", "tip", "referans", "tarih"
+    ]),
+}
 
-class BiyografiGuncelle(BaseModel):
-    biyografi: str
+def _parse_export_date(value: Optional[str], name: str) -> Optional[str]:
+    if value is None:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Geçersiz tarih: {name}")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    # Tarihler ISO metni olarak saklanır; karşılaştırma aynı biçimde yapılır
+    return parsed.astimezone(timezone.utc).isoformat()
 
-# ============ AUTH HELPERS ============
+async def export_rows(collection: str, query: dict, fields: List[str], sort_field: str, bicim: str):
+    cursor = db[collection].find(query, {"_id": 0, **{field: 1 for field in fields}})
+    cursor = cursor.sort(sort_field, ASCENDING).batch_size(EXPORT_BATCH_SIZE)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if bicim == "csv" else None
+    if writer:
+        writer.writerow(fields)
+    rows = 0
+    async for doc in cursor:
+        if writer:
+            writer.writerow(["" if doc.get(field) is None else doc.get(field) for field in fields])
+        else:
+            buffer.write(json.dumps({field: doc.get(field) for field in fields}, ensure_ascii=False))
+            buffer.write("\n")
+        rows += 1
+        if rows % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+# ============ PAGINATION ============
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+# Sayfalama (tarih, id) üzerinden yapılır: imleç son görülen satırın tarih ve
+# id değerini taşır, sonraki sayfa indeks üzerinde doğrudan o noktadan başlar.
+# Liste döndüren route'larda sonraki imleç X-Next-Cursor başlığında gelir.
 
-def create_access_token(data: dict):
-    to_encode = data.copy()
-    expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+def encode_cursor(doc: dict) -> str:
+    raw = json.dumps([doc["tarih"], doc["id"]]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Kimlik doğrulanamadı",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+def decode_cursor(cursor: str) -> tuple:
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    
-    user = await db.users.find_one({"id": user_id}, {"_id": 0})
-    if user is None:
-        raise credentials_exception
-    user.setdefault("acik_temalar", [])
-    user.setdefault("aktif_tema_id", None)
-    user.setdefault("aktif_tema_gorsel", None)
-    user.setdefault("biyografi", None)
-    user.setdefault("ada_seviyesi", 0)
-    user.setdefault("dinar", 0)
-    return user
+        padded = cursor + "=" * (-len(cursor) % 4)
+        tarih, doc_id = json.loads(base64.urlsafe_b64decode(padded))
+        if not isinstance(tarih, str) or not isinstance(doc_id, str):
+            raise ValueError
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Geçersiz sayfa imleci")
+    return tarih, doc_id
 
-async def get_admin_user(current_user: dict = Depends(get_current_user)):
-    if current_user.get("rol") != "admin":
-        raise HTTPException(status_code=403, detail="Yönetici yetkisi gerekli")
-    return current_user
+def keyset_filter(cursor: Optional[str], direction: int) -> dict:
+    if not cursor:
+        return {}
+    tarih, doc_id = decode_cursor(cursor)
+    op = "$lt" if direction == DESCENDING else "$gt"
+    return {"$or": [
+        {"tarih": {op: tarih}},
+        {"tarih": tarih, "id": {op: doc_id}}
+    ]}
+
+def page_results(rows: list, limit: int):
+    # Sorgular limit + 1 satır çeker; fazlası sonraki sayfanın varlığını gösterir
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1])
+    return rows, None
 
 # ============ BASIC ROUTES ============
 
@@ -161,62 +2952,93 @@ async def root():
 
 # ============ AUTH ROUTES ============
 
-@api_router.post("/auth/kayit", response_model=dict)
-async def kayit_ol(user: UserRegister):
-    # Kullanıcı adı kontrolü
-    existing_user = await db.users.find_one({"kullanici_adi": user.kullanici_adi})
-    if existing_user:
-        raise HTTPException(status_code=400, detail="Bu kullanıcı adı zaten kullanılıyor")
-    
-    # Email kontrolü
-    existing_email = await db.users.find_one({"email": user.email})
-    if existing_email:
-        raise HTTPException(status_code=400, detail="Bu email zaten kullanılıyor")
-    
-    if not user.gizlilik_sozlesmesi:
-        raise HTTPException(status_code=400, detail="Gizlilik sözleşmesini kabul etmelisiniz")
-    
-    user_id = str(uuid.uuid4())
-    user_doc = {
-        "id": user_id,
-        "kullanici_adi": user.kullanici_adi,
-        "email": user.email,
-        "sifre_hash": get_password_hash(user.sifre),
+# Kullanıcı adı ve email tekilliğini users üzerindeki büyük/küçük harf duyarsız
+# unique indeksler sağlar; çakışan kayıt DuplicateKeyError ile döner.
+USER_DUPLICATE_MESSAGES = {
+    "kullanici_adi": "Bu kullanıcı adı zaten kullanılıyor",
+    "email": "Bu email zaten kullanılıyor",
+}
+
+def duplicate_user_message(details: Optional[dict]) -> Optional[str]:
+    """Map a duplicate key error on users to its Turkish message."""
+    details = details or {}
+    fields = list(details.get("keyPattern") or {})
+    if not fields:
+        # Eski sunucular keyPattern döndürmez, indeks adı hata mesajındadır
+        match = re.search(r"index: (\w+?)_(?:1|ci)\b", details.get("errmsg", ""))
+        fields = [match.group(1)] if match else []
+    for field in fields:
+        if field in USER_DUPLICATE_MESSAGES:
+            return USER_DUPLICATE_MESSAGES[field]
+    return None
+
+def new_user_doc(kullanici_adi: str, email: str, sifre_hash: str, dogum_tarihi: Optional[str],
+                 kayit_tarihi: Optional[str] = None) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "kullanici_adi": kullanici_adi,
+        "email": email,
+        "sifre_hash": sifre_hash,
         "kredi": 0.0,
         "profil_arka_plani": None,
         "rol": "user",
         "yetki": "Oyuncu",
         "yetki_gorseli": None,
-        "dogum_tarihi": user.dogum_tarihi,
-        "kayit_tarihi": datetime.now(timezone.utc).isoformat(),
+        "dogum_tarihi": dogum_tarihi,
+        "kayit_tarihi": kayit_tarihi or datetime.now(timezone.utc).isoformat(),
         "acik_temalar": [],
         "aktif_tema_id": None,
         "aktif_tema_gorsel": None,
         "biyografi": None,
         "ada_seviyesi": 0,
-        "dinar": 0.0
+        "dinar": 0.0,
+        "token_surumu": 0
     }
+
+@api_router.post("/auth/kayit", response_model=dict)
+async def kayit_ol(user: UserRegister):
+    if not user.gizlilik_sozlesmesi:
+        raise HTTPException(status_code=400, detail="Gizlilik sözleşmesini kabul etmelisiniz")
     
-    await db.users.insert_one(user_doc)
-    access_token = create_access_token(data={"sub": user_id})
+    # Tekillik indeksi kurulamamış alanlar için eski ön kontrol
+    for field, message in USER_DUPLICATE_MESSAGES.items():
+        if field not in registration_state["indeksli_alanlar"]:
+            if await db.users.find_one({field: getattr(user, field)}, {"_id": 1}):
+                raise HTTPException(status_code=400, detail=message)
     
-    return {
-        "message": "Kayıt başarılı",
-        "access_token": access_token,
-        "token_type": "bearer"
-    }
+    user_doc = new_user_doc(user.kullanici_adi, user.email, await get_password_hash_async(user.sifre), user.dogum_tarihi)
+    try:
+        await db.users.insert_one(user_doc)
+    except DuplicateKeyError as e:
+        message = duplicate_user_message(e.details)
+        if message is None:
+            raise
+        raise HTTPException(status_code=400, detail=message)
+    update_leaderboards(user_doc)
+    registered_users.add(1)
+    
+    return {"message": "Kayıt başarılı", **await create_session(user_doc)}
 
 @api_router.post("/auth/giris", response_model=Token)
 async def giris_yap(user: UserLogin):
     db_user = await db.users.find_one({"kullanici_adi": user.kullanici_adi}, {"_id": 0})
-    if not db_user or not verify_password(user.sifre, db_user["sifre_hash"]):
+    if not db_user or not await verify_password_async(user.sifre, db_user["sifre_hash"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Kullanıcı adı veya şifre hatalı"
         )
     
-    access_token = create_access_token(data={"sub": db_user["id"]})
-    return {"access_token": access_token, "token_type": "bearer"}
+    return await create_session(db_user)
+
+@api_router.post("/auth/yenile", response_model=Token)
+async def refresh_tokens(body: TokenYenile):
+    return await rotate_session(body.refresh_token)
+
+@api_router.post("/auth/cikis")
+async def logout(body: TokenYenile):
+    session_id, _, secret = body.refresh_token.partition(".")
+    await db.sessions.delete_one({"id": session_id, "token_hash": _refresh_hash(secret)})
+    return {"message": "Çıkış yapıldı"}
 
 @api_router.get("/auth/me", response_model=UserResponse)
 async def get_me(current_user: dict = Depends(get_current_user)):
@@ -244,18 +3066,22 @@ async def update_profile(profil_arka_plani: str, current_user: dict = Depends(ge
         {"id": current_user["id"]},
         {"$set": {"profil_arka_plani": profil_arka_plani}}
     )
+    user_cache.invalidate(current_user["id"])
     return {"message": "Profil güncellendi"}
 
 @api_router.put("/users/sifre")
 async def change_password(data: SifreDegistir, current_user: dict = Depends(get_current_user)):
     user_full = await db.users.find_one({"id": current_user["id"]}, {"_id": 0})
-    if not verify_password(data.eski_sifre, user_full["sifre_hash"]):
+    if not await verify_password_async(data.eski_sifre, user_full["sifre_hash"]):
         raise HTTPException(status_code=400, detail="Mevcut şifre hatalı")
     await db.users.update_one(
         {"id": current_user["id"]},
-        {"$set": {"sifre_hash": get_password_hash(data.yeni_sifre)}}
+        {"$set": {"sifre_hash": await get_password_hash_async(data.yeni_sifre)}}
     )
-    return {"message": "Şifre başarıyla değiştirildi"}
+    # Diğer cihazlardaki oturumlar kapanır, bu istemci yeni token ile devam eder
+    versions = await revoke_user_tokens([current_user["id"]])
+    tokens = await create_session({**current_user, "token_surumu": versions[current_user["id"]]})
+    return {"message": "Şifre başarıyla değiştirildi", **tokens}
 
 @api_router.put("/users/biyografi")
 async def update_biography(data: BiyografiGuncelle, current_user: dict = Depends(get_current_user)):
@@ -263,35 +3089,30 @@ async def update_biography(data: BiyografiGuncelle, current_user: dict = Depends
         {"id": current_user["id"]},
         {"$set": {"biyografi": data.biyografi}}
     )
+    user_cache.invalidate(current_user["id"])
     return {"message": "Biyografi güncellendi"}
 
 # ============ LEADERBOARD ROUTES ============
 
 @api_router.get("/leaderboard/kredi")
 async def get_top_credits():
-    users = await db.users.find({}, {"_id": 0, "sifre_hash": 0}).sort("kredi", -1).limit(10).to_list(10)
-    return users
+    return await leaderboards["kredi"].top(LEADERBOARD_SIZE)
 
 @api_router.get("/leaderboard/son-kayitlar")
 async def get_latest_users():
-    users = await db.users.find({}, {"_id": 0, "sifre_hash": 0}).sort("kayit_tarihi", -1).limit(10).to_list(10)
-    return users
+    return await leaderboards["kayit_tarihi"].top(LEADERBOARD_SIZE)
 
 @api_router.get("/leaderboard/son-alisverisler")
 async def get_latest_purchases():
+    return await response_cache.get_or_compute("leaderboard", "son-alisverisler", "", _latest_purchases, ttl=10)
+
+async def _latest_purchases():
     purchases = await db.purchases.aggregate([
         {"$sort": {"tarih": -1}},
         {"$limit": 10},
-        {"$lookup": {
-            "from": "users",
-            "localField": "kullanici_id",
-            "foreignField": "id",
-            "as": "kullanici"
-        }},
-        {"$unwind": "$kullanici"},
         {"$project": {
             "_id": 0,
-            "kullanici_adi": "$kullanici.kullanici_adi",
+            "kullanici_adi": 1,
             "urun_adi": 1,
             "toplam_fiyat": 1,
             "tarih": 1
@@ -301,20 +3122,16 @@ async def get_latest_purchases():
 
 @api_router.get("/leaderboard/son-kredi-yuklemeler")
 async def get_latest_credit_loads():
+    return await response_cache.get_or_compute("leaderboard", "son-kredi-yuklemeler", "", _latest_credit_loads, ttl=10)
+
+async def _latest_credit_loads():
     transactions = await db.credit_transactions.aggregate([
         {"$match": {"tip": "yukleme"}},
         {"$sort": {"tarih": -1}},
         {"$limit": 10},
-        {"$lookup": {
-            "from": "users",
-            "localField": "kullanici_id",
-            "foreignField": "id",
-            "as": "kullanici"
-        }},
-        {"$unwind": "$kullanici"},
         {"$project": {
             "_id": 0,
-            "kullanici_adi": "$kullanici.kullanici_adi",
+            "kullanici_adi": 1,
             "tutar": 1,
             "tarih": 1
         }}
@@ -323,55 +3140,39 @@ async def get_latest_credit_loads():
 
 @api_router.get("/leaderboard/ada-seviyesi")
 async def get_top_island_level():
-    users = await db.users.find({}, {"_id": 0, "sifre_hash": 0}).sort("ada_seviyesi", -1).limit(10).to_list(10)
-    for u in users:
-        u.setdefault("ada_seviyesi", 0)
-        u.setdefault("dinar", 0)
-        u.setdefault("biyografi", None)
-        u.setdefault("acik_temalar", [])
-        u.setdefault("aktif_tema_id", None)
-        u.setdefault("aktif_tema_gorsel", None)
-    return users
+    return await leaderboards["ada_seviyesi"].top(LEADERBOARD_SIZE)
 
 @api_router.get("/leaderboard/dinar")
 async def get_top_dinar():
-    users = await db.users.find({}, {"_id": 0, "sifre_hash": 0}).sort("dinar", -1).limit(10).to_list(10)
-    for u in users:
-        u.setdefault("ada_seviyesi", 0)
-        u.setdefault("dinar", 0)
-        u.setdefault("biyografi", None)
-        u.setdefault("acik_temalar", [])
-        u.setdefault("aktif_tema_id", None)
-        u.setdefault("aktif_tema_gorsel", None)
-    return users
+    return await leaderboards["dinar"].top(LEADERBOARD_SIZE)
 
 # ============ FORUM ROUTES ============
 
 @api_router.get("/forum/kategoriler")
 async def get_forum_categories():
-    categories = await db.forum_categories.find({}, {"_id": 0}).to_list(100)
-    return categories
+    return await response_cache.get_or_compute(
+        "forum_kategoriler", "forum/kategoriler", "",
+        lambda: db.forum_categories.find({}, {"_id": 0}).to_list(100)
+    )
 
 @api_router.get("/forum/{kategori}/konular")
-async def get_forum_topics(kategori: str, skip: int = 0, limit: int = 20):
-    topics = await db.forum_topics.aggregate([
-        {"$match": {"kategori": kategori}},
-        {"$sort": {"tarih": -1}},
-        {"$skip": skip},
-        {"$limit": limit},
-        {"$lookup": {
-            "from": "users",
-            "localField": "yazar_id",
-            "foreignField": "id",
-            "as": "yazar"
-        }},
-        {"$unwind": "$yazar"},
-        {"$lookup": {
-            "from": "forum_replies",
-            "localField": "id",
-            "foreignField": "konu_id",
-            "as": "cevaplar"
-        }},
+async def get_forum_topics(
+    kategori: str,
+    response: Response,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 20
+):
+    limit = max(1, min(limit, 100))
+    pipeline = [
+        {"$match": {"kategori": kategori, **keyset_filter(cursor, DESCENDING)}},
+        {"$sort": {"tarih": -1, "id": -1}},
+    ]
+    # skip eski istemciler için korunuyor; imleç verildiğinde kullanılmaz
+    if skip and not cursor:
+        pipeline.append({"$skip": skip})
+    topics = await db.forum_topics.aggregate(pipeline + [
+        {"$limit": limit + 1},
         {"$project": {
             "_id": 0,
             "id": 1,
@@ -379,23 +3180,23 @@ async def get_forum_topics(kategori: str, skip: int = 0, limit: int = 20):
             "icerik": 1,
             "kategori": 1,
             "tarih": 1,
-            "yazar_adi": "$yazar.kullanici_adi",
-            "cevap_sayisi": {"$size": "$cevaplar"}
+            "yazar_adi": 1,
+            "yazar_yetki": 1,
+            "yazar_yetki_gorseli": 1,
+            "cevap_sayisi": {"$ifNull": ["$cevap_sayisi", 0]},
+            "son_cevap_tarihi": {"$ifNull": ["$son_cevap_tarihi", None]}
         }}
-    ]).to_list(limit)
+    ]).to_list(limit + 1)
+    topics, next_cursor = page_results(topics, limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return topics
 
 @api_router.get("/forum/konu/{konu_id}")
-async def get_forum_topic(konu_id: str):
+async def get_forum_topic(konu_id: str, cursor: Optional[str] = None, limit: int = 100):
+    limit = max(1, min(limit, 500))
     topic = await db.forum_topics.aggregate([
         {"$match": {"id": konu_id}},
-        {"$lookup": {
-            "from": "users",
-            "localField": "yazar_id",
-            "foreignField": "id",
-            "as": "yazar"
-        }},
-        {"$unwind": "$yazar"},
         {"$project": {
             "_id": 0,
             "id": 1,
@@ -403,7 +3204,9 @@ async def get_forum_topic(konu_id: str):
             "icerik": 1,
             "kategori": 1,
             "tarih": 1,
-            "yazar_adi": "$yazar.kullanici_adi",
+            "yazar_adi": 1,
+            "yazar_yetki": 1,
+            "yazar_yetki_gorseli": 1,
             "yazar_id": 1
         }}
     ]).to_list(1)
@@ -413,26 +3216,23 @@ async def get_forum_topic(konu_id: str):
     
     # Cevapları getir
     replies = await db.forum_replies.aggregate([
-        {"$match": {"konu_id": konu_id}},
-        {"$sort": {"tarih": 1}},
-        {"$lookup": {
-            "from": "users",
-            "localField": "yazar_id",
-            "foreignField": "id",
-            "as": "yazar"
-        }},
-        {"$unwind": "$yazar"},
+        {"$match": {"konu_id": konu_id, **keyset_filter(cursor, ASCENDING)}},
+        {"$sort": {"tarih": 1, "id": 1}},
+        {"$limit": limit + 1},
         {"$project": {
             "_id": 0,
             "id": 1,
             "icerik": 1,
             "tarih": 1,
-            "yazar_adi": "$yazar.kullanici_adi",
+            "yazar_adi": 1,
+            "yazar_yetki": 1,
+            "yazar_yetki_gorseli": 1,
             "yazar_id": 1
         }}
-    ]).to_list(1000)
+    ]).to_list(limit + 1)
+    replies, next_cursor = page_results(replies, limit)
     
-    return {"konu": topic[0], "cevaplar": replies}
+    return {"konu": topic[0], "cevaplar": replies, "next_cursor": next_cursor}
 
 @api_router.post("/forum/konu")
 async def create_forum_topic(konu: ForumKonu, current_user: dict = Depends(get_current_user)):
@@ -443,16 +3243,26 @@ async def create_forum_topic(konu: ForumKonu, current_user: dict = Depends(get_c
         "icerik": konu.icerik,
         "kategori": konu.kategori,
         "yazar_id": current_user["id"],
-        "tarih": datetime.now(timezone.utc).isoformat()
+        **author_fields("forum_topics", current_user),
+        "tarih": datetime.now(timezone.utc).isoformat(),
+        "cevap_sayisi": 0,
+        "son_cevap_tarihi": None
     }
     await db.forum_topics.insert_one(konu_doc)
+    await index_search_document("konu", konu_doc)
     return {"message": "Konu oluşturuldu", "id": konu_id}
 
 @api_router.post("/forum/konu/{konu_id}/cevap")
 async def create_forum_reply(konu_id: str, cevap: ForumCevap, current_user: dict = Depends(get_current_user)):
-    # Konu kontrolü
-    topic = await db.forum_topics.find_one({"id": konu_id})
-    if not topic:
+    tarih = datetime.now(timezone.utc).isoformat()
+    
+    # Konu kontrolü ve sayaç güncellemesi tek sorguda
+    topic = await db.forum_topics.find_one_and_update(
+        {"id": konu_id},
+        {"$inc": {"cevap_sayisi": 1}, "$max": {"son_cevap_tarihi": tarih}},
+        projection={"_id": 0, "baslik": 1}
+    )
+    if topic is None:
         raise HTTPException(status_code=404, detail="Konu bulunamadı")
     
     cevap_id = str(uuid.uuid4())
@@ -461,169 +3271,319 @@ async def create_forum_reply(konu_id: str, cevap: ForumCevap, current_user: dict
         "konu_id": konu_id,
         "icerik": cevap.icerik,
         "yazar_id": current_user["id"],
-        "tarih": datetime.now(timezone.utc).isoformat()
+        **author_fields("forum_replies", current_user),
+        "tarih": tarih
     }
     await db.forum_replies.insert_one(cevap_doc)
+    await index_search_document("cevap", cevap_doc, topic["baslik"])
+    await publish_live_event(f"forum:{konu_id}", {k: v for k, v in cevap_doc.items() if k != "_id"})
     return {"message": "Cevap eklendi", "id": cevap_id}
 
 @api_router.get("/stats")
 async def get_server_stats():
-    total_users = await db.users.count_documents({})
-    # Active players will be fetched from Minecraft server API in future
     return {
-        "kayitli_oyuncu": total_users,
-        "aktif_oyuncu": 0  # Placeholder for Minecraft server API
+        "kayitli_oyuncu": registered_users.value,
+        "aktif_oyuncu": status_sampler.players,
+        "maksimum_oyuncu": status_sampler.max_players,
+        "sunucu_cevrimici": status_sampler.online
     }
 
+@api_router.get("/stats/oyuncu-gecmisi")
+async def get_player_history():
+    return list(status_sampler.history)
+
 # ============ WALLET/CREDIT ROUTES ============
 
 @api_router.get("/cuzdan/gecmis")
-async def get_wallet_history(current_user: dict = Depends(get_current_user)):
+async def get_wallet_history(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    claims: dict = Depends(get_token_claims)
+):
+    limit = max(1, min(limit, 500))
     transactions = await db.credit_transactions.find(
-        {"kullanici_id": current_user["id"]},
+        {"kullanici_id": claims["id"], **keyset_filter(cursor, DESCENDING)},
         {"_id": 0}
-    ).sort("tarih", -1).to_list(100)
+    ).sort([("tarih", -1), ("id", -1)]).limit(limit + 1).to_list(limit + 1)
+    transactions, next_cursor = page_results(transactions, limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return transactions
 
 @api_router.post("/cuzdan/yukle")
 async def load_wallet(tutar: float, current_user: dict = Depends(get_current_user)):
-    # This will integrate with PayTR/Shopier
-    # For now, just create a pending transaction
+    # İşlem beklemede oluşturulur; kredi sağlayıcının ödeme bildirimi
+    # mutabakat işçisince işlendiğinde eklenir
     transaction_id = str(uuid.uuid4())
+    # PayTR sipariş numarası yalnızca harf ve rakam kabul eder
+    siparis_no = transaction_id.replace("-", "")
     transaction = {
         "id": transaction_id,
+        "siparis_no": siparis_no,
         "kullanici_id": current_user["id"],
+        **author_fields("credit_transactions", current_user),
         "tutar": tutar,
         "tip": "yukleme",
         "durum": "beklemede",
         "tarih": datetime.now(timezone.utc).isoformat()
     }
     await db.credit_transactions.insert_one(transaction)
-    return {"message": "Ödeme başlatıldı", "transaction_id": transaction_id}
+    await response_cache.invalidate("leaderboard")
+    await publish_live_event("kredi-yuklemeler", {
+        "kullanici_adi": current_user["kullanici_adi"],
+        "tutar": tutar,
+        "tarih": transaction["tarih"]
+    })
+    return {"message": "Ödeme başlatıldı", "transaction_id": transaction_id, "siparis_no": siparis_no}
+
+@api_router.post("/odeme/bildirim/{saglayici}")
+async def payment_callback(saglayici: str, request: Request):
+    # Sağlayıcı yalnızca "OK" yanıtını başarılı sayar ve yanıt alamazsa
+    # tekrar dener; burada sadece doğrulama ve tek bir insert yapılır
+    body = (await request.body()).decode("utf-8", errors="replace")
+    fields = dict(parse_qsl(body, keep_blank_values=True))
+    event = parse_payment_callback(saglayici, fields)
+    now = datetime.now(timezone.utc)
+    try:
+        await db.payment_events.insert_one({
+            "id": str(uuid.uuid4()),
+            "saglayici": saglayici,
+            **event,
+            "durum": "beklemede",
+            "deneme": 0,
+            "sonraki_deneme": now,
+            "son_hata": None,
+            "tarih": now.isoformat(),
+            "ham": fields
+        })
+    except DuplicateKeyError:
+        settlement_stats["tekrar"] += 1
+    else:
+        settlement_stats["alinan"] += 1
+        settlement_wakeup.set()
+    return Response(content="OK", media_type="text/plain")
 
 # ============ MARKET ROUTES ============
 
 @api_router.get("/market/kategoriler")
-async def get_market_categories():
-    categories = await db.market_categories.find({}, {"_id": 0}).to_list(100)
-    return categories
+async def get_market_categories(request: Request, response: Response):
+    not_modified = await conditional_get(request, response, "market_categories")
+    if not_modified:
+        return not_modified
+    return await response_cache.get_or_compute(
+        "market_kategoriler", "market/kategoriler", "",
+        lambda: db.market_categories.find({}, {"_id": 0}).to_list(100)
+    )
 
 @api_router.get("/market/en-cok-satanlar")
-async def get_best_sellers():
-    # Get top selling items based on purchase count
-    best_sellers = await db.purchases.aggregate([
-        {"$group": {
-            "_id": "$urun_id",
-            "satis_sayisi": {"$sum": 1},
-            "urun_adi": {"$first": "$urun_adi"}
+async def get_best_sellers(request: Request, response: Response, gun: Optional[int] = Query(None, ge=1, le=365)):
+    today = datetime.now(timezone.utc).date()
+    # Gün penceresi gece yarısı kayar, pencere ETag'e eklenir
+    variant = f"{gun}g.{today.isoformat()}" if gun is not None else None
+    not_modified = await conditional_get(request, response, "market_items", variant=variant)
+    if not_modified:
+        return not_modified
+    
+    if gun is None:
+        pipeline = [
+            {"$match": {"donem": "toplam"}},
+            {"$sort": {"satis_sayisi": -1}},
+            {"$limit": 10}
+        ]
+    else:
+        start = today - timedelta(days=gun - 1)
+        pipeline = [
+            # "toplam" belgeleri tarih aralığının dışında kalır
+            {"$match": {"donem": {"$gte": start.isoformat(), "$lte": today.isoformat()}}},
+            {"$group": {"_id": "$urun_id", "satis_sayisi": {"$sum": "$satis_sayisi"}}},
+            {"$project": {"urun_id": "$_id", "satis_sayisi": 1}},
+            {"$sort": {"satis_sayisi": -1}},
+            {"$limit": 10}
+        ]
+    
+    # Ürün detayları sıralama korunarak eklenir
+    items = await db.product_sales.aggregate(pipeline + [
+        {"$lookup": {
+            "from": "market_items",
+            "localField": "urun_id",
+            "foreignField": "id",
+            "as": "urun"
         }},
-        {"$sort": {"satis_sayisi": -1}},
-        {"$limit": 10}
+        {"$unwind": "$urun"},
+        {"$replaceRoot": {"newRoot": {"$mergeObjects": ["$urun", {"satis_sayisi": "$satis_sayisi"}]}}},
+        {"$project": {"_id": 0}}
     ]).to_list(10)
-    
-    # Get full item details
-    item_ids = [item["_id"] for item in best_sellers]
-    items = await db.market_items.find({"id": {"$in": item_ids}}, {"_id": 0}).to_list(10)
     return items
 
 @api_router.get("/market/{kategori}/urunler")
-async def get_market_items(kategori: Optional[str] = None):
+async def get_market_items(request: Request, response: Response, kategori: Optional[str] = None):
+    not_modified = await conditional_get(request, response, "market_items")
+    if not_modified:
+        return not_modified
+    
     if kategori and kategori != "Tümü":
         query = {"kategori": kategori}
     else:
         query = {}
-    items = await db.market_items.find(query, {"_id": 0}).to_list(1000)
-    return items
+    return await response_cache.get_or_compute(
+        "market_urunler", "market/{kategori}/urunler", query.get("kategori", ""),
+        lambda: db.market_items.find(query, {"_id": 0}).to_list(1000)
+    )
 
 @api_router.get("/market/urun/{urun_id}")
-async def get_market_item(urun_id: str):
+async def get_market_item(urun_id: str, request: Request, response: Response):
+    not_modified = await conditional_get(request, response, "market_items")
+    if not_modified:
+        return not_modified
+    
     item = await db.market_items.find_one({"id": urun_id}, {"_id": 0})
     if not item:
         raise HTTPException(status_code=404, detail="Ürün bulunamadı")
     return item
 
 @api_router.post("/market/satin-al/{urun_id}")
-async def purchase_item(urun_id: str, current_user: dict = Depends(get_current_user)):
-    item = await db.market_items.find_one({"id": urun_id})
-    if not item:
-        raise HTTPException(status_code=404, detail="Ürün bulunamadı")
-    
-    if item["stok"] <= 0:
-        raise HTTPException(status_code=400, detail="Stok tükendi")
-    
-    if current_user["kredi"] < item["fiyat"]:
-        raise HTTPException(status_code=400, detail="Yetersiz kredi")
-    
-    # Kredi düş
-    await db.users.update_one(
-        {"id": current_user["id"]},
-        {"$inc": {"kredi": -item["fiyat"]}}
-    )
-    
-    # Stok düş
-    await db.market_items.update_one(
-        {"id": urun_id},
-        {"$inc": {"stok": -1}}
+async def purchase_item(
+    urun_id: str,
+    idempotency_key: Optional[str] = Header(None),
+    current_user: dict = Depends(get_current_user)
+):
+    return await run_idempotent(
+        current_user["id"],
+        idempotency_key,
+        lambda remember: execute_item_purchase(current_user, urun_id, remember)
     )
-    
-    # Satın alma kaydı
-    purchase_id = str(uuid.uuid4())
-    purchase_doc = {
-        "id": purchase_id,
-        "kullanici_id": current_user["id"],
-        "urun_id": urun_id,
-        "urun_adi": item["isim"],
-        "toplam_fiyat": item["fiyat"],
-        "tarih": datetime.now(timezone.utc).isoformat()
-    }
-    await db.purchases.insert_one(purchase_doc)
-    
-    # TODO: Send command to Minecraft server
-    # minecraft_command = f"give {current_user['kullanici_adi']} {item['isim']}"
-    # send_to_minecraft_server(minecraft_command)
-    
-    return {
-        "message": "Satın alma başarılı",
-        "yeni_kredi": current_user["kredi"] - item["fiyat"],
-        "minecraft_command": f"give {current_user['kullanici_adi']} minecraft:diamond 1"  # Placeholder
-    }
 
 # ============ NEWS ROUTES ============
 
 @api_router.get("/haberler")
-async def get_news(limit: int = 10):
+async def get_news(request: Request, response: Response, cursor: Optional[str] = None, limit: int = 10):
+    not_modified = await conditional_get(request, response, "news")
+    if not_modified:
+        return not_modified
+    
+    limit = max(1, min(limit, 100))
+    news, next_cursor = await response_cache.get_or_compute(
+        "haberler", "haberler", f"{cursor}:{limit}",
+        lambda: _news_page(cursor, limit)
+    )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return news
+
+async def _news_page(cursor: Optional[str], limit: int):
     news = await db.news.aggregate([
-        {"$sort": {"tarih": -1}},
-        {"$limit": limit},
-        {"$lookup": {
-            "from": "users",
-            "localField": "yazar_id",
-            "foreignField": "id",
-            "as": "yazar"
-        }},
-        {"$unwind": "$yazar"},
+        {"$match": keyset_filter(cursor, DESCENDING)},
+        {"$sort": {"tarih": -1, "id": -1}},
+        {"$limit": limit + 1},
         {"$project": {
             "_id": 0,
             "id": 1,
             "baslik": 1,
             "icerik": 1,
             "tarih": 1,
-            "yazar_adi": "$yazar.kullanici_adi"
+            "yazar_adi": 1
         }}
-    ]).to_list(limit)
-    return news
+    ]).to_list(limit + 1)
+    return page_results(news, limit)
 
 @api_router.get("/haber/{haber_id}")
-async def get_news_detail(haber_id: str):
+async def get_news_detail(haber_id: str, request: Request, response: Response):
+    not_modified = await conditional_get(request, response, "news")
+    if not_modified:
+        return not_modified
+    
     news = await db.news.find_one({"id": haber_id}, {"_id": 0})
     if not news:
         raise HTTPException(status_code=404, detail="Haber bulunamadı")
     return news
 
+# ============ SEARCH ROUTES ============
+
+@api_router.get("/ara")
+async def search(
+    response: Response,
+    q: str = Query(..., max_length=200),
+    tur: Optional[List[str]] = Query(None),
+    cursor: Optional[str] = None,
+    limit: int = 20
+):
+    limit = max(1, min(limit, 50))
+    terms = list(dict.fromkeys(search_terms(q)))[:SEARCH_MAX_TERMS]
+    if not terms:
+        raise HTTPException(status_code=400, detail="Arama terimi en az 2 karakter olmalı")
+    match = {"$text": {"$search": " ".join(terms)}}
+    if tur:
+        if any(t not in SEARCH_FIELDS for t in tur):
+            raise HTTPException(status_code=400, detail="Geçersiz arama türü")
+        match["tur"] = {"$in": tur}
+    
+    pipeline = [
+        {"$match": match},
+        {"$addFields": {"skor": {"$meta": "textScore"}}},
+    ]
+    if cursor:
+        skor, key = decode_search_cursor(cursor)
+        pipeline.append({"$match": {"$or": [
+            {"skor": {"$lt": skor}},
+            {"skor": skor, "_id": {"$gt": key}}
+        ]}})
+    rows = await db.search_documents.aggregate(pipeline + [
+        {"$sort": {"skor": -1, "_id": 1}},
+        {"$limit": limit + 1},
+        {"$project": {"arama_baslik": 0, "arama_metin": 0}}
+    ]).to_list(limit + 1)
+    
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = encode_search_cursor(rows[-1])
+    term_set = set(terms)
+    return [{
+        "tur": row["tur"],
+        "id": row["id"],
+        "baslik": row["baslik"],
+        "parcacik": highlight_snippet(row["metin"], term_set),
+        "tarih": row.get("tarih"),
+        "konu_id": row.get("konu_id"),
+        "kategori": row.get("kategori"),
+        "skor": round(row["skor"], 3)
+    } for row in rows]
+
+# ============ LIVE EVENT ROUTES ============
+
+@api_router.get("/canli")
+async def live_events(
+    request: Request,
+    kanal: List[str] = Query(...),
+    last_event_id: Optional[str] = Header(None)
+):
+    channels = set(kanal)
+    if len(channels) > LIVE_MAX_CHANNELS:
+        raise HTTPException(status_code=400, detail="Çok fazla kanal")
+    for channel in channels:
+        if channel not in LIVE_CHANNELS and not (channel.startswith("forum:") and len(channel) > 6):
+            raise HTTPException(status_code=400, detail=f"Geçersiz kanal: {channel}")
+    if live_broker.count >= LIVE_MAX_SUBSCRIBERS:
+        raise HTTPException(
+            status_code=503,
+            detail="Canlı bağlantı sınırına ulaşıldı",
+            headers={"Retry-After": "30"}
+        )
+    try:
+        last_id = int(last_event_id) if last_event_id else 0
+    except ValueError:
+        last_id = 0
+    
+    return StreamingResponse(
+        live_event_stream(request, channels, last_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # ============ ADMIN ROUTES ============
 
 @api_router.get("/admin/kullanicilar")
-async def get_all_users(admin: dict = Depends(get_admin_user)):
+async def get_all_users(admin: dict = Depends(get_admin_claims)):
     users = await db.users.find({}, {"_id": 0, "sifre_hash": 0}).to_list(1000)
     return users
 
@@ -634,7 +3594,7 @@ async def update_user(
     rol: Optional[str] = None,
     yetki: Optional[str] = None,
     yetki_gorseli: Optional[str] = None,
-    admin: dict = Depends(get_admin_user)
+    admin: dict = Depends(get_admin_claims)
 ):
     update_data = {}
     if kredi is not None:
@@ -647,15 +3607,54 @@ async def update_user(
         update_data["yetki_gorseli"] = yetki_gorseli
     
     if update_data:
-        await db.users.update_one({"id": user_id}, {"$set": update_data})
+        # Yetki rozeti forum ve haberlerde kopyalı tutulur
+        author_changed = yetki is not None or yetki_gorseli is not None
+        if author_changed:
+            update_data["yazar_senkron_bekliyor"] = True
+        
+        async def operation(session):
+            before = await db.users.find_one_and_update(
+                {"id": user_id},
+                {"$set": update_data},
+                projection={"_id": 0, "kredi": 1},
+                session=session
+            )
+            # Bakiye üzerine yazılınca fark defterde düzeltme kaydı olur
+            if before is not None and kredi is not None and kredi != before.get("kredi", 0):
+                await db.credit_ledger.insert_many(ledger_entries(
+                    user_id, kredi - before.get("kredi", 0), "sistem:yonetici",
+                    "yonetici_duzeltme", admin["id"], kredi
+                ), session=session)
+        
+        await run_ledger_transaction(operation)
+        user_cache.invalidate(user_id)
+        # Rol token'da taşındığı için eski token'lar iptal edilir
+        if rol is not None:
+            await revoke_user_tokens([user_id])
+        await refresh_user_in_leaderboards(user_id)
+        if author_changed:
+            schedule_author_sync(user_id)
     
     return {"message": "Kullanıcı güncellendi"}
 
 @api_router.delete("/admin/kullanici/{user_id}")
-async def delete_user(user_id: str, admin: dict = Depends(get_admin_user)):
-    await db.users.delete_one({"id": user_id})
+async def delete_user(user_id: str, admin: dict = Depends(get_admin_claims)):
+    result = await db.users.delete_one({"id": user_id})
+    registered_users.add(-result.deleted_count)
+    if result.deleted_count:
+        await revoke_user_tokens([user_id], deleted=True)
+    user_cache.invalidate(user_id)
+    remove_from_leaderboards(user_id)
+    await response_cache.invalidate("leaderboard")
     return {"message": "Kullanıcı silindi"}
 
+@api_router.post("/admin/kullanici/{user_id}/oturumlari-kapat")
+async def revoke_user_sessions(user_id: str, admin: dict = Depends(get_admin_claims)):
+    versions = await revoke_user_tokens([user_id])
+    if user_id not in versions:
+        raise HTTPException(status_code=404, detail="Kullanıcı bulunamadı")
+    return {"message": "Kullanıcının tüm oturumları kapatıldı"}
+
 @api_router.post("/admin/haber")
 async def create_news(haber: Haber, admin: dict = Depends(get_admin_user)):
     haber_id = str(uuid.uuid4())
@@ -664,26 +3663,40 @@ async def create_news(haber: Haber, admin: dict = Depends(get_admin_user)):
         "baslik": haber.baslik,
         "icerik": haber.icerik,
         "yazar_id": admin["id"],
+        **author_fields("news", admin),
         "tarih": datetime.now(timezone.utc).isoformat()
     }
     await db.news.insert_one(haber_doc)
+    await index_search_document("haber", haber_doc)
+    await response_cache.invalidate("haberler")
+    await collection_versions.bump("news")
+    await publish_live_event("haberler", {k: v for k, v in haber_doc.items() if k != "_id"})
     return {"message": "Haber oluşturuldu", "id": haber_id}
 
 @api_router.put("/admin/haber/{haber_id}")
-async def update_news(haber_id: str, haber: Haber, admin: dict = Depends(get_admin_user)):
-    await db.news.update_one(
+async def update_news(haber_id: str, haber: Haber, admin: dict = Depends(get_admin_claims)):
+    updated = await db.news.find_one_and_update(
         {"id": haber_id},
-        {"$set": {"baslik": haber.baslik, "icerik": haber.icerik}}
+        {"$set": {"baslik": haber.baslik, "icerik": haber.icerik}},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
     )
+    if updated:
+        await index_search_document("haber", updated)
+    await response_cache.invalidate("haberler")
+    await collection_versions.bump("news")
     return {"message": "Haber güncellendi"}
 
 @api_router.delete("/admin/haber/{haber_id}")
-async def delete_news(haber_id: str, admin: dict = Depends(get_admin_user)):
+async def delete_news(haber_id: str, admin: dict = Depends(get_admin_claims)):
     await db.news.delete_one({"id": haber_id})
+    await remove_search_document("haber", haber_id)
+    await response_cache.invalidate("haberler")
+    await collection_versions.bump("news")
     return {"message": "Haber silindi"}
 
 @api_router.post("/admin/market/urun")
-async def create_market_item(urun: MarketUrun, admin: dict = Depends(get_admin_user)):
+async def create_market_item(urun: MarketUrun, admin: dict = Depends(get_admin_claims)):
     urun_id = str(uuid.uuid4())
     urun_doc = {
         "id": urun_id,
@@ -694,36 +3707,431 @@ async def create_market_item(urun: MarketUrun, admin: dict = Depends(get_admin_u
         "stok": urun.stok,
         "gorsel": urun.gorsel,
         "indirim": urun.indirim if urun.indirim else 0,
+        "komut": urun.komut,
         "olusturulma_tarihi": datetime.now(timezone.utc).isoformat()
     }
     await db.market_items.insert_one(urun_doc)
+    await index_search_document("urun", urun_doc)
+    await response_cache.invalidate("market_urunler")
+    await collection_versions.bump("market_items")
     return {"message": "Ürün oluşturuldu", "id": urun_id}
 
 @api_router.put("/admin/market/urun/{urun_id}")
-async def update_market_item(urun_id: str, urun: MarketUrun, admin: dict = Depends(get_admin_user)):
+async def update_market_item(urun_id: str, urun: MarketUrun, admin: dict = Depends(get_admin_claims)):
     update_data = urun.model_dump()
-    await db.market_items.update_one(
+    if update_data["komut"] is None:
+        # Komut gönderilmediyse mevcut komut korunur
+        del update_data["komut"]
+    updated = await db.market_items.find_one_and_update(
         {"id": urun_id},
-        {"$set": update_data}
+        {"$set": update_data},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
     )
+    if updated:
+        await index_search_document("urun", updated)
+    await response_cache.invalidate("market_urunler")
+    await collection_versions.bump("market_items")
     return {"message": "Ürün güncellendi"}
 
 @api_router.delete("/admin/market/urun/{urun_id}")
-async def delete_market_item(urun_id: str, admin: dict = Depends(get_admin_user)):
+async def delete_market_item(urun_id: str, admin: dict = Depends(get_admin_claims)):
     await db.market_items.delete_one({"id": urun_id})
+    await remove_search_document("urun", urun_id)
+    await response_cache.invalidate("market_urunler")
+    await collection_versions.bump("market_items")
     return {"message": "Ürün silindi"}
 
 @api_router.delete("/admin/forum/konu/{konu_id}")
-async def delete_forum_topic(konu_id: str, admin: dict = Depends(get_admin_user)):
+async def delete_forum_topic(konu_id: str, admin: dict = Depends(get_admin_claims)):
     await db.forum_topics.delete_one({"id": konu_id})
     await db.forum_replies.delete_many({"konu_id": konu_id})
+    await remove_search_document("konu", konu_id)
+    await db.search_documents.delete_many({"tur": "cevap", "konu_id": konu_id})
     return {"message": "Konu ve cevapları silindi"}
 
 @api_router.delete("/admin/forum/cevap/{cevap_id}")
-async def delete_forum_reply(cevap_id: str, admin: dict = Depends(get_admin_user)):
-    await db.forum_replies.delete_one({"id": cevap_id})
+async def delete_forum_reply(cevap_id: str, admin: dict = Depends(get_admin_claims)):
+    reply = await db.forum_replies.find_one_and_delete({"id": cevap_id}, projection={"_id": 0, "konu_id": 1})
+    if reply:
+        await refresh_topic_counters(reply["konu_id"])
+        await remove_search_document("cevap", cevap_id)
     return {"message": "Cevap silindi"}
 
+@api_router.post("/admin/forum/sayaclari-esitle")
+async def reconcile_forum_counters_route(admin: dict = Depends(get_admin_claims)):
+    updated = await reconcile_forum_counters()
+    return {"message": "Forum sayaçları eşitlendi", "guncellenen": updated}
+
+@api_router.post("/admin/arama/yeniden-olustur")
+async def rebuild_search_index_route(admin: dict = Depends(get_admin_claims)):
+    indexed = await rebuild_search_index()
+    return {"message": "Arama indeksi yeniden oluşturuldu", "belge": indexed}
+
+@api_router.get("/admin/sistem")
+async def get_system_stats(admin: dict = Depends(get_admin_claims)):
+    return {
+        "kullanici_onbellegi": user_cache.stats(),
+        "hash_havuzu": hash_executor.stats(),
+        "yanit_onbellegi": response_cache.stats(),
+        "minecraft_teslimat": {**delivery_stats, "rcon_baglanti": rcon_pool.connects},
+        "sunucu_durumu": {
+            "devre": status_sampler.breaker.state,
+            "ardisik_hata": status_sampler.breaker.failures
+        },
+        "canli_yayin": live_broker.stats(),
+        "kredi_defteri": {"transaction": ledger_state["transactions"]},
+        "kullanici_tekilligi": {"indeksli_alanlar": sorted(registration_state["indeksli_alanlar"])},
+        "odeme_mutabakati": settlement_stats,
+        "token_iptalleri": token_revocations.stats(),
+        "oturumlar": session_stats,
+        "istek_sinirlama": rate_limiter.stats()
+    }
+
+@api_router.get("/admin/defter/{user_id}")
+async def get_ledger_balance(user_id: str, tarih: Optional[str] = None, admin: dict = Depends(get_admin_claims)):
+    if tarih is not None:
+        tarih = _parse_export_date(tarih, "tarih")
+    balance = await ledger_balance(user_id, tarih)
+    if tarih is None:
+        user = await db.users.find_one({"id": user_id}, {"_id": 0, "kredi": 1})
+        if user is None:
+            raise HTTPException(status_code=404, detail="Kullanıcı bulunamadı")
+        balance["kredi"] = user.get("kredi", 0)
+        balance["tutarli"] = round(balance["kredi"], 2) == balance["bakiye"]
+    return balance
+
+@api_router.get("/admin/defter/{user_id}/hareketler")
+async def get_ledger_entries(
+    user_id: str,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    admin: dict = Depends(get_admin_claims)
+):
+    limit = max(1, min(limit, 500))
+    entries = await db.credit_ledger.find(
+        {"kullanici_id": user_id, **keyset_filter(cursor, DESCENDING)},
+        {"_id": 0}
+    ).sort([("tarih", -1), ("id", -1)]).limit(limit + 1).to_list(limit + 1)
+    entries, next_cursor = page_results(entries, limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return entries
+
+@api_router.get("/admin/teslimatlar")
+async def get_deliveries(durum: str = "basarisiz", limit: int = 100, admin: dict = Depends(get_admin_claims)):
+    deliveries = await db.minecraft_commands.find(
+        {"durum": durum},
+        {"_id": 0, "kilit": 0}
+    ).sort("sonraki_deneme", -1).limit(min(limit, 500)).to_list(500)
+    return deliveries
+
+@api_router.post("/admin/teslimatlar/{teslimat_id}/yeniden")
+async def retry_delivery(teslimat_id: str, admin: dict = Depends(get_admin_claims)):
+    result = await db.minecraft_commands.update_one(
+        {"id": teslimat_id, "durum": "basarisiz"},
+        {"$set": {"durum": "beklemede", "deneme": 0, "sonraki_deneme": datetime.now(timezone.utc)}}
+    )
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Başarısız teslimat bulunamadı")
+    return {"message": "Teslimat yeniden kuyruğa alındı"}
+
+@api_router.get("/admin/odemeler")
+async def get_payment_events(durum: str = "basarisiz", limit: int = 100, admin: dict = Depends(get_admin_claims)):
+    events = await db.payment_events.find(
+        {"durum": durum},
+        {"_id": 0, "kilit": 0}
+    ).sort("sonraki_deneme", -1).limit(min(limit, 500)).to_list(500)
+    return events
+
+@api_router.post("/admin/odemeler/{olay_id}/yeniden")
+async def retry_payment_event(olay_id: str, admin: dict = Depends(get_admin_claims)):
+    result = await db.payment_events.update_one(
+        {"id": olay_id, "durum": "basarisiz"},
+        {"$set": {"durum": "beklemede", "deneme": 0, "sonraki_deneme": datetime.now(timezone.utc)}}
+    )
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Başarısız ödeme bildirimi bulunamadı")
+    settlement_wakeup.set()
+    return {"message": "Ödeme bildirimi yeniden kuyruğa alındı"}
+
+@api_router.get("/admin/indeks-raporu")
+async def get_index_report(admin: dict = Depends(get_admin_claims)):
+    return await explain_route_queries()
+
+# ============ BULK ADMIN ROUTES ============
+
+@api_router.post("/admin/toplu/kullanici-guncelle")
+async def bulk_update_users(body: TopluKullaniciGuncelle, akis: bool = False, admin: dict = Depends(get_admin_claims)):
+    if body.kredi is not None and body.kredi_ekle is not None:
+        raise HTTPException(status_code=400, detail="kredi ve kredi_ekle birlikte kullanılamaz")
+    set_fields = {
+        field: getattr(body, field)
+        for field in ("kredi", "rol", "yetki", "yetki_gorseli")
+        if getattr(body, field) is not None
+    }
+    if not set_fields and body.kredi_ekle is None:
+        raise HTTPException(status_code=400, detail="Güncellenecek alan yok")
+    ids, query = bulk_targets(body, USER_FILTER_FIELDS)
+    
+    author_changed = "yetki" in set_fields or "yetki_gorseli" in set_fields
+    update = {}
+    if set_fields:
+        update["$set"] = {**set_fields, **({"yazar_senkron_bekliyor": True} if author_changed else {})}
+    if body.kredi_ekle is not None:
+        update["$inc"] = {"kredi": body.kredi_ekle}
+    
+    credit_changed = body.kredi is not None or body.kredi_ekle is not None
+    
+    async def read_before(batch, session=None) -> dict:
+        projection = {"_id": 0, "id": 1, "kredi": 1, **{field: 1 for field in set_fields}}
+        return {
+            user["id"]: user
+            async for user in db.users.find({"id": {"$in": batch}}, projection, session=session)
+        }
+    
+    def credit_entries(before: dict, tarih: str) -> List[dict]:
+        entries = []
+        for user_id, user in before.items():
+            old = user.get("kredi", 0)
+            new = body.kredi if body.kredi is not None else old + body.kredi_ekle
+            if new != old:
+                entries.extend(ledger_entries(user_id, new - old, "sistem:yonetici", "toplu_duzeltme", admin["id"], new, tarih))
+        return entries
+    
+    def changed(user: dict) -> bool:
+        new = body.kredi if body.kredi is not None else user.get("kredi", 0) + body.kredi_ekle
+        return new != user.get("kredi", 0) or any(user.get(field) != value for field, value in set_fields.items())
+    
+    async def write_guarded(batch, tarih):
+        # Transaction yok: mutlak kredi ataması okunan bakiyeye koşullu yazılır,
+        # araya giren satın almayla eşleşmeyenler yeniden okunup denenir.
+        # Hangi belgelerin yazıldığı geçici toplu_islem işaretinden anlaşılır.
+        modified = 0
+        entries = []
+        pending = batch
+        for _ in range(BULK_CREDIT_RETRIES):
+            before = await read_before(pending)
+            token = str(uuid.uuid4())
+            await db.users.bulk_write([
+                UpdateOne({"id": user_id, "kredi": user.get("kredi", 0)}, {"$set": {**update["$set"], "toplu_islem": token}})
+                for user_id, user in before.items()
+            ], ordered=False)
+            applied = set(await db.users.distinct("id", {"id": {"$in": list(before)}, "toplu_islem": token}))
+            await db.users.update_many({"toplu_islem": token}, {"$unset": {"toplu_islem": ""}})
+            done = {user_id: user for user_id, user in before.items() if user_id in applied}
+            entries.extend(credit_entries(done, tarih))
+            modified += sum(1 for user in done.values() if changed(user))
+            pending = [user_id for user_id in before if user_id not in applied]
+            if not pending:
+                break
+        return modified, entries, {user_id: "Kredi eşzamanlı değişti, tekrar deneyin" for user_id in pending}
+    
+    async def write_batch(session, batch):
+        tarih = datetime.now(timezone.utc).isoformat()
+        errors = {}
+        if not credit_changed:
+            result = await db.users.update_many({"id": {"$in": batch}}, update, session=session)
+            return result.modified_count, errors
+        if session is not None:
+            # Okuma ve update_many aynı transaction'da; araya giren yazma çakışır
+            before = await read_before(batch, session)
+            result = await db.users.update_many({"id": {"$in": batch}}, update, session=session)
+            modified, entries = result.modified_count, credit_entries(before, tarih)
+        elif body.kredi is None:
+            # kredi_ekle'de fark bilinir; bakiye_sonrasi ayrı okunmadan boş bırakılır
+            result = await db.users.update_many({"id": {"$in": batch}}, update)
+            modified = result.modified_count
+            entries = [] if body.kredi_ekle == 0 else [
+                entry for user_id in batch
+                for entry in ledger_entries(user_id, body.kredi_ekle, "sistem:yonetici", "toplu_duzeltme", admin["id"], None, tarih)
+            ]
+        else:
+            modified, entries, errors = await write_guarded(batch, tarih)
+        if entries:
+            await db.credit_ledger.insert_many(entries, session=session)
+        return modified, errors
+    
+    async def apply(batch):
+        modified, errors = await run_ledger_transaction(lambda session: write_batch(session, batch))
+        batch = [user_id for user_id in batch if user_id not in errors]
+        for user_id in batch:
+            user_cache.invalidate(user_id)
+        if "rol" in set_fields:
+            await revoke_user_tokens(batch)
+        if author_changed:
+            # Aynı yetki tüm gruba yazıldığı için kopyalar doğrudan güncellenir
+            for collection, (key, fields) in AUTHOR_FIELDS.items():
+                values = {field: set_fields[source] for field, source in fields.items() if source in set_fields}
+                if values:
+                    await db[collection].update_many({key: {"$in": batch}}, {"$set": values})
+            await db.users.update_many({"id": {"$in": batch}}, {"$unset": {"yazar_senkron_bekliyor": ""}})
+        return modified, errors
+    
+    async def finish():
+        for board in leaderboards.values():
+            await board.reload()
+        await response_cache.invalidate("leaderboard", "haberler")
+        if author_changed:
+            await collection_versions.bump("news")
+    
+    return await bulk_response(run_bulk_job("users", ids, query, apply, finish), akis)
+
+@api_router.post("/admin/toplu/kullanici-sil")
+async def bulk_delete_users(body: TopluKullaniciSil, akis: bool = False, admin: dict = Depends(get_admin_claims)):
+    ids, query = bulk_targets(body, USER_FILTER_FIELDS)
+    
+    async def apply(batch):
+        # İşlemi yapan yönetici kendini silemez
+        errors = {admin["id"]: "Kendi hesabınızı silemezsiniz"} if admin["id"] in batch else {}
+        batch = [user_id for user_id in batch if user_id != admin["id"]]
+        result = await db.users.delete_many({"id": {"$in": batch}})
+        registered_users.add(-result.deleted_count)
+        await revoke_user_tokens(batch, deleted=True)
+        for user_id in batch:
+            user_cache.invalidate(user_id)
+            remove_from_leaderboards(user_id)
+        return result.deleted_count, errors
+    
+    async def finish():
+        await response_cache.invalidate("leaderboard")
+    
+    return await bulk_response(run_bulk_job("users", ids, query, apply, finish), akis)
+
+@api_router.post("/admin/toplu/kullanici-ice-aktar")
+async def bulk_import_users(body: TopluKullaniciIceAktar, akis: bool = False, admin: dict = Depends(get_admin_claims)):
+    """Import players from the old forum; sifre_hash must be a bcrypt hash."""
+    if len(body.kullanicilar) > BULK_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"En fazla {BULK_MAX_IDS} kullanıcı gönderilebilir")
+    if set(USER_DUPLICATE_MESSAGES) - registration_state["indeksli_alanlar"]:
+        raise HTTPException(status_code=503, detail="Kullanıcı tekillik indeksleri eksik, içe aktarma yapılamaz")
+    return await bulk_response(import_users(body.kullanicilar), akis)
+
+@api_router.post("/admin/toplu/urun-guncelle")
+async def bulk_update_market_items(body: TopluUrunGuncelle, akis: bool = False, admin: dict = Depends(get_admin_claims)):
+    if body.fiyat is not None and body.fiyat_carpani is not None:
+        raise HTTPException(status_code=400, detail="fiyat ve fiyat_carpani birlikte kullanılamaz")
+    
+    if body.fiyatlar is not None:
+        # Ürün başına farklı fiyat: her ürün için ayrı işlem, tek bulk_write
+        if len(body.fiyatlar) > BULK_MAX_IDS:
+            raise HTTPException(status_code=400, detail=f"En fazla {BULK_MAX_IDS} id gönderilebilir")
+        ids, query = list(body.fiyatlar), None
+        
+        async def apply(batch):
+            return await bulk_write_per_item("market_items", {
+                urun_id: UpdateOne({"id": urun_id}, {"$set": {"fiyat": body.fiyatlar[urun_id]}})
+                for urun_id in batch
+            })
+    else:
+        set_fields = {
+            field: getattr(body, field)
+            for field in ("fiyat", "indirim", "stok", "kategori")
+            if getattr(body, field) is not None
+        }
+        update = {"$set": set_fields} if set_fields else {}
+        if body.fiyat_carpani is not None:
+            update["$mul"] = {"fiyat": body.fiyat_carpani}
+        if not update:
+            raise HTTPException(status_code=400, detail="Güncellenecek alan yok")
+        ids, query = bulk_targets(body, ITEM_FILTER_FIELDS)
+        
+        async def apply(batch):
+            result = await db.market_items.update_many({"id": {"$in": batch}}, update)
+            return result.modified_count, {}
+    
+    async def finish():
+        await response_cache.invalidate("market_urunler")
+        await collection_versions.bump("market_items")
+    
+    return await bulk_response(run_bulk_job("market_items", ids, query, apply, finish), akis)
+
+@api_router.post("/admin/toplu/urun-sil")
+async def bulk_delete_market_items(body: TopluUrunSil, akis: bool = False, admin: dict = Depends(get_admin_claims)):
+    ids, query = bulk_targets(body, ITEM_FILTER_FIELDS)
+    
+    async def apply(batch):
+        result = await db.market_items.delete_many({"id": {"$in": batch}})
+        await db.search_documents.delete_many({"_id": {"$in": [f"urun:{urun_id}" for urun_id in batch]}})
+        return result.deleted_count, {}
+    
+    async def finish():
+        await response_cache.invalidate("market_urunler")
+        await collection_versions.bump("market_items")
+    
+    return await bulk_response(run_bulk_job("market_items", ids, query, apply, finish), akis)
+
+@api_router.post("/admin/toplu/cevap-sil")
+async def bulk_delete_forum_replies(body: TopluCevapSil, akis: bool = False, admin: dict = Depends(get_admin_claims)):
+    ids, query = bulk_targets(body, {})
+    
+    async def apply(batch):
+        konu_ids = await db.forum_replies.distinct("konu_id", {"id": {"$in": batch}})
+        result = await db.forum_replies.delete_many({"id": {"$in": batch}})
+        await db.search_documents.delete_many({"_id": {"$in": [f"cevap:{cevap_id}" for cevap_id in batch]}})
+        if konu_ids:
+            await _reconcile_topic_batch(konu_ids)
+        return result.deleted_count, {}
+    
+    return await bulk_response(run_bulk_job("forum_replies", ids, query, apply), akis)
+
+@api_router.post("/admin/toplu/rapor-sil")
+async def bulk_delete_reports(body: TopluRaporSil, akis: bool = False, admin: dict = Depends(get_admin_claims)):
+    ids, query = bulk_targets(body, REPORT_FILTER_FIELDS)
+    
+    async def apply(batch):
+        result = await db.reports.delete_many({"id": {"$in": batch}})
+        return result.deleted_count, {}
+    
+    return await bulk_response(run_bulk_job("reports", ids, query, apply), akis)
+
+# ============ EXPORT ROUTES ============
+
+@api_router.get("/admin/disa-aktar/{kaynak}")
+async def export_collection(
+    kaynak: str,
+    bicim: str = "ndjson",
+    alanlar: Optional[str] = None,
+    baslangic: Optional[str] = None,
+    bitis: Optional[str] = None,
+    kullanici_id: Optional[str] = None,
+    admin: dict = Depends(get_admin_claims)
+):
+    if kaynak not in EXPORT_SOURCES:
+        raise HTTPException(status_code=404, detail="Dışa aktarma kaynağı bulunamadı")
+    if bicim not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="Biçim ndjson veya csv olmalı")
+    collection, date_field, allowed = EXPORT_SOURCES[kaynak]
+    
+    fields = allowed
+    if alanlar:
+        fields = [field.strip() for field in alanlar.split(",") if field.strip()]
+        unknown = [field for field in fields if field not in allowed]
+        if unknown or not fields:
+            raise HTTPException(status_code=400, detail=f"Geçersiz alanlar: {', '.join(unknown)}")
+    
+    query = {}
+    date_range = {}
+    start = _parse_export_date(baslangic, "baslangic")
+    end = _parse_export_date(bitis, "bitis")
+    if start:
+        date_range["$gte"] = start
+    if end:
+        date_range["$lt"] = end
+    if date_range:
+        query[date_field] = date_range
+    if kullanici_id and "kullanici_id" in allowed:
+        query["kullanici_id"] = kullanici_id
+    
+    media_type = "text/csv; charset=utf-8" if bicim == "csv" else "application/x-ndjson"
+    filename = f"{kaynak}-{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')}.{bicim}"
+    return StreamingResponse(
+        export_rows(collection, query, fields, date_field, bicim),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
 # ============ REPORT ROUTES ============
 
 @api_router.post("/reports")
@@ -742,24 +4150,29 @@ async def create_report(report: ReportCreate, current_user: dict = Depends(get_c
     return {"message": "Rapor gönderildi", "id": report_id}
 
 @api_router.get("/admin/reports")
-async def get_all_reports(admin: dict = Depends(get_admin_user)):
+async def get_all_reports(admin: dict = Depends(get_admin_claims)):
     reports = await db.reports.find({}, {"_id": 0}).sort("tarih", -1).to_list(1000)
     return reports
 
 @api_router.delete("/admin/reports/{report_id}")
-async def delete_report(report_id: str, admin: dict = Depends(get_admin_user)):
+async def delete_report(report_id: str, admin: dict = Depends(get_admin_claims)):
     await db.reports.delete_one({"id": report_id})
     return {"message": "Rapor silindi"}
 
 # ============ THEME ROUTES ============
 
 @api_router.get("/themes")
-async def get_all_themes():
-    themes = await db.themes.find({}, {"_id": 0}).to_list(1000)
-    return themes
+async def get_all_themes(request: Request, response: Response):
+    not_modified = await conditional_get(request, response, "themes")
+    if not_modified:
+        return not_modified
+    return await response_cache.get_or_compute(
+        "themes", "themes", "",
+        lambda: db.themes.find({}, {"_id": 0}).to_list(1000)
+    )
 
 @api_router.post("/admin/themes")
-async def create_theme(theme: ThemeCreate, admin: dict = Depends(get_admin_user)):
+async def create_theme(theme: ThemeCreate, admin: dict = Depends(get_admin_claims)):
     theme_id = str(uuid.uuid4())
     theme_doc = {
         "id": theme_id,
@@ -769,40 +4182,38 @@ async def create_theme(theme: ThemeCreate, admin: dict = Depends(get_admin_user)
         "olusturulma_tarihi": datetime.now(timezone.utc).isoformat()
     }
     await db.themes.insert_one(theme_doc)
+    await response_cache.invalidate("themes")
+    await collection_versions.bump("themes")
     return {"message": "Tema oluşturuldu", "id": theme_id}
 
 @api_router.delete("/admin/themes/{theme_id}")
-async def delete_theme(theme_id: str, admin: dict = Depends(get_admin_user)):
+async def delete_theme(theme_id: str, admin: dict = Depends(get_admin_claims)):
     await db.themes.delete_one({"id": theme_id})
+    await response_cache.invalidate("themes")
+    await collection_versions.bump("themes")
     return {"message": "Tema silindi"}
 
 @api_router.put("/admin/themes/{theme_id}")
-async def update_theme(theme_id: str, theme: ThemeCreate, admin: dict = Depends(get_admin_user)):
+async def update_theme(theme_id: str, theme: ThemeCreate, admin: dict = Depends(get_admin_claims)):
     await db.themes.update_one(
         {"id": theme_id},
         {"$set": {"isim": theme.isim, "gorsel_url": theme.gorsel_url, "fiyat": theme.fiyat}}
     )
+    await response_cache.invalidate("themes")
+    await collection_versions.bump("themes")
     return {"message": "Tema güncellendi"}
 
 @api_router.post("/themes/{theme_id}/satin-al")
-async def purchase_theme(theme_id: str, current_user: dict = Depends(get_current_user)):
-    theme = await db.themes.find_one({"id": theme_id}, {"_id": 0})
-    if not theme:
-        raise HTTPException(status_code=404, detail="Tema bulunamadı")
-    
-    user_themes = current_user.get("acik_temalar", [])
-    if theme_id in user_themes:
-        raise HTTPException(status_code=400, detail="Bu tema zaten açık")
-    
-    if theme["fiyat"] > 0 and current_user["kredi"] < theme["fiyat"]:
-        raise HTTPException(status_code=400, detail="Yetersiz kredi")
-    
-    update = {"$push": {"acik_temalar": theme_id}}
-    if theme["fiyat"] > 0:
-        update["$inc"] = {"kredi": -theme["fiyat"]}
-    
-    await db.users.update_one({"id": current_user["id"]}, update)
-    return {"message": "Tema açıldı", "yeni_kredi": current_user["kredi"] - theme["fiyat"]}
+async def purchase_theme(
+    theme_id: str,
+    idempotency_key: Optional[str] = Header(None),
+    current_user: dict = Depends(get_current_user)
+):
+    return await run_idempotent(
+        current_user["id"],
+        idempotency_key,
+        lambda remember: execute_theme_purchase(current_user, theme_id, remember)
+    )
 
 @api_router.put("/themes/aktif/{theme_id}")
 async def set_active_theme(theme_id: str, current_user: dict = Depends(get_current_user)):
@@ -818,6 +4229,7 @@ async def set_active_theme(theme_id: str, current_user: dict = Depends(get_curre
         {"id": current_user["id"]},
         {"$set": {"aktif_tema_id": theme_id, "aktif_tema_gorsel": theme["gorsel_url"]}}
     )
+    user_cache.invalidate(current_user["id"])
     return {"message": "Tema aktifleştirildi"}
 
 @api_router.put("/themes/kaldir")
@@ -826,14 +4238,20 @@ async def remove_active_theme(current_user: dict = Depends(get_current_user)):
         {"id": current_user["id"]},
         {"$set": {"aktif_tema_id": None, "aktif_tema_gorsel": None}}
     )
+    user_cache.invalidate(current_user["id"])
     return {"message": "Tema kaldırıldı"}
 
 # ============ ALL MARKET ITEMS ROUTE ============
 
 @api_router.get("/market/urunler")
-async def get_all_market_items():
-    items = await db.market_items.find({}, {"_id": 0}).to_list(1000)
-    return items
+async def get_all_market_items(request: Request, response: Response):
+    not_modified = await conditional_get(request, response, "market_items")
+    if not_modified:
+        return not_modified
+    return await response_cache.get_or_compute(
+        "market_urunler", "market/urunler", "",
+        lambda: db.market_items.find({}, {"_id": 0}).to_list(1000)
+    )
 
 # Include router
 app.include_router(api_router)
@@ -842,14 +4260,30 @@ app.include_router(api_router)
 async def root():
     return {"message": "Rexagon Minecraft Server API", "status": "online"}
 
+app.add_middleware(RateLimitMiddleware)
+app.add_middleware(MetricsMiddleware)
+
+@app.get("/metrics")
+async def get_metrics(authorization: Optional[str] = Header(None)):
+    if METRICS_TOKEN and not hmac.compare_digest(authorization or "", f"Bearer {METRICS_TOKEN}"):
+        raise HTTPException(status_code=401, detail="Geçersiz metrik anahtarı")
+    return Response(
+        content=metrics.render() + rate_limiter.render_metrics(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Retry-After"],
 )
 
+# Startup'ta başlatılan arka plan görevleri, shutdown'da iptal edilir
+background_tasks = []
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -859,6 +4293,25 @@ logger = logging.getLogger(__name__)
 
 @app.on_event("startup")
 async def startup_event():
+    await ensure_indexes()
+    await token_revocations.sync()
+    if await detect_transactions():
+        logger.info("Kredi defteri transaction ile yazılıyor")
+    if not await db.product_sales.find_one({}) and await db.purchases.find_one({}):
+        rebuilt = await rebuild_product_sales()
+        logger.info(f"{rebuilt} ürün için satış özetleri oluşturuldu")
+    backfilled = await reconcile_forum_counters(only_missing=True)
+    if backfilled:
+        logger.info(f"{backfilled} forum konusu için cevap sayaçları oluşturuldu")
+    filled = await backfill_author_fields()
+    if filled:
+        logger.info(f"{filled} belgeye yazar bilgisi eklendi")
+    await resume_author_syncs()
+    if not await db.search_documents.find_one({}):
+        indexed = await rebuild_search_index()
+        if indexed:
+            logger.info(f"Arama indeksi {indexed} belgeyle oluşturuldu")
+    
     # Forum kategorilerini oluştur
     categories = ["Destek", "Şikayet", "Yardım", "Reklam", "Öneri", "Duyurular", "Genel"]
     for cat in categories:
@@ -881,7 +4334,7 @@ async def startup_event():
             "id": admin_id,
             "kullanici_adi": "admin",
             "email": "admin@rexagon.com",
-            "sifre_hash": get_password_hash("admin123"),
+            "sifre_hash": await get_password_hash_async("admin123"),
             "kredi": 99999.0,
             "profil_arka_plani": None,
             "rol": "admin",
@@ -891,9 +4344,11 @@ async def startup_event():
             "kayit_tarihi": datetime.now(timezone.utc).isoformat(),
             "acik_temalar": [],
             "aktif_tema_id": None,
-            "aktif_tema_gorsel": None
+            "aktif_tema_gorsel": None,
+            "token_surumu": 0
         }
         await db.users.insert_one(admin_doc)
+        await db.credit_ledger.insert_many(ledger_entries(admin_id, admin_doc["kredi"], "sistem:acilis", "acilis", None, admin_doc["kredi"]))
         logger.info("Admin kullanıcı oluşturuldu: admin / admin123")
     
     # Paketler kategorisine örnek ürünler ekle
@@ -907,7 +4362,29 @@ async def startup_event():
         ]
         await db.market_items.insert_many(sample_items)
         logger.info("Paketler kategorisine örnek ürünler eklendi")
+    
+    opened = await open_ledger_balances()
+    if opened:
+        logger.info(f"{opened} kullanıcı için açılış bakiyesi kaydedildi")
+    
+    background_tasks.append(asyncio.create_task(leaderboard_refresher()))
+    background_tasks.append(asyncio.create_task(ledger_snapshotter()))
+    background_tasks.append(asyncio.create_task(token_revocation_syncer()))
+    await registered_users.resync()
+    background_tasks.append(asyncio.create_task(status_poller()))
+    if LIVE_CHANGE_STREAMS:
+        background_tasks.append(asyncio.create_task(live_event_watcher()))
+    if RCON_HOST:
+        for _ in range(RCON_POOL_SIZE):
+            background_tasks.append(asyncio.create_task(delivery_worker()))
+    if PAYTR_MERCHANT_KEY or SHOPIER_API_SECRET:
+        for _ in range(SETTLEMENT_WORKERS):
+            background_tasks.append(asyncio.create_task(settlement_worker()))
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    for task in background_tasks:
+        task.cancel()
+    hash_executor.shutdown()
+    rcon_pool.close()
     client.close()
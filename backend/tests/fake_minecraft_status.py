@@ -0,0 +1,89 @@
+"""
+Local stub Minecraft server for the Server List Ping (status) protocol
+
+Answers the handshake + status request with a configurable player count.
+
+    python tests/fake_minecraft_status.py --port 25565 --online 42
+"""
+import argparse
+import asyncio
+import json
+
+
+def pack_varint(value):
+    value &= 0xFFFFFFFF
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+async def read_varint(reader):
+    value = 0
+    for shift in range(0, 35, 7):
+        byte = (await reader.readexactly(1))[0]
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value
+    raise ValueError("VarInt too long")
+
+
+class FakeStatusServer:
+    def __init__(self, online=0, max_players=100, silent=False):
+        self.online = online
+        self.max_players = max_players
+        self.silent = silent
+        self.pings = 0
+        self._server = None
+
+    async def start(self, host="127.0.0.1", port=0):
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        self.pings += 1
+        try:
+            # Handshake ve status request paketlerini oku
+            for _ in range(2):
+                length = await read_varint(reader)
+                await reader.readexactly(length)
+            if self.silent:
+                # Zaman aşımını test etmek için hiç yanıt verme
+                await asyncio.sleep(3600)
+            body = json.dumps({
+                "version": {"name": "1.20.4", "protocol": 765},
+                "players": {"online": self.online, "max": self.max_players},
+                "description": {"text": "Rexagon"}
+            }).encode("utf-8")
+            data = pack_varint(0x00) + pack_varint(len(body)) + body
+            writer.write(pack_varint(len(data)) + data)
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+
+async def _serve(args):
+    server = FakeStatusServer(args.online, args.max)
+    port = await server.start(args.host, args.port)
+    print(f"Fake Minecraft status server on {args.host}:{port}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Minecraft status server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=25565)
+    parser.add_argument("--online", type=int, default=0)
+    parser.add_argument("--max", type=int, default=100)
+    asyncio.run(_serve(parser.parse_args()))
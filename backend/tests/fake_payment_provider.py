@@ -0,0 +1,118 @@
+"""
+Local fake payment provider
+
+Signs PayTR / Shopier style callbacks with the merchant secrets and replays
+them against the webhook receiver at a high rate, sending every callback
+several times the way real providers retry. Acknowledgement latencies and
+response bodies are recorded so tests and benchmarks can check them.
+
+    python tests/fake_payment_provider.py --base-url http://localhost:8001 \\
+        --merchant-key key --merchant-salt salt --loads 200 --duplicates 3
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import random
+import time
+
+import httpx
+
+
+def _sign(secret, message):
+    digest = hmac.new(secret.encode("utf-8"), message.encode("utf-8"), hashlib.sha256).digest()
+    return base64.b64encode(digest).decode("ascii")
+
+
+class FakePaymentProvider:
+    def __init__(self, http, merchant_key="key", merchant_salt="salt", shopier_secret="secret"):
+        self.http = http
+        self.merchant_key = merchant_key
+        self.merchant_salt = merchant_salt
+        self.shopier_secret = shopier_secret
+        self.latencies = []
+        self.responses = {}
+
+    def paytr_callback(self, merchant_oid, total_amount, status="success"):
+        fields = {
+            "merchant_oid": merchant_oid,
+            "status": status,
+            "total_amount": str(total_amount),
+            "payment_type": "card",
+        }
+        fields["hash"] = _sign(self.merchant_key, merchant_oid + self.merchant_salt + status + fields["total_amount"])
+        return fields
+
+    def shopier_callback(self, platform_order_id, payment_id, status="success"):
+        fields = {
+            "platform_order_id": platform_order_id,
+            "payment_id": payment_id,
+            "status": status,
+            "random_nr": str(random.randint(100000, 999999)),
+            "installment": "0",
+        }
+        fields["signature"] = _sign(self.shopier_secret, fields["random_nr"] + platform_order_id)
+        return fields
+
+    async def send(self, saglayici, fields):
+        start = time.perf_counter()
+        response = await self.http.post(f"/api/odeme/bildirim/{saglayici}", data=fields)
+        self.latencies.append((time.perf_counter() - start) * 1000)
+        key = f"{response.status_code} {response.text}"
+        self.responses[key] = self.responses.get(key, 0) + 1
+        return response
+
+    async def replay(self, callbacks, duplicates=1, concurrency=100, saglayici="paytr"):
+        """Send every callback ``duplicates`` times in shuffled order."""
+        semaphore = asyncio.Semaphore(concurrency)
+        queue = [fields for fields in callbacks for _ in range(duplicates)]
+        random.shuffle(queue)
+
+        async def send_one(fields):
+            async with semaphore:
+                await self.send(saglayici, fields)
+
+        await asyncio.gather(*(send_one(fields) for fields in queue))
+        return len(queue)
+
+
+async def _run(args):
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=30) as http:
+        login = await http.post("/api/auth/giris", json={"kullanici_adi": args.username, "sifre": args.password})
+        headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+        callbacks = []
+        for _ in range(args.loads):
+            load = await http.post("/api/cuzdan/yukle", params={"tutar": args.amount}, headers=headers)
+            callbacks.append((load.json()["siparis_no"], round(args.amount * 100)))
+
+        provider = FakePaymentProvider(http, args.merchant_key, args.merchant_salt)
+        started = time.perf_counter()
+        sent = await provider.replay(
+            [provider.paytr_callback(oid, amount) for oid, amount in callbacks],
+            duplicates=args.duplicates, concurrency=args.concurrency
+        )
+        elapsed = time.perf_counter() - started
+        latencies = sorted(provider.latencies)
+        print(json.dumps({
+            "bildirim": sent,
+            "rps": round(sent / elapsed, 1),
+            "p50_ms": round(latencies[len(latencies) // 2], 2),
+            "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1], 2),
+            "yanitlar": provider.responses,
+        }, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake payment provider callback replayer")
+    parser.add_argument("--base-url", default="http://localhost:8001")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin123")
+    parser.add_argument("--merchant-key", default="key")
+    parser.add_argument("--merchant-salt", default="salt")
+    parser.add_argument("--loads", type=int, default=200)
+    parser.add_argument("--amount", type=float, default=25.0)
+    parser.add_argument("--duplicates", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=100)
+    asyncio.run(_run(parser.parse_args()))
@@ -0,0 +1,86 @@
+"""
+Local fake Minecraft RCON server
+
+Speaks the Source RCON protocol well enough for the delivery pipeline:
+login (type 3) and command (type 2) packets. Every received command is
+recorded so tests and benchmarks can check what was delivered.
+
+    python tests/fake_rcon.py --port 25575 --password test
+"""
+import argparse
+import asyncio
+import random
+import struct
+
+LOGIN = 3
+COMMAND = 2
+RESPONSE = 0
+
+
+class FakeRconServer:
+    def __init__(self, password="test", latency=0.0, fail_rate=0.0):
+        self.password = password
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.commands = []
+        self.connections = 0
+        self._server = None
+
+    async def start(self, host="127.0.0.1", port=0):
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        authenticated = False
+        try:
+            while True:
+                (length,) = struct.unpack("<i", await reader.readexactly(4))
+                data = await reader.readexactly(length)
+                request_id, packet_type = struct.unpack("<ii", data[:8])
+                body = data[8:-2].decode("utf-8")
+
+                if packet_type == LOGIN:
+                    authenticated = body == self.password
+                    self._send(writer, request_id if authenticated else -1, COMMAND, "")
+                elif not authenticated:
+                    break
+                elif packet_type == COMMAND:
+                    if self.latency:
+                        await asyncio.sleep(self.latency)
+                    if random.random() < self.fail_rate:
+                        # Yanıt vermeden bağlantıyı kopar
+                        break
+                    self.commands.append(body)
+                    self._send(writer, request_id, RESPONSE, f"OK: {body}")
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _send(writer, request_id, packet_type, body):
+        payload = struct.pack("<ii", request_id, packet_type) + body.encode("utf-8") + b"\x00\x00"
+        writer.write(struct.pack("<i", len(payload)) + payload)
+
+
+async def _serve(args):
+    server = FakeRconServer(args.password, args.latency, args.fail_rate)
+    port = await server.start(args.host, args.port)
+    print(f"Fake RCON listening on {args.host}:{port}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Minecraft RCON server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=25575)
+    parser.add_argument("--password", default="test")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    asyncio.run(_serve(parser.parse_args()))
@@ -0,0 +1,174 @@
+"""
+Rexagon bulk credit tests
+Covers batched credit writes and their ledger entries in bulk user updates (no Mongo needed)
+"""
+import asyncio
+import os
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "rexagon_test")
+
+import server  # noqa: E402
+
+
+def prepared(query):
+    return {
+        field: {"$in": set(condition["$in"])} if isinstance(condition, dict) and "$in" in condition else condition
+        for field, condition in query.items()
+    }
+
+
+def matches(doc, query):
+    for field, condition in query.items():
+        if isinstance(condition, dict) and "$in" in condition:
+            if doc.get(field) not in condition["$in"]:
+                return False
+        elif doc.get(field, 0 if field == "kredi" else None) != condition:
+            return False
+    return True
+
+
+def apply_update(doc, update):
+    doc.update(update.get("$set", {}))
+    for field, amount in update.get("$inc", {}).items():
+        doc[field] = doc.get(field, 0) + amount
+    for field in update.get("$unset", {}):
+        doc.pop(field, None)
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.docs:
+            yield dict(doc)
+
+
+class FakeCollection:
+    """Just enough of a Motor collection to count the round trips of a bulk job"""
+
+    def __init__(self, docs=()):
+        self.docs = list(docs)
+        self.calls = []
+        self.before_bulk_write = None
+
+    def find(self, query, projection=None, session=None):
+        self.calls.append("find")
+        query = prepared(query)
+        return FakeCursor([doc for doc in self.docs if matches(doc, query)])
+
+    async def distinct(self, field, query):
+        self.calls.append("distinct")
+        query = prepared(query)
+        return [doc[field] for doc in self.docs if matches(doc, query)]
+
+    async def update_many(self, query, update, session=None):
+        self.calls.append("update_many")
+        query = prepared(query)
+        targets = [doc for doc in self.docs if matches(doc, query)]
+        for doc in targets:
+            apply_update(doc, update)
+        return SimpleNamespace(modified_count=len(targets))
+
+    async def bulk_write(self, operations, ordered=True, session=None):
+        self.calls.append("bulk_write")
+        if self.before_bulk_write:
+            self.before_bulk_write()
+            self.before_bulk_write = None
+        by_id = {doc["id"]: doc for doc in self.docs}
+        for operation in operations:
+            doc = by_id.get(operation._filter["id"])
+            if doc is not None and matches(doc, operation._filter):
+                apply_update(doc, operation._doc)
+
+    async def insert_many(self, docs, session=None):
+        self.calls.append("insert_many")
+        self.docs.extend(docs)
+
+    async def find_one_and_update(self, *args, **kwargs):
+        raise AssertionError("bulk credit writes must not go per document")
+
+
+class FakeDb:
+    def __init__(self, users):
+        self.users = FakeCollection(users)
+        self.credit_ledger = FakeCollection()
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+
+def bulk_update(monkeypatch, users, body, session=None):
+    fake = FakeDb(users)
+    monkeypatch.setattr(server, "db", fake)
+    monkeypatch.setattr(server, "leaderboards", {})
+    monkeypatch.setattr(server, "BULK_BATCH_SIZE", 1000)
+    monkeypatch.setattr(server, "run_ledger_transaction", lambda operation: operation(session))
+    admin = {"id": "admin", "rol": "admin"}
+    result = asyncio.run(server.bulk_update_users(server.TopluKullaniciGuncelle(**body), admin=admin))
+    return fake, result
+
+
+def users(count):
+    return [{"id": f"u{i:05d}", "kredi": float(i % 7)} for i in range(count)]
+
+
+def balances_match_ledger(fake):
+    totals = {}
+    for entry in fake.credit_ledger.docs:
+        if entry["kullanici_id"]:
+            totals[entry["kullanici_id"]] = totals.get(entry["kullanici_id"], 0) + entry["tutar"]
+    return all(doc["kredi"] == (i % 7) + totals.get(doc["id"], 0) for i, doc in enumerate(fake.users.docs))
+
+
+class TestBulkCredit:
+    """Tests for bulk credit adjustments"""
+
+    def test_credit_add_is_one_write_per_batch(self, monkeypatch):
+        """kredi_ekle writes each batch with a single update_many, even without transactions"""
+        fake, result = bulk_update(monkeypatch, users(5000), {"idler": [u["id"] for u in users(5000)], "kredi_ekle": 5})
+        assert result["degisen"] == 5000
+        assert fake.users.calls.count("update_many") == 5
+        assert fake.users.calls.count("bulk_write") == 0
+        assert fake.credit_ledger.calls == ["insert_many"] * 5
+        assert balances_match_ledger(fake)
+        print("PASS: Credit add written once per batch")
+
+    def test_credit_set_in_transaction_reads_and_writes_once(self, monkeypatch):
+        """With a session the pre-image is one find and the write one update_many per batch"""
+        body = {"idler": [u["id"] for u in users(5000)], "kredi": 3}
+        fake, result = bulk_update(monkeypatch, users(5000), body, session=object())
+        assert fake.users.calls.count("find") == 5
+        assert fake.users.calls.count("update_many") == 5
+        assert fake.credit_ledger.calls == ["insert_many"] * 5
+        assert balances_match_ledger(fake)
+        print("PASS: Credit set in transaction batched")
+
+    def test_credit_set_without_transaction_retries_misses(self, monkeypatch):
+        """The guarded bulk_write retries users whose balance changed in between"""
+        def concurrent_purchase():
+            fake.users.docs[3]["kredi"] -= 1
+            fake.credit_ledger.docs.extend(server.ledger_entries("u00003", -1, "sistem:market", "satin_alma"))
+
+        fake = FakeDb(users(2500))
+        fake.users.before_bulk_write = concurrent_purchase
+        monkeypatch.setattr(server, "db", fake)
+        monkeypatch.setattr(server, "leaderboards", {})
+        monkeypatch.setattr(server, "BULK_BATCH_SIZE", 1000)
+        body = server.TopluKullaniciGuncelle(idler=[u["id"] for u in users(2500)], kredi=3)
+        result = asyncio.run(server.bulk_update_users(body, admin={"id": "admin", "rol": "admin"}))
+
+        assert result["hata_sayisi"] == 0
+        assert all(doc["kredi"] == 3 and "toplu_islem" not in doc for doc in fake.users.docs)
+        # 3 grup + ilk grupta kaçan tek kullanıcı için bir tekrar
+        assert fake.users.calls.count("bulk_write") == 4
+        assert balances_match_ledger(fake)
+        print("PASS: Guarded credit set retries concurrent changes")
@@ -0,0 +1,83 @@
+"""
+Rexagon idempotency tests
+Covers Idempotency-Key handling around committed and failed purchases (no Mongo needed)
+"""
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import pytest
+from pymongo.errors import AutoReconnect, DuplicateKeyError
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "rexagon_test")
+
+import server  # noqa: E402
+
+
+class FakeKeys:
+    """idempotency_keys collection with a unique (kullanici_id, anahtar) index"""
+
+    def __init__(self):
+        self.docs = []
+
+    def _find(self, query):
+        return next((doc for doc in self.docs if all(doc.get(k) == v for k, v in query.items())), None)
+
+    async def insert_one(self, doc):
+        if self._find({"kullanici_id": doc["kullanici_id"], "anahtar": doc["anahtar"]}):
+            raise DuplicateKeyError("E11000")
+        self.docs.append(dict(doc))
+
+    async def find_one(self, query, projection=None):
+        return self._find(query)
+
+    async def update_one(self, query, update, session=None):
+        doc = self._find(query)
+        if doc:
+            doc.update(update["$set"])
+
+    async def delete_one(self, query):
+        doc = self._find(query)
+        if doc:
+            self.docs.remove(doc)
+
+
+class TestIdempotency:
+    """Tests for run_idempotent"""
+
+    def test_committed_operation_not_repeated(self, monkeypatch):
+        """A failure after the response is remembered keeps the key; the retry gets the response"""
+        monkeypatch.setattr(server, "db", type("FakeDb", (), {"idempotency_keys": FakeKeys()})())
+        charges = []
+
+        async def purchase(remember):
+            charges.append(1)
+            await remember({"yeni_kredi": 70.0}, None)
+            raise AutoReconnect("post-commit side effect")
+
+        with pytest.raises(AutoReconnect):
+            asyncio.run(server.run_idempotent("u1", "k1", purchase))
+        assert asyncio.run(server.run_idempotent("u1", "k1", purchase)) == {"yeni_kredi": 70.0}
+        assert len(charges) == 1
+        print("PASS: Committed operation not repeated")
+
+    def test_failed_operation_releases_key(self, monkeypatch):
+        """A failure before the commit frees the key for a retry"""
+        monkeypatch.setattr(server, "db", type("FakeDb", (), {"idempotency_keys": FakeKeys()})())
+        attempts = []
+
+        async def purchase(remember):
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise AutoReconnect("before commit")
+            await remember({"yeni_kredi": 70.0}, None)
+            return {"yeni_kredi": 70.0}
+
+        with pytest.raises(AutoReconnect):
+            asyncio.run(server.run_idempotent("u1", "k1", purchase))
+        assert asyncio.run(server.run_idempotent("u1", "k1", purchase)) == {"yeni_kredi": 70.0}
+        assert len(attempts) == 2
+        print("PASS: Failed operation releases key")
@@ -0,0 +1,101 @@
+"""
+Rexagon live event broker tests
+Runs the in-process SSE broker and stream generator (no Mongo needed)
+"""
+import asyncio
+import json
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "rexagon_test")
+
+from bson import Timestamp
+
+import server  # noqa: E402
+from server import EventBroker  # noqa: E402
+
+
+class FakeRequest:
+    async def is_disconnected(self):
+        return False
+
+
+async def read_events(stream, count):
+    events = []
+    while len(events) < count:
+        chunk = await asyncio.wait_for(stream.__anext__(), 1)
+        if chunk.startswith("id:"):
+            events.append(chunk)
+    return events
+
+
+class TestEventBroker:
+    """Tests for the in-process live event broker"""
+
+    def test_dispatch_reaches_channel_subscribers_only(self):
+        """Subscribers get events for their channels and nothing else"""
+        broker = EventBroker(queue_size=10, replay_size=10)
+        news = broker.subscribe({"haberler"})
+        forum = broker.subscribe({"forum:1"})
+        broker.dispatch("haberler", 1, {"baslik": "Yeni sezon"})
+        assert news.queue.qsize() == 1
+        assert forum.queue.qsize() == 0
+        event_id, channel, data = news.queue.get_nowait()
+        assert (event_id, channel) == (1, "haberler")
+        assert json.loads(data) == {"baslik": "Yeni sezon"}
+        print("PASS: Event delivered only to matching channel")
+
+    def test_slow_subscriber_is_dropped(self):
+        """A subscriber whose queue is full is disconnected instead of blocking fan-out"""
+        broker = EventBroker(queue_size=2, replay_size=10)
+        slow = broker.subscribe({"alisverisler"})
+        for event_id in range(3):
+            broker.dispatch("alisverisler", event_id, {})
+        assert slow.closed
+        assert broker.count == 0
+        assert broker.dropped == 1
+        assert "alisverisler" not in broker.subscribers
+        print("PASS: Slow live subscriber dropped")
+
+    def test_out_of_order_ids_still_delivered(self):
+        """Ids are assigned in dispatch order, so a publisher with an older clock is not skipped"""
+        async def scenario():
+            broker = EventBroker(queue_size=10, replay_size=10)
+            original, server.live_broker = server.live_broker, broker
+            stream = server.live_event_stream(FakeRequest(), {"haberler"}, 0)
+            broker.dispatch("haberler", 100, {"n": 1})
+            broker.dispatch("haberler", 99, {"n": 2})
+            events = await read_events(stream, 2)
+            await stream.aclose()
+            server.live_broker = original
+            return events
+
+        events = asyncio.run(scenario())
+        assert [e.split("\n")[0] for e in events] == ["id: 100", "id: 101"]
+        later = server.cluster_time_event_id(Timestamp(1700000000, 2))
+        assert server.cluster_time_event_id(Timestamp(1700000000, 1)) < later < server.cluster_time_event_id(Timestamp(1700000001, 0))
+        print("PASS: Out-of-order publisher ids still delivered")
+
+    def test_stream_replays_missed_events(self):
+        """A reconnecting client gets events after its Last-Event-ID, then live ones"""
+        async def scenario():
+            broker = EventBroker(queue_size=10, replay_size=10)
+            original, server.live_broker = server.live_broker, broker
+            broker.dispatch("haberler", 1, {"n": 1})
+            broker.dispatch("haberler", 2, {"n": 2})
+            broker.dispatch("alisverisler", 3, {"n": 3})
+            stream = server.live_event_stream(FakeRequest(), {"haberler"}, 1)
+            replayed = await read_events(stream, 1)
+            broker.dispatch("haberler", 4, {"n": 4})
+            live = await read_events(stream, 1)
+            await stream.aclose()
+            server.live_broker = original
+            return replayed + live, broker.count
+
+        events, remaining = asyncio.run(scenario())
+        assert [e.split("\n")[0] for e in events] == ["id: 2", "id: 4"]
+        assert remaining == 0
+        print("PASS: Missed live events replayed after reconnect")
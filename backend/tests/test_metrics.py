@@ -0,0 +1,82 @@
+"""
+Rexagon metrics tests
+Covers the request middleware, Mongo command attribution and the /metrics output (no Mongo needed)
+"""
+import asyncio
+import os
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "rexagon_test")
+
+import server  # noqa: E402
+
+
+def get(*paths, headers=None):
+    async def main():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return [await http.get(path, headers=headers) for path in paths]
+    return asyncio.run(main())
+
+
+def command_events(command_name, command, reply, request_id):
+    common = {"command_name": command_name, "connection_id": ("localhost", 27017), "request_id": request_id}
+    started = SimpleNamespace(command=command, **common)
+    succeeded = SimpleNamespace(reply=reply, duration_micros=1500, **common)
+    return started, succeeded
+
+
+class TestMetrics:
+    """Tests for request and query metrics"""
+
+    def test_requests_labelled_by_route_template(self, monkeypatch):
+        """Latency and status are recorded per route template, unknown paths share one label"""
+        monkeypatch.setattr(server, "metrics", server.MetricsRegistry())
+        get("/api/stats", "/api/stats", "/api/yok/1", "/api/yok/2")
+        (response,) = get("/metrics")
+        body = response.text
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        assert 'rexagon_http_requests_total{route="/api/stats",method="GET",status="200"} 2' in body
+        assert 'rexagon_http_requests_total{route="eslesmeyen",method="GET",status="404"} 2' in body
+        assert 'rexagon_http_request_duration_seconds_count{route="/api/stats",method="GET"} 2' in body
+        assert 'rexagon_http_request_duration_seconds_bucket{route="/api/stats",method="GET",le="+Inf"} 2' in body
+        assert "rexagon_http_requests_in_flight 1" in body
+        print("PASS: Requests labelled by route template")
+
+    def test_commands_attributed_to_route(self, monkeypatch):
+        """Commands inside a request count towards its route, others towards arka_plan"""
+        monkeypatch.setattr(server, "metrics", server.MetricsRegistry())
+        listener = server.QueryMetricsListener()
+        route = SimpleNamespace(path="/api/forum/konu/{konu_id}")
+        ctx = server.RequestContext({"route": route})
+        token = server.current_request.set(ctx)
+        for request_id in (1, 2):
+            started, succeeded = command_events(
+                "find", {"find": "forum_replies"}, {"cursor": {"firstBatch": [{}, {}, {}]}}, request_id
+            )
+            listener.started(started)
+            listener.succeeded(succeeded)
+        server.current_request.reset(token)
+        started, succeeded = command_events("findAndModify", {"findAndModify": "users"}, {"value": None}, 3)
+        listener.started(started)
+        listener.succeeded(succeeded)
+
+        assert ctx.queries == 2
+        assert server.metrics.mongo[("/api/forum/konu/{konu_id}", "find", "forum_replies")] == [2, 0.003, 6, 0]
+        assert server.metrics.mongo[("arka_plan", "findAndModify", "users")] == [1, 0.0015, 0, 0]
+        print("PASS: Mongo commands attributed to route")
+
+    def test_metrics_token_required(self, monkeypatch):
+        """With METRICS_TOKEN set the endpoint needs the bearer token"""
+        monkeypatch.setattr(server, "METRICS_TOKEN", "scrape")
+        (denied,) = get("/metrics")
+        (allowed,) = get("/metrics", headers={"Authorization": "Bearer scrape"})
+        assert denied.status_code == 401
+        assert allowed.status_code == 200
+        print("PASS: Metrics token enforced")
@@ -0,0 +1,78 @@
+"""
+Rexagon payment webhook tests
+Verifies callbacks signed by the local fake payment provider (no Mongo needed)
+"""
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "rexagon_test")
+
+import server  # noqa: E402
+from fake_payment_provider import FakePaymentProvider  # noqa: E402
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    monkeypatch.setattr(server, "PAYTR_MERCHANT_KEY", "key")
+    monkeypatch.setattr(server, "PAYTR_MERCHANT_SALT", "salt")
+    monkeypatch.setattr(server, "SHOPIER_API_SECRET", "secret")
+    return FakePaymentProvider(None, "key", "salt", "secret")
+
+
+class TestPaymentCallbacks:
+    """Tests for provider signature verification"""
+
+    def test_paytr_callback_parsed(self, provider):
+        """A signed PayTR callback maps to an event with the amount in lira"""
+        event = server.parse_payment_callback("paytr", provider.paytr_callback("abc123", 2550))
+        assert event == {"siparis_no": "abc123", "saglayici_islem_id": "abc123", "basarili": True, "tutar": 25.5}
+        failed = server.parse_payment_callback("paytr", provider.paytr_callback("abc123", 2550, "failed"))
+        assert failed["basarili"] is False
+        print("PASS: PayTR callback parsed")
+
+    def test_tampered_amount_rejected(self, provider):
+        """Changing a signed field invalidates the signature"""
+        fields = provider.paytr_callback("abc123", 2550)
+        fields["total_amount"] = "999999"
+        with pytest.raises(HTTPException) as exc:
+            server.parse_payment_callback("paytr", fields)
+        assert exc.value.status_code == 400
+        print("PASS: Tampered callback rejected")
+
+    def test_shopier_deduplicates_by_payment_id(self, provider):
+        """Shopier events are keyed by the provider's payment id, not the order"""
+        event = server.parse_payment_callback("shopier", provider.shopier_callback("abc123", "987654"))
+        assert event["siparis_no"] == "abc123"
+        assert event["saglayici_islem_id"] == "987654"
+        assert event["tutar"] is None
+        print("PASS: Shopier callback keyed by payment id")
+
+    def test_webhook_rejects_before_storing(self, provider, monkeypatch):
+        """Unsigned callbacks and unconfigured providers never reach the database"""
+        monkeypatch.setattr(server, "SHOPIER_API_SECRET", "")
+
+        async def scenario():
+            transport = httpx.ASGITransport(app=server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+                provider.http = http
+                fields = provider.paytr_callback("abc123", 2550)
+                fields["hash"] = "invalid"
+                bad = await provider.send("paytr", fields)
+                unknown = await provider.send("shopier", provider.shopier_callback("abc123", "1"))
+                return bad, unknown
+
+        before = server.settlement_stats["gecersiz_imza"]
+        bad, unknown = asyncio.run(scenario())
+        assert bad.status_code == 400
+        assert unknown.status_code == 404
+        assert server.settlement_stats["gecersiz_imza"] == before + 1
+        print("PASS: Invalid callbacks rejected")
@@ -0,0 +1,90 @@
+"""
+Rexagon rate limiting tests
+Covers the token buckets, per-route policies and 429 responses (no Mongo needed)
+"""
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "rexagon_test")
+
+import server  # noqa: E402
+
+
+def get(path, times, headers=None):
+    async def main():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return [await http.get(path, headers=headers) for _ in range(times)]
+    return asyncio.run(main())
+
+
+def limiter(policies, default=None):
+    return server.RateLimiter(server.MemoryRateLimitBackend(100), policies, default or [], server.RATE_LIMIT_EXEMPT)
+
+
+class TestRateLimit:
+    """Tests for the rate limiting middleware"""
+
+    def test_bucket_capacity_and_refill(self, monkeypatch):
+        """A bucket allows a burst of its capacity and refills at its rate"""
+        clock = [100.0]
+        monkeypatch.setattr(server.time, "monotonic", lambda: clock[0])
+        backend = server.MemoryRateLimitBackend(100)
+
+        async def take(times):
+            return [await backend.take("giris:ip:1.2.3.4", 3, 3 / 60) for _ in range(times)]
+
+        assert asyncio.run(take(4)) == [0, 0, 0, 20.0]
+        clock[0] += 20
+        assert asyncio.run(take(2)) == [0, 20.0]
+        print("PASS: Bucket capacity and refill")
+
+    def test_policy_matches_route_template(self):
+        """Route policies match path templates, exempt paths skip every policy"""
+        rate_limiter = limiter(server.RATE_LIMIT_POLICIES, server.RATE_LIMIT_DEFAULT)
+        names = [rule[0] for rule in rate_limiter.policies_for("POST", "/api/forum/konu/abc/cevap")]
+        assert names == ["forum-cevap", "forum-cevap-ip", "genel"]
+        assert rate_limiter.policies_for("GET", "/api/forum/konu/abc/cevap") == server.RATE_LIMIT_DEFAULT
+        assert rate_limiter.policies_for("POST", "/api/odeme/bildirim/paytr") == []
+        assert rate_limiter.policies_for("OPTIONS", "/api/auth/giris") == []
+        print("PASS: Policies matched by route template")
+
+    def test_throttled_request_gets_retry_after(self, monkeypatch):
+        """Requests over the limit get 429 with Retry-After before reaching the route"""
+        monkeypatch.setattr(server, "rate_limiter", limiter({("GET", "/api/stats"): [("test", "ip", 2, 60)]}))
+        responses = get("/api/stats", 3)
+        assert [r.status_code for r in responses] == [200, 200, 429]
+        assert responses[2].headers["Retry-After"] == "30"
+        assert server.rate_limiter.stats()["politikalar"]["test"] == {"izin": 2, "reddedilen": 1}
+        print("PASS: Throttled request gets Retry-After")
+
+    def test_user_buckets_are_separate(self, monkeypatch):
+        """User-scoped policies key on the token subject, not the client address"""
+        monkeypatch.setattr(server, "rate_limiter", limiter({("GET", "/api/stats"): [("test", "kullanici", 1, 60)]}))
+        first = {"Authorization": f"Bearer {server.create_user_token({'id': 'u1', 'rol': 'user'})}"}
+        second = {"Authorization": f"Bearer {server.create_user_token({'id': 'u2', 'rol': 'user'})}"}
+        assert [r.status_code for r in get("/api/stats", 2, first)] == [200, 429]
+        assert [r.status_code for r in get("/api/stats", 1, second)] == [200]
+        print("PASS: User buckets are separate")
+
+    def test_client_ip_from_trusted_hops(self, monkeypatch):
+        """Only addresses appended by trusted proxies are used, client-set ones are ignored"""
+        scope = {"client": ("10.0.0.5", 1234), "headers": [
+            (b"x-forwarded-for", b"6.6.6.6, 203.0.113.7"),
+            (b"x-forwarded-for", b"10.0.0.9"),
+        ]}
+        monkeypatch.setattr(server, "RATE_LIMIT_PROXY_HOPS", 0)
+        assert server._client_ip(scope) == "10.0.0.5"
+        monkeypatch.setattr(server, "RATE_LIMIT_PROXY_HOPS", 1)
+        assert server._client_ip(scope) == "10.0.0.9"
+        monkeypatch.setattr(server, "RATE_LIMIT_PROXY_HOPS", 2)
+        assert server._client_ip(scope) == "203.0.113.7"
+        monkeypatch.setattr(server, "RATE_LIMIT_PROXY_HOPS", 5)
+        assert server._client_ip(scope) == "10.0.0.5"
+        print("PASS: Client IP read from trusted proxy hops")
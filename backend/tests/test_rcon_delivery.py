@@ -0,0 +1,89 @@
+"""
+Rexagon RCON client tests
+Runs the pooled RCON client against the local fake RCON server (no Minecraft or Mongo needed)
+"""
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "rexagon_test")
+
+from fake_rcon import FakeRconServer  # noqa: E402
+from server import RconPool, RconError  # noqa: E402
+
+
+def run_with_fake_server(scenario, **server_kwargs):
+    async def main():
+        fake = FakeRconServer(**server_kwargs)
+        port = await fake.start()
+        try:
+            return await scenario(fake, port)
+        finally:
+            await fake.stop()
+    return asyncio.run(main())
+
+
+class TestRconPool:
+    """Tests for the pooled RCON client"""
+
+    def test_commands_delivered_over_one_connection(self):
+        """A batch is sent in order and the connection is reused for the next batch"""
+        async def scenario(fake, port):
+            pool = RconPool("127.0.0.1", port, "test", size=1, timeout=2)
+            first = await pool.execute(["give Steve minecraft:diamond 1", "say hi"])
+            second = await pool.execute(["say again"])
+            pool.close()
+            return first, second
+
+        first, second = run_with_fake_server(scenario, password="test")
+        assert first == ["OK: give Steve minecraft:diamond 1", "OK: say hi"]
+        assert second == ["OK: say again"]
+        print("PASS: RCON batch delivered and connection reused")
+
+    def test_connection_reuse_counts(self):
+        """Only one TCP connection is opened for sequential batches"""
+        async def scenario(fake, port):
+            pool = RconPool("127.0.0.1", port, "test", size=1, timeout=2)
+            for _ in range(5):
+                await pool.execute(["say ping"])
+            pool.close()
+            return fake.connections, pool.connects
+
+        server_connections, pool_connects = run_with_fake_server(scenario, password="test")
+        assert server_connections == 1
+        assert pool_connects == 1
+        print("PASS: RCON pool kept a single persistent connection")
+
+    def test_wrong_password_returns_errors(self):
+        """A rejected login surfaces as an RconError for every command in the batch"""
+        async def scenario(fake, port):
+            pool = RconPool("127.0.0.1", port, "wrong", size=1, timeout=2)
+            results = await pool.execute(["say a", "say b"])
+            pool.close()
+            return results
+
+        results = run_with_fake_server(scenario, password="test")
+        assert len(results) == 2
+        assert all(isinstance(r, RconError) for r in results)
+        print("PASS: RCON login failure reported per command")
+
+    def test_dropped_connection_is_replaced(self):
+        """A connection dropped mid-batch fails the rest of the batch and is not reused"""
+        async def scenario(fake, port):
+            pool = RconPool("127.0.0.1", port, "test", size=1, timeout=2)
+            fake.fail_rate = 1.0
+            failed = await pool.execute(["say lost", "say also lost"])
+            fake.fail_rate = 0.0
+            recovered = await pool.execute(["say back"])
+            pool.close()
+            return failed, recovered, pool.connects
+
+        failed, recovered, connects = run_with_fake_server(scenario, password="test")
+        assert all(isinstance(r, Exception) for r in failed)
+        assert recovered == ["OK: say back"]
+        assert connects == 2
+        print("PASS: RCON pool replaced a dropped connection")
@@ -0,0 +1,155 @@
+"""
+Rexagon registration tests
+Covers duplicate key mapping for registration and the bulk user import (no Mongo needed)
+"""
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+from fastapi import HTTPException
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "rexagon_test")
+
+import server  # noqa: E402
+
+BCRYPT_HASH = server.pwd_context.hash("sifre123")
+INDEXED = {"indeksli_alanlar": {"kullanici_adi", "email"}}
+
+
+class FakeUsers:
+    """users collection whose unique indexes compare case-insensitively"""
+
+    def __init__(self, existing=(), failing_indexes=()):
+        self.docs = list(existing)
+        self.batches = []
+        self.failing_indexes = set(failing_indexes)
+        self.indexes = {"_id_"}
+        self.lookups = []
+
+    async def create_indexes(self, indexes):
+        names = [index.document["name"] for index in indexes]
+        if self.failing_indexes & set(names):
+            raise server.OperationFailure("E11000 duplicate key error")
+        self.indexes.update(names)
+
+    async def index_information(self):
+        return {name: {} for name in self.indexes}
+
+    async def find_one(self, query, projection=None):
+        self.lookups.append(query)
+        field, value = next(iter(query.items()))
+        return next((doc for doc in self.docs if doc[field] == value), None)
+
+    def _conflict(self, doc):
+        for field in ("kullanici_adi", "email"):
+            if any(other[field].lower() == doc[field].lower() for other in self.docs):
+                return {"code": 11000, "keyPattern": {field: 1}, "errmsg": f"E11000 index: {field}_ci"}
+        return None
+
+    async def insert_one(self, doc):
+        error = self._conflict(doc)
+        if error:
+            raise DuplicateKeyError(error["errmsg"], 11000, error)
+        self.docs.append(doc)
+
+    async def insert_many(self, docs, ordered=True):
+        assert ordered is False
+        self.batches.append(len(docs))
+        errors = []
+        for index, doc in enumerate(docs):
+            error = self._conflict(doc)
+            if error:
+                errors.append({"index": index, **error})
+            else:
+                self.docs.append(doc)
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(docs) - len(errors)})
+
+
+def registration(kullanici_adi, email):
+    return server.UserRegister(
+        kullanici_adi=kullanici_adi, email=email, sifre="sifre123",
+        dogum_tarihi="2000-01-01", gizlilik_sozlesmesi=True
+    )
+
+
+class TestRegistration:
+    """Tests for index-backed registration and import"""
+
+    def test_duplicate_key_mapped_to_message(self, monkeypatch):
+        """Registration inserts once and maps index conflicts to the field's message"""
+        users = FakeUsers([{"kullanici_adi": "Oyuncu", "email": "oyuncu@example.com"}])
+        monkeypatch.setattr(server, "db", type("FakeDb", (), {"users": users})())
+        monkeypatch.setattr(server, "registration_state", INDEXED)
+        monkeypatch.setattr(server, "create_session", lambda user: asyncio.sleep(0, {"access_token": "t"}))
+
+        for user, message in [
+            (registration("OYUNCU", "yeni@example.com"), "Bu kullanıcı adı zaten kullanılıyor"),
+            (registration("yeni", "Oyuncu@Example.com"), "Bu email zaten kullanılıyor"),
+        ]:
+            with pytest.raises(HTTPException) as exc:
+                asyncio.run(server.kayit_ol(user))
+            assert exc.value.status_code == 400
+            assert exc.value.detail == message
+        asyncio.run(server.kayit_ol(registration("yeni", "yeni@example.com")))
+        assert [user["kullanici_adi"] for user in users.docs] == ["Oyuncu", "yeni"]
+        assert users.lookups == []
+        print("PASS: Duplicate key mapped to message")
+
+    def test_legacy_error_message_mapped(self):
+        """Servers without keyPattern are mapped from the index name"""
+        details = {"errmsg": "E11000 duplicate key error collection: rexagon.users index: email_ci dup key"}
+        assert server.duplicate_user_message(details) == "Bu email zaten kullanılıyor"
+        assert server.duplicate_user_message({"keyPattern": {"id": 1}}) is None
+        print("PASS: Legacy duplicate key message mapped")
+
+    def test_import_continues_past_duplicates(self, monkeypatch):
+        """Import inserts in unordered batches and reports each rejected row"""
+        users = FakeUsers([{"kullanici_adi": "eski", "email": "eski@example.com"}])
+        monkeypatch.setattr(server, "db", type("FakeDb", (), {"users": users})())
+        monkeypatch.setattr(server, "registration_state", INDEXED)
+        monkeypatch.setattr(server, "BULK_BATCH_SIZE", 2)
+        rows = [
+            server.IceAktarilanKullanici(kullanici_adi="ESKI", email="a@example.com", sifre_hash=BCRYPT_HASH),
+            server.IceAktarilanKullanici(kullanici_adi="bir", email="b@example.com", sifre_hash=BCRYPT_HASH),
+            server.IceAktarilanKullanici(kullanici_adi="iki", email="c@example.com", sifre_hash="md5:abc"),
+            server.IceAktarilanKullanici(kullanici_adi="ucuncu", email="B@example.com", sifre_hash=BCRYPT_HASH),
+        ]
+
+        async def collect():
+            return [progress async for progress in server.import_users(rows)]
+
+        progress = asyncio.run(collect())
+        assert users.batches == [2, 1]
+        assert progress[-1]["degisen"] == 1
+        assert progress[-1]["hata_sayisi"] == 3
+        errors = {error["kullanici_adi"]: error["hata"] for step in progress for error in step["hatalar"]}
+        assert errors == {
+            "ESKI": "Bu kullanıcı adı zaten kullanılıyor",
+            "iki": "Şifre hash'i bcrypt değil",
+            "ucuncu": "Bu email zaten kullanılıyor",
+        }
+        print("PASS: Import continues past duplicates")
+
+    def test_missing_unique_index_falls_back_to_precheck(self, monkeypatch):
+        """A failed collation index build leaves the others and turns on the pre-check for its field"""
+        users = FakeUsers([{"kullanici_adi": "Oyuncu", "email": "oyuncu@example.com"}], failing_indexes={"email_ci"})
+        monkeypatch.setattr(server, "db", type("FakeDb", (), {"users": users})())
+        monkeypatch.setattr(server, "registration_state", {"indeksli_alanlar": set()})
+        asyncio.run(server.ensure_user_unique_indexes())
+        assert server.registration_state["indeksli_alanlar"] == {"kullanici_adi"}
+
+        # Ön kontrol bcrypt ve insert'ten önce birebir eşleşmeyi yakalar
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(server.kayit_ol(registration("yeni", "oyuncu@example.com")))
+        assert exc.value.detail == "Bu email zaten kullanılıyor"
+        assert users.lookups == [{"email": "oyuncu@example.com"}]
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(server.bulk_import_users(server.TopluKullaniciIceAktar(kullanicilar=[]), admin={"id": "a1"}))
+        assert exc.value.status_code == 503
+        print("PASS: Missing unique index falls back to pre-check")
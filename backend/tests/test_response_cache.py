@@ -0,0 +1,99 @@
+"""
+Rexagon response cache tests
+Covers catalog ETags and the shared response cache (no Mongo needed)
+"""
+import asyncio
+import os
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "rexagon_test")
+
+import server  # noqa: E402
+
+
+class FakeVersions:
+    async def get(self, name):
+        return 7
+
+
+class FakeAggregate:
+    async def to_list(self, length):
+        return []
+
+
+class FakeDb:
+    product_sales = type("FakeSales", (), {"aggregate": lambda self, pipeline: FakeAggregate()})()
+
+
+def request(etag=None):
+    headers = [(b"if-none-match", etag.encode())] if etag else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+def frozen_at(day):
+    class FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime(2026, 3, day, 23, 59, tzinfo=timezone.utc)
+    return FrozenDatetime
+
+
+def best_sellers(monkeypatch, day, gun, etag=None):
+    monkeypatch.setattr(server, "datetime", frozen_at(day))
+    response = Response()
+    result = asyncio.run(server.get_best_sellers(request(etag), response, gun=gun))
+    return result if isinstance(result, Response) else response
+
+
+class TestResponseCache:
+    """Tests for conditional GETs and the response cache"""
+
+    def test_best_sellers_window_in_etag(self, monkeypatch):
+        """A day window gets a new ETag at midnight even if the catalog did not change"""
+        monkeypatch.setattr(server, "collection_versions", FakeVersions())
+        monkeypatch.setattr(server, "db", FakeDb())
+
+        first = best_sellers(monkeypatch, 1, 7).headers["ETag"]
+        assert first == '"market_items.7-7g.2026-03-01"'
+        assert best_sellers(monkeypatch, 1, 7, first).status_code == 304
+        assert best_sellers(monkeypatch, 2, 7, first).status_code == 200
+        assert best_sellers(monkeypatch, 1, 30, first).status_code == 200
+        # Toplam sıralama tarihe bağlı değil
+        total = best_sellers(monkeypatch, 1, None).headers["ETag"]
+        assert total == '"market_items.7"'
+        assert best_sellers(monkeypatch, 2, None, total).status_code == 304
+        print("PASS: Best sellers window in ETag")
+
+    def test_single_flight_survives_waiters(self, monkeypatch):
+        """Computations on one key never overlap, even when the result can't be stored"""
+        # max_entries=0: her değer yazılır yazılmaz atılır, her istek hesaplar
+        cache = server.ResponseCache(server.MemoryCacheBackend(0), 60)
+        active = [0, 0]
+
+        async def compute():
+            active[0] += 1
+            active[1] = max(active[1], active[0])
+            await asyncio.sleep(0.05)
+            active[0] -= 1
+            return {"ok": True}
+
+        async def late():
+            await asyncio.sleep(0.075)
+            return await cache.get_or_compute("market", "liste", "", compute)
+
+        async def main():
+            first = cache.get_or_compute("market", "liste", "", compute)
+            second = cache.get_or_compute("market", "liste", "", compute)
+            return await asyncio.gather(first, second, late())
+
+        assert asyncio.run(main()) == [{"ok": True}] * 3
+        assert active[1] == 1
+        assert cache._locks == {}
+        print("PASS: Single flight survives waiters")
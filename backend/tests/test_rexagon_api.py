@@ -60,6 +60,19 @@ class TestAuthentication:
         assert response.status_code == 401
         print("PASS: Invalid login rejected correctly")
     
+    def test_register_duplicate_username_case_insensitive(self):
+        """Test registration rejects a username differing only in case"""
+        response = requests.post(f"{BASE_URL}/api/auth/kayit", json={
+            "kullanici_adi": ADMIN_USERNAME.upper(),
+            "email": f"test_{uuid.uuid4().hex[:8]}@example.com",
+            "sifre": "test123456",
+            "dogum_tarihi": "2000-01-01",
+            "gizlilik_sozlesmesi": True
+        })
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Bu kullanıcı adı zaten kullanılıyor"
+        print("PASS: Case-insensitive duplicate username rejected")
+    
     def test_get_current_user(self):
         """Test getting current user info after login"""
         # First login
@@ -82,6 +95,35 @@ class TestAuthentication:
         assert "email" in data
         print(f"PASS: Current user fetched - {data['kullanici_adi']} with role {data['rol']}")
 
+    def test_refresh_token_rotation(self):
+        """POST /api/auth/yenile rotates the refresh token and closes the session on reuse"""
+        login_response = requests.post(f"{BASE_URL}/api/auth/giris", json={
+            "kullanici_adi": ADMIN_USERNAME,
+            "sifre": ADMIN_PASSWORD
+        })
+        first = login_response.json()["refresh_token"]
+
+        rotated = requests.post(f"{BASE_URL}/api/auth/yenile", json={"refresh_token": first})
+        assert rotated.status_code == 200
+        data = rotated.json()
+        assert data["refresh_token"] != first
+        me = requests.get(f"{BASE_URL}/api/auth/me", headers={"Authorization": f"Bearer {data['access_token']}"})
+        assert me.status_code == 200
+
+        # Aynı anda yenileyen ikinci sekme güncel çifti alır
+        concurrent = requests.post(f"{BASE_URL}/api/auth/yenile", json={"refresh_token": first})
+        assert concurrent.status_code == 200
+        assert concurrent.json()["refresh_token"] == data["refresh_token"]
+        second = requests.post(f"{BASE_URL}/api/auth/yenile", json={"refresh_token": data["refresh_token"]})
+        assert second.status_code == 200
+
+        # Daha eski bir token tekrar kullanılınca oturumun tamamı kapanır
+        reused = requests.post(f"{BASE_URL}/api/auth/yenile", json={"refresh_token": first})
+        assert reused.status_code == 401
+        latest = requests.post(f"{BASE_URL}/api/auth/yenile", json={"refresh_token": second.json()["refresh_token"]})
+        assert latest.status_code == 401
+        print("PASS: Refresh token rotated and reuse detected")
+
 
 class TestThemesAPI:
     """Tests for themes endpoints"""
@@ -229,6 +271,27 @@ class TestMarketAPI:
         print(f"PASS: GET /api/market/urunler returned {len(data)} items")
         return data
     
+    def test_market_items_etag_not_modified(self):
+        """GET /api/market/urunler returns 304 when If-None-Match matches"""
+        first = requests.get(f"{BASE_URL}/api/market/urunler")
+        assert first.status_code == 200
+        etag = first.headers.get("ETag")
+        assert etag
+        assert "stale-while-revalidate" in first.headers.get("Cache-Control", "")
+        second = requests.get(f"{BASE_URL}/api/market/urunler", headers={"If-None-Match": etag})
+        assert second.status_code == 304
+        print(f"PASS: Market catalog revalidated with ETag {etag}")
+    
+    def test_get_best_sellers_ranked(self):
+        """GET /api/market/en-cok-satanlar returns items in sales order, also for a 7-day window"""
+        for params in ({}, {"gun": 7}):
+            response = requests.get(f"{BASE_URL}/api/market/en-cok-satanlar", params=params)
+            assert response.status_code == 200
+            data = response.json()
+            counts = [item["satis_sayisi"] for item in data]
+            assert counts == sorted(counts, reverse=True)
+        print(f"PASS: Best sellers ranked: {len(data)} items in the last 7 days")
+    
     def test_get_market_categories(self):
         """GET /api/market/kategoriler returns market categories"""
         response = requests.get(f"{BASE_URL}/api/market/kategoriler")
@@ -316,7 +379,127 @@ class TestAdminAPI:
         data = response.json()
         assert isinstance(data, list)
         print(f"PASS: Admin got {len(data)} users")
-    
+
+    def test_admin_index_report(self):
+        """Admin index report shows an index (not COLLSCAN) for hot lookups"""
+        login_response = requests.post(f"{BASE_URL}/api/auth/giris", json={
+            "kullanici_adi": ADMIN_USERNAME,
+            "sifre": ADMIN_PASSWORD
+        })
+        token = login_response.json()["access_token"]
+
+        response = requests.get(f"{BASE_URL}/api/admin/indeks-raporu", headers={
+            "Authorization": f"Bearer {token}"
+        })
+        assert response.status_code == 200
+        data = response.json()
+        assert "COLLSCAN" not in data["get_current_user"]["indeksler"]
+        assert "COLLSCAN" not in data["get_forum_topics"]["indeksler"]
+        print(f"PASS: Index report covers {len(data)} route queries")
+
+    def test_admin_system_stats_user_cache(self):
+        """Repeated /auth/me calls are served from the user cache"""
+        login_response = requests.post(f"{BASE_URL}/api/auth/giris", json={
+            "kullanici_adi": ADMIN_USERNAME,
+            "sifre": ADMIN_PASSWORD
+        })
+        token = login_response.json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        for _ in range(3):
+            requests.get(f"{BASE_URL}/api/auth/me", headers=headers)
+        response = requests.get(f"{BASE_URL}/api/admin/sistem", headers=headers)
+        assert response.status_code == 200
+        cache = response.json()["kullanici_onbellegi"]
+        assert cache["hit"] >= 2
+        print(f"PASS: User cache hit ratio {cache['hit_orani']:.2f}")
+
+    def test_admin_bulk_credit_adjustment(self):
+        """POST /api/admin/toplu/kullanici-guncelle adjusts credits and reports missing ids"""
+        login_response = requests.post(f"{BASE_URL}/api/auth/giris", json={
+            "kullanici_adi": ADMIN_USERNAME,
+            "sifre": ADMIN_PASSWORD
+        })
+        headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+        me = requests.get(f"{BASE_URL}/api/auth/me", headers=headers).json()
+        
+        response = requests.post(f"{BASE_URL}/api/admin/toplu/kullanici-guncelle", json={
+            "idler": [me["id"], "missing-user-id"],
+            "kredi_ekle": 1
+        }, headers=headers)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["tamamlandi"] is True
+        assert data["degisen"] == 1
+        assert data["hatalar"] == [{"id": "missing-user-id", "durum": "bulunamadi"}]
+        after = requests.get(f"{BASE_URL}/api/auth/me", headers=headers).json()
+        assert after["kredi"] == me["kredi"] + 1
+        print("PASS: Bulk credit adjustment applied with per-item outcomes")
+
+    def test_admin_export_users_csv(self):
+        """GET /api/admin/disa-aktar/kullanicilar streams CSV without password hashes"""
+        login_response = requests.post(f"{BASE_URL}/api/auth/giris", json={
+            "kullanici_adi": ADMIN_USERNAME,
+            "sifre": ADMIN_PASSWORD
+        })
+        headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+        response = requests.get(f"{BASE_URL}/api/admin/disa-aktar/kullanicilar",
+            params={"bicim": "csv", "alanlar": "id,kullanici_adi,kredi"}, headers=headers, stream=True)
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        lines = response.iter_lines(decode_unicode=True)
+        assert next(lines) == "id,kullanici_adi,kredi"
+        assert any(ADMIN_USERNAME in line for line in lines)
+        
+        rejected = requests.get(f"{BASE_URL}/api/admin/disa-aktar/kullanicilar",
+            params={"alanlar": "sifre_hash"}, headers=headers)
+        assert rejected.status_code == 400
+        print("PASS: User export streamed as CSV")
+
+    def test_admin_ledger_matches_balance(self):
+        """GET /api/admin/defter/{id} recomputes the balance from the ledger"""
+        login_response = requests.post(f"{BASE_URL}/api/auth/giris", json={
+            "kullanici_adi": ADMIN_USERNAME,
+            "sifre": ADMIN_PASSWORD
+        })
+        headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+        me = requests.get(f"{BASE_URL}/api/auth/me", headers=headers).json()
+        requests.post(f"{BASE_URL}/api/admin/toplu/kullanici-guncelle",
+            json={"idler": [me["id"]], "kredi_ekle": 2}, headers=headers)
+        
+        response = requests.get(f"{BASE_URL}/api/admin/defter/{me['id']}", headers=headers)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["tutarli"] is True
+        entries = requests.get(f"{BASE_URL}/api/admin/defter/{me['id']}/hareketler",
+            params={"limit": 1}, headers=headers).json()
+        assert entries[0]["tutar"] == 2
+        assert entries[0]["tip"] == "toplu_duzeltme"
+        print("PASS: Ledger balance matches stored credit")
+
+    def test_unsigned_payment_callback_rejected(self):
+        """POST /api/odeme/bildirim/paytr never settles a load without a valid signature"""
+        login_response = requests.post(f"{BASE_URL}/api/auth/giris", json={
+            "kullanici_adi": ADMIN_USERNAME,
+            "sifre": ADMIN_PASSWORD
+        })
+        headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+        load = requests.post(f"{BASE_URL}/api/cuzdan/yukle", params={"tutar": 5}, headers=headers).json()
+        assert load["siparis_no"].isalnum()
+
+        response = requests.post(f"{BASE_URL}/api/odeme/bildirim/paytr", data={
+            "merchant_oid": load["siparis_no"],
+            "status": "success",
+            "total_amount": "500",
+            "hash": "invalid"
+        })
+        # 404 when PayTR is not configured on the test server
+        assert response.status_code in (400, 404)
+        history = requests.get(f"{BASE_URL}/api/cuzdan/gecmis", headers=headers).json()
+        transaction = next(t for t in history if t["id"] == load["transaction_id"])
+        assert transaction["durum"] == "beklemede"
+        print("PASS: Unsigned payment callback rejected")
+
     def test_non_admin_cannot_access(self):
         """Non-admin cannot access admin endpoints without auth"""
         response = requests.get(f"{BASE_URL}/api/admin/kullanicilar")
@@ -378,6 +561,58 @@ class TestNews:
         data = response.json()
         assert isinstance(data, list)
         print(f"PASS: News: {len(data)} articles")
+
+    def test_get_news_cursor_pagination(self):
+        """GET /api/haberler pages with X-Next-Cursor without repeating rows"""
+        first = requests.get(f"{BASE_URL}/api/haberler", params={"limit": 1})
+        assert first.status_code == 200
+        cursor = first.headers.get("X-Next-Cursor")
+        if not cursor:
+            pytest.skip("Not enough news articles to paginate")
+        second = requests.get(f"{BASE_URL}/api/haberler", params={"limit": 1, "cursor": cursor})
+        assert second.status_code == 200
+        assert second.json()[0]["id"] != first.json()[0]["id"]
+        print("PASS: News cursor pagination returns the next page")
+
+    def test_get_news_invalid_cursor(self):
+        """GET /api/haberler rejects a malformed cursor"""
+        response = requests.get(f"{BASE_URL}/api/haberler", params={"cursor": "not-a-cursor"})
+        assert response.status_code == 400
+        print("PASS: Invalid news cursor rejected")
+
+    def test_live_news_event(self):
+        """GET /api/canli pushes a newly created news article to subscribers"""
+        login_response = requests.post(f"{BASE_URL}/api/auth/giris", json={
+            "kullanici_adi": ADMIN_USERNAME,
+            "sifre": ADMIN_PASSWORD
+        })
+        token = login_response.json()["access_token"]
+        
+        stream = requests.get(f"{BASE_URL}/api/canli", params={"kanal": "haberler"}, stream=True, timeout=10)
+        assert stream.status_code == 200
+        assert stream.headers["content-type"].startswith("text/event-stream")
+        
+        baslik = f"TEST_News_Live_{uuid.uuid4().hex[:6]}"
+        create_response = requests.post(f"{BASE_URL}/api/admin/haber",
+            json={"baslik": baslik, "icerik": "Live content"},
+            headers={"Authorization": f"Bearer {token}"}
+        )
+        assert create_response.status_code == 200
+        
+        received = None
+        for line in stream.iter_lines(decode_unicode=True):
+            if line and line.startswith("data: ") and baslik in line:
+                received = line
+                break
+        stream.close()
+        assert received is not None
+        print("PASS: News article pushed over the live event stream")
+
+    def test_live_invalid_channel(self):
+        """GET /api/canli rejects unknown channels"""
+        response = requests.get(f"{BASE_URL}/api/canli", params={"kanal": "yok"})
+        assert response.status_code == 400
+        print("PASS: Unknown live channel rejected")
     
     def test_admin_update_news(self):
         """PUT /api/admin/haber/{haber_id} updates a news article"""
@@ -425,6 +660,65 @@ class TestForumAPI:
         assert isinstance(data, list)
         print(f"PASS: Forum categories: {len(data)} categories")
 
+    def test_forum_topic_has_stored_author(self):
+        """Forum topics and replies carry the author's name and rank badge"""
+        login_response = requests.post(f"{BASE_URL}/api/auth/giris", json={
+            "kullanici_adi": ADMIN_USERNAME,
+            "sifre": ADMIN_PASSWORD
+        })
+        headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+        
+        create_response = requests.post(f"{BASE_URL}/api/forum/konu", json={
+            "baslik": f"TEST_Topic_{uuid.uuid4().hex[:6]}",
+            "icerik": "Topic content",
+            "kategori": "Genel"
+        }, headers=headers)
+        assert create_response.status_code == 200
+        konu_id = create_response.json()["id"]
+        reply_response = requests.post(f"{BASE_URL}/api/forum/konu/{konu_id}/cevap",
+            json={"icerik": "Reply content"}, headers=headers)
+        assert reply_response.status_code == 200
+        
+        response = requests.get(f"{BASE_URL}/api/forum/konu/{konu_id}")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["konu"]["yazar_adi"] == ADMIN_USERNAME
+        assert "yazar_yetki" in data["konu"]
+        assert data["cevaplar"][0]["yazar_adi"] == ADMIN_USERNAME
+        print("PASS: Forum topic and reply carry stored author fields")
+
+
+class TestSearch:
+    """Tests for the search endpoint"""
+    
+    def test_search_finds_news_with_turkish_folding(self):
+        """GET /api/ara matches regardless of Turkish casing and accents"""
+        login_response = requests.post(f"{BASE_URL}/api/auth/giris", json={
+            "kullanici_adi": ADMIN_USERNAME,
+            "sifre": ADMIN_PASSWORD
+        })
+        token = login_response.json()["access_token"]
+        marker = f"ışıktest{uuid.uuid4().hex[:6]}"
+        create_response = requests.post(f"{BASE_URL}/api/admin/haber",
+            json={"baslik": f"TEST_News_{marker.upper()}", "icerik": f"Yeni {marker} etkinliği"},
+            headers={"Authorization": f"Bearer {token}"}
+        )
+        assert create_response.status_code == 200
+        
+        query = marker.replace("ı", "i").replace("ş", "s")
+        response = requests.get(f"{BASE_URL}/api/ara", params={"q": query, "tur": "haber"})
+        assert response.status_code == 200
+        results = response.json()
+        assert any(r["id"] == create_response.json()["id"] for r in results)
+        assert "<mark>" in results[0]["parcacik"]
+        print("PASS: Search found news with Turkish folding")
+
+    def test_search_rejects_short_query(self):
+        """GET /api/ara rejects queries without a searchable term"""
+        response = requests.get(f"{BASE_URL}/api/ara", params={"q": "a"})
+        assert response.status_code == 400
+        print("PASS: Short search query rejected")
+
 
 class TestUserProfileAPI:
     """Tests for user profile update endpoints (New Features in Iteration 3)"""
@@ -509,7 +803,14 @@ class TestUserProfileAPI:
         assert response.status_code == 200
         data = response.json()
         assert data["message"] == "Şifre başarıyla değiştirildi"
-        
+
+        # Tokens issued before the change are revoked, the returned one works
+        old_me = requests.get(f"{BASE_URL}/api/auth/me", headers={"Authorization": f"Bearer {token}"})
+        assert old_me.status_code == 401
+        current_me = requests.get(f"{BASE_URL}/api/auth/me",
+            headers={"Authorization": f"Bearer {data['access_token']}"})
+        assert current_me.status_code == 200
+
         # Verify new password works
         new_login_response = requests.post(f"{BASE_URL}/api/auth/giris", json={
             "kullanici_adi": ADMIN_USERNAME,
@@ -0,0 +1,122 @@
+"""
+Rexagon search text tests
+Covers Turkish case folding, tokenization, snippet highlighting and index rebuilds (no Mongo needed)
+"""
+import asyncio
+import os
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "rexagon_test")
+
+import server  # noqa: E402
+from server import build_search_document, fold_text, highlight_snippet, search_terms  # noqa: E402
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = list(docs)
+
+    async def to_list(self, length):
+        batch, self.docs = self.docs[:length], self.docs[length:]
+        return batch
+
+
+class FakeSource:
+    def __init__(self, docs=()):
+        self.docs = list(docs)
+
+    def find(self, query, projection=None):
+        return FakeCursor(self.docs)
+
+
+class FakeSearchDocuments:
+    """search_documents that records how many entries were visible at each write"""
+
+    def __init__(self, docs):
+        self.docs = {doc["_id"]: doc for doc in docs}
+        self.visible = []
+        self.during_rebuild = None
+
+    async def bulk_write(self, requests, ordered=True):
+        self.visible.append(len(self.docs))
+        if self.during_rebuild:
+            await self.during_rebuild()
+        for request in requests:
+            self.docs[request._filter["_id"]] = request._doc
+
+    async def replace_one(self, query, document, upsert=False):
+        self.docs[query["_id"]] = document
+
+    async def delete_many(self, query):
+        started = query["indekslenme"]["$not"]["$gte"]
+        for key in [k for k, doc in self.docs.items() if "indekslenme" not in doc or doc["indekslenme"] < started]:
+            del self.docs[key]
+
+
+class TestSearchText:
+    """Tests for search tokenization and highlighting"""
+
+    def test_turkish_case_folding(self):
+        """Dotted/dotless I and accents fold to the same term"""
+        assert fold_text("İSTANBUL") == "istanbul"
+        assert fold_text("IŞIK") == fold_text("ışık") == "isik"
+        assert search_terms("ŞİKAYET şikâyet sikayet") == ["sikayet", "sikayet", "sikayet"]
+        print("PASS: Turkish case folding")
+
+    def test_short_tokens_dropped(self):
+        """Single-character tokens are not indexed"""
+        assert search_terms("a VIP b paket") == ["vip", "paket"]
+        print("PASS: Short tokens dropped")
+
+    def test_snippet_highlights_original_text(self):
+        """Matches are marked in the original casing and the text is escaped"""
+        snippet = highlight_snippet("<b>Yeni</b> İŞLEM paketi geldi", {"islem"})
+        assert "<mark>İŞLEM</mark>" in snippet
+        assert "&lt;b&gt;Yeni&lt;/b&gt;" in snippet
+        print("PASS: Snippet highlights original text")
+
+    def test_snippet_windows_around_first_match(self):
+        """Long texts are cut around the first match with ellipses"""
+        text = "giriş " * 100 + "elmas kılıç " + "son " * 100
+        snippet = highlight_snippet(text, {"elmas"}, width=60)
+        assert snippet.startswith("…") and snippet.endswith("…")
+        assert "<mark>elmas</mark>" in snippet
+        print("PASS: Snippet windowed around match")
+
+    def test_reply_document_uses_topic_title(self):
+        """Replies are indexed with their topic's title for display"""
+        doc = build_search_document("cevap", {"id": "c1", "konu_id": "k1", "icerik": "Işınlanma çalışmıyor", "tarih": "t"}, "Destek")
+        assert doc["_id"] == "cevap:c1"
+        assert doc["baslik"] == "Destek"
+        assert doc["arama_baslik"] == ""
+        assert doc["arama_metin"] == "isinlanma calismiyor"
+        print("PASS: Reply search document built")
+
+    def test_rebuild_keeps_index_searchable(self, monkeypatch):
+        """Rebuild overwrites in place, keeps live writes and drops only stale entries"""
+        old = datetime(2020, 1, 1, tzinfo=timezone.utc)
+        search_documents = FakeSearchDocuments([
+            {"_id": "haber:h1", "baslik": "Eski", "indekslenme": old},
+            {"_id": "urun:silindi", "baslik": "Silinen ürün", "indekslenme": old},
+            {"_id": "konu:damgasiz", "baslik": "Damgasız"},
+        ])
+        fake = {
+            "search_documents": search_documents,
+            "forum_topics": FakeSource(), "forum_replies": FakeSource(), "market_items": FakeSource(),
+            "news": FakeSource([{"id": "h1", "baslik": "Yeni", "icerik": "Güncelleme"}]),
+        }
+        monkeypatch.setattr(server, "db", type("FakeDb", (), {**fake, "__getitem__": lambda self, name: fake[name]})())
+
+        async def live_write():
+            await server.index_search_document("urun", {"id": "u1", "isim": "Kılıç", "aciklama": ""})
+        search_documents.during_rebuild = live_write
+
+        assert asyncio.run(server.rebuild_search_index()) == 1
+        assert search_documents.visible == [3]
+        assert sorted(search_documents.docs) == ["haber:h1", "urun:u1"]
+        assert search_documents.docs["haber:h1"]["baslik"] == "Yeni"
+        print("PASS: Rebuild keeps index searchable")
@@ -0,0 +1,75 @@
+"""
+Rexagon server status sampler tests
+Runs the Server List Ping sampler against the local stub status server
+"""
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "rexagon_test")
+
+from fake_minecraft_status import FakeStatusServer  # noqa: E402
+from server import CircuitBreaker, ServerStatusSampler  # noqa: E402
+
+
+def run_with_stub(scenario, **server_kwargs):
+    async def main():
+        stub = FakeStatusServer(**server_kwargs)
+        port = await stub.start()
+        try:
+            return await scenario(stub, port)
+        finally:
+            await stub.stop()
+    return asyncio.run(main())
+
+
+class TestServerStatusSampler:
+    """Tests for the live player count sampler"""
+
+    def test_sample_reads_player_count(self):
+        """A successful ping updates the player count and history"""
+        async def scenario(stub, port):
+            sampler = ServerStatusSampler("127.0.0.1", port, 1, 10, CircuitBreaker(3, 60))
+            await sampler.sample()
+            stub.online = 12
+            await sampler.sample()
+            return sampler
+
+        sampler = run_with_stub(scenario, online=7, max_players=50)
+        assert sampler.online is True
+        assert sampler.players == 12
+        assert sampler.max_players == 50
+        assert [h["aktif_oyuncu"] for h in sampler.history] == [7, 12]
+        print("PASS: Sampler reads player count from status ping")
+
+    def test_history_is_bounded(self):
+        """The history ring buffer keeps only the latest samples"""
+        async def scenario(stub, port):
+            sampler = ServerStatusSampler("127.0.0.1", port, 1, 3, CircuitBreaker(3, 60))
+            for online in range(5):
+                stub.online = online
+                await sampler.sample()
+            return sampler
+
+        sampler = run_with_stub(scenario)
+        assert [h["aktif_oyuncu"] for h in sampler.history] == [2, 3, 4]
+        print("PASS: Player history ring buffer is bounded")
+
+    def test_breaker_opens_after_timeouts(self):
+        """Repeated timeouts open the breaker and stop pinging the server"""
+        async def scenario(stub, port):
+            sampler = ServerStatusSampler("127.0.0.1", port, 0.2, 10, CircuitBreaker(2, 60))
+            for _ in range(4):
+                await sampler.sample()
+            return sampler, stub.pings
+
+        sampler, pings = run_with_stub(scenario, silent=True)
+        assert sampler.online is False
+        assert sampler.players == 0
+        assert sampler.breaker.state == "acik"
+        assert pings == 2
+        print("PASS: Circuit breaker opened after repeated timeouts")
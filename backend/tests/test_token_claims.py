@@ -0,0 +1,76 @@
+"""
+Rexagon token claim tests
+Covers role/version claims and the in-memory revocation list (no Mongo needed)
+"""
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "rexagon_test")
+
+import server  # noqa: E402
+
+
+class NoDatabase:
+    """Fails the test if a route touches Mongo"""
+
+    def __getattr__(self, name):
+        raise AssertionError(f"unexpected database access: {name}")
+
+
+def revocation(user_id, surum, minutes=10):
+    return {
+        "kullanici_id": user_id,
+        "surum": surum,
+        "son_kullanma": datetime.now(timezone.utc) + timedelta(minutes=minutes)
+    }
+
+
+class TestTokenClaims:
+    """Tests for the stateless token fast path"""
+
+    def test_token_carries_role_and_version(self):
+        """Claims are read from the token without a user lookup"""
+        token = server.create_user_token({"id": "u1", "rol": "admin", "token_surumu": 3})
+        assert server.decode_token(token) == {"id": "u1", "rol": "admin", "surum": 3}
+        legacy = server.create_access_token(data={"sub": "u1"})
+        assert server.decode_token(legacy) == {"id": "u1", "rol": None, "surum": 0}
+        print("PASS: Token carries role and version")
+
+    def test_revoked_versions_rejected(self, monkeypatch):
+        """Tokens older than the revoked version fail, newer ones pass"""
+        revocations = server.TokenRevocations()
+        monkeypatch.setattr(server, "token_revocations", revocations)
+        revocations.apply(revocation("u1", 2))
+        revocations.apply(revocation("u1", 1))
+
+        with pytest.raises(HTTPException) as exc:
+            server.decode_token(server.create_user_token({"id": "u1", "rol": "user", "token_surumu": 1}))
+        assert exc.value.status_code == 401
+        assert server.decode_token(server.create_user_token({"id": "u1", "rol": "user", "token_surumu": 2}))["surum"] == 2
+        assert not revocations.is_revoked("u2", 0)
+        print("PASS: Revoked token versions rejected")
+
+    def test_admin_routes_authorize_without_database(self, monkeypatch):
+        """Role-gated routes accept or reject from the claims alone"""
+        monkeypatch.setattr(server, "db", NoDatabase())
+        user_token = server.create_user_token({"id": "u1", "rol": "user"})
+
+        async def scenario():
+            transport = httpx.ASGITransport(app=server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+                return await http.get("/api/admin/teslimatlar", headers={"Authorization": f"Bearer {user_token}"})
+
+        response = asyncio.run(scenario())
+        assert response.status_code == 403
+        claims = asyncio.run(server.get_admin_claims({"id": "a1", "rol": "admin", "surum": 0}))
+        assert claims["id"] == "a1"
+        print("PASS: Admin authorization needs no database read")
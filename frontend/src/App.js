@@ -22,6 +22,44 @@ const API = `${BACKEND_URL}/api`;
 
 export const AuthContext = createContext();
 
+// Erişim token'ı kısa ömürlü: 401 alan istek refresh token ile bir kez
+// yenilenip tekrarlanır. Aynı anda gelen 401'ler tek bir yenilemeyi bekler,
+// böylece döndürülen refresh token iki kez kullanılmaz. Başka bir sekme aynı
+// token'ı aynı anda kullanırsa sunucu kısa bir süre güncel çifti döndürür.
+let refreshing = null;
+
+axios.interceptors.response.use(
+  (response) => response,
+  async (error) => {
+    const original = error.config;
+    const refreshToken = localStorage.getItem('refresh_token');
+    if (error.response?.status !== 401 || !refreshToken || !original || original._retried || /\/auth\/(giris|kayit|yenile|cikis)$/.test(original.url || '')) {
+      return Promise.reject(error);
+    }
+    original._retried = true;
+    if (!refreshing) {
+      refreshing = axios.post(`${API}/auth/yenile`, { refresh_token: refreshToken })
+        .then((response) => {
+          localStorage.setItem('token', response.data.access_token);
+          localStorage.setItem('refresh_token', response.data.refresh_token);
+          return response.data.access_token;
+        })
+        .finally(() => {
+          refreshing = null;
+        });
+    }
+    try {
+      const token = await refreshing;
+      original.headers.Authorization = `Bearer ${token}`;
+      return axios(original);
+    } catch {
+      localStorage.removeItem('token');
+      localStorage.removeItem('refresh_token');
+      return Promise.reject(error);
+    }
+  }
+);
+
 export const useAuth = () => useContext(AuthContext);
 
 function App() {
@@ -48,8 +86,11 @@ function App() {
     }
   }, []);
 
-  const login = (token) => {
+  const login = (token, refreshToken) => {
     localStorage.setItem('token', token);
+    if (refreshToken) {
+      localStorage.setItem('refresh_token', refreshToken);
+    }
     axios.get(`${API}/auth/me`, {
       headers: { Authorization: `Bearer ${token}` }
     }).then(response => {
@@ -58,7 +99,12 @@ function App() {
   };
 
   const logout = () => {
+    const refreshToken = localStorage.getItem('refresh_token');
+    if (refreshToken) {
+      axios.post(`${API}/auth/cikis`, { refresh_token: refreshToken }).catch(() => {});
+    }
     localStorage.removeItem('token');
+    localStorage.removeItem('refresh_token');
     setUser(null);
   };
 
@@ -353,7 +353,10 @@ const Navigation = () => {
               setSaving(true);
               try {
                 const token = localStorage.getItem('token');
-                await axios.put(`${API}/users/sifre`, { eski_sifre: oldPassword, yeni_sifre: newPassword }, { headers: { Authorization: `Bearer ${token}` } });
+                const res = await axios.put(`${API}/users/sifre`, { eski_sifre: oldPassword, yeni_sifre: newPassword }, { headers: { Authorization: `Bearer ${token}` } });
+                // Eski token'lar iptal edildi, yenisiyle devam edilir
+                localStorage.setItem('token', res.data.access_token);
+                localStorage.setItem('refresh_token', res.data.refresh_token);
                 alert('Şifre başarıyla değiştirildi!');
                 setOldPassword(''); setNewPassword(''); setShowSettings(false);
               } catch (err) { alert(err.response?.data?.detail || 'Şifre değiştirilemedi'); } finally { setSaving(false); }
@@ -10,16 +10,31 @@ const ForumKonuPage = () => {
   const navigate = useNavigate();
   const [data, setData] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [newReply, setNewReply] = useState('');
+  // Son yüklenen cevap sayfasının imleci ve listede başladığı sıra
+  const [lastPage, setLastPage] = useState({ cursor: null, start: 0 });
 
   useEffect(() => {
     fetchTopic();
   }, [id, API]);
 
+  // Cevaplar sayfalı gelir; cursor verilirse sayfa, listenin start'tan
+  // önceki kısmına eklenir
+  const fetchPage = async (cursor, start) => {
+    const response = await axios.get(`${API}/forum/konu/${id}`, {
+      params: cursor ? { cursor } : {}
+    });
+    setData((prev) => {
+      const previous = prev && cursor ? prev.cevaplar.slice(0, start) : [];
+      return { ...response.data, cevaplar: [...previous, ...response.data.cevaplar] };
+    });
+    setLastPage({ cursor, start });
+  };
+
   const fetchTopic = async () => {
     try {
-      const response = await axios.get(`${API}/forum/konu/${id}`);
-      setData(response.data);
+      await fetchPage(null, 0);
     } catch (error) {
       console.error('Konu yüklenemedi:', error);
     } finally {
@@ -27,6 +42,17 @@ const ForumKonuPage = () => {
     }
   };
 
+  const loadMoreReplies = async () => {
+    setLoadingMore(true);
+    try {
+      await fetchPage(data.next_cursor, data.cevaplar.length);
+    } catch (error) {
+      console.error('Cevaplar yüklenemedi:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleReply = async (e) => {
     e.preventDefault();
     if (!user) {
@@ -42,7 +68,8 @@ const ForumKonuPage = () => {
         { headers: { Authorization: `Bearer ${token}` } }
       );
       setNewReply('');
-      fetchTopic();
+      // Yeni cevap sonda olduğu için yalnızca son sayfa yeniden yüklenir
+      await fetchPage(lastPage.cursor, lastPage.start);
     } catch (error) {
       console.error('Cevap eklenemedi:', error);
     }
@@ -79,7 +106,7 @@ const ForumKonuPage = () => {
     );
   }
 
-  const { konu, cevaplar } = data;
+  const { konu, cevaplar, next_cursor } = data;
 
   return (
     <div className="min-h-screen pt-24 pb-16 px-4" data-testid="topic-page">
@@ -161,6 +188,19 @@ const ForumKonuPage = () => {
           ))}
         </div>
 
+        {next_cursor && (
+          <div className="text-center mb-6">
+            <button
+              onClick={loadMoreReplies}
+              disabled={loadingMore}
+              className="border border-zinc-700 text-zinc-300 font-medium px-6 py-3 rounded-sm hover:border-[#FDD500] hover:text-[#FDD500] transition-all disabled:opacity-50"
+              data-testid="load-more-replies"
+            >
+              {loadingMore ? 'Yükleniyor...' : 'Daha Fazla Cevap Yükle'}
+            </button>
+          </div>
+        )}
+
         {/* Reply Form */}
         {user ? (
           <div className="bg-[#1E1E1E] border border-zinc-800 rounded-lg p-6" data-testid="reply-form">
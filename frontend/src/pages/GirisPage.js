@@ -21,7 +21,7 @@ const GirisPage = () => {
 
     try {
       const response = await axios.post(`${API}/auth/giris`, formData);
-      login(response.data.access_token);
+      login(response.data.access_token, response.data.refresh_token);
       navigate('/');
     } catch (err) {
       setError(err.response?.data?.detail || 'Giriş sırasında bir hata oluştu');
@@ -25,7 +25,7 @@ const KayitPage = () => {
 
     try {
       const response = await axios.post(`${API}/auth/kayit`, formData);
-      login(response.data.access_token);
+      login(response.data.access_token, response.data.refresh_token);
       navigate('/');
     } catch (err) {
       setError(err.response?.data?.detail || 'Kayıt sırasında bir hata oluştu');